@@ -11,8 +11,10 @@ from oandapyV20.exceptions import V20Error
 from analyzer.utils import DateTimeManager
 from analyzer.oanda_common import OandaIns
 from analyzer.bokeh_common import GlyphVbarAbs, ToolType, AxisTyp
+from analyzer.bokeh_common import to_ms_array, to_float_array
 from analyzer.oanda_common import OandaEnv, OandaRsp, OandaGrn
 from analyzer.oanda_account import ACCESS_TOKEN
+from analyzer.technical import IndicatorStore
 
 # Pandas data label
 LBL_TIME = "datetime"
@@ -88,11 +90,11 @@ class CandleGlyph(GlyphVbarAbs):
             なし[None]
         """
         self.__src.data = {
-            CandleGlyph.XDT: df.index.tolist(),
-            CandleGlyph.YHI: df[LBL_HIGH].tolist(),
-            CandleGlyph.YLO: df[LBL_LOW].tolist(),
-            CandleGlyph.YOP: df[LBL_OPEN].tolist(),
-            CandleGlyph.YCL: df[LBL_CLOSE].tolist()
+            CandleGlyph.XDT: to_ms_array(df.index),
+            CandleGlyph.YHI: to_float_array(df[LBL_HIGH]),
+            CandleGlyph.YLO: to_float_array(df[LBL_LOW]),
+            CandleGlyph.YOP: to_float_array(df[LBL_OPEN]),
+            CandleGlyph.YCL: to_float_array(df[LBL_CLOSE])
         }
 
         self.__glvbar.width = self.get_width(gran)
@@ -257,6 +259,22 @@ class CandleStickData(object):
 
         self.__df = df
         self.__gran = gran
+        self.__indstore = None
+
+    @classmethod
+    def from_dataframe(cls, gran, df):
+        """"取得済みのデータフレームから生成する[create from fetched data frame]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of a candlestick]
+        戻り値[Returns]:
+            csd (CandleStickData) : ローソク足データ[candlestick data]
+        """
+        csd = cls.__new__(cls)
+        csd.__df = df
+        csd.__gran = gran
+        csd.__indstore = None
+        return csd
 
     def __fetch_ohlc(self, gran, inst, gmtstr, gmtend):
         """"ローソク足情報を取得する[fetch ohlc]
@@ -291,6 +309,18 @@ class CandleStickData(object):
         """
         return self.__df
 
+    @property
+    def indicators(self):
+        """テクニカル指標の結果格納先を取得する[get indicator result store]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            self.__indstore (IndicatorStore) : 結果格納先[result store]
+        """
+        if self.__indstore is None:
+            self.__indstore = IndicatorStore(self.__df.index)
+        return self.__indstore
+
     @property
     def granularity(self):
         """ローソク足の時間足を取得する[get overall layout]
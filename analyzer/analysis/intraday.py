@@ -0,0 +1,674 @@
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import datetime as dt
+from retrying import retry
+import jpholiday
+import numpy as np
+import pandas as pd
+import analyzer.utils as utl
+import analyzer.analysis.candlestick as cs
+from analyzer.utils import DateTimeManager
+from analyzer.oanda_common import OandaGrn, OandaIns
+from analyzer.analysis.candlestick import CandleStickData
+from analyzer.utils import TZ_TOKYO, TZ_LONDON, TZ_NEWYORK  # noqa: F401
+
+_ONE_DAY = dt.timedelta(days=1)
+
+
+def _retry_if_connection_error(exception):
+    return isinstance(exception, ConnectionError)
+
+
+def _is_workday(date_):
+    return (date_.weekday() < 5) and not jpholiday.is_holiday(date_)
+
+
+class IntradayCache(object):
+    """ IntradayCache
+            - 日中ローソク足キャッシュクラス[Intraday candlestick cache class]
+
+        1日(東京時間 0:00 - 24:00)単位でローソク足を保持し、
+        複数のイベントスタディで取得結果を共有する。
+        [keeps candlesticks per day (Tokyo 0:00 - 24:00) and shares
+         the fetched data between event studies]
+    """
+
+    MAXSIZE = 2000
+
+    __cache = OrderedDict()
+    __lock = threading.Lock()
+
+    @classmethod
+    @retry(stop_max_attempt_number=5,
+           wait_fixed=500,
+           retry_on_exception=_retry_if_connection_error)
+    def get(cls, inst_id, gran, date_):
+        """1日分のローソク足を取得する[get candlesticks of one day]
+        引数[Args]:
+            inst_id (int) : 通貨ペアID[instrument ID]
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            date_ (date) : 日付[date]
+        戻り値[Returns]:
+            df (DataFrame) : その日のローソク足[candlesticks of the day]
+        """
+        key = (inst_id, gran, date_)
+        with cls.__lock:
+            if key in cls.__cache:
+                cls.__cache.move_to_end(key)
+                return cls.__cache[key]
+
+        str_dt = dt.datetime.combine(date_, dt.time(0, 0))
+        inst = OandaIns.list[inst_id].oanda_name
+        csd = CandleStickData(gran, inst,
+                              DateTimeManager(str_dt),
+                              DateTimeManager(str_dt + _ONE_DAY))
+
+        with cls.__lock:
+            cls.__cache[key] = csd.df
+            while cls.MAXSIZE < len(cls.__cache):
+                cls.__cache.popitem(last=False)
+
+        return csd.df
+
+    @classmethod
+    def clear(cls):
+        """キャッシュをクリアする[clear cache]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        with cls.__lock:
+            cls.__cache.clear()
+
+
+class IntradayCube(object):
+    """ IntradayCube
+            - 日中ローソク足キューブクラス[Intraday candlestick cube class]
+
+        複数日のローソク足を連続した (時刻 × OHLC) の配列に揃える。
+        日をまたぐイベントも同じ配列から取り出せる。
+        [align candlesticks of several days into one continuous
+         (time x OHLC) array, so that events crossing midnight can be
+         gathered from the same array]
+    """
+
+    OHLC = [cs.LBL_OPEN, cs.LBL_HIGH, cs.LBL_LOW, cs.LBL_CLOSE]
+    OPEN = 0
+    HIGH = 1
+    LOW = 2
+    CLOSE = 3
+
+    def __init__(self, dfdict, step):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            dfdict (dict) : 日付をキーとするデータフレーム辞書
+                            [dict of data frame keyed by date]
+            step (timedelta) : 時間足の間隔[interval of granularity]
+        """
+        step64 = np.timedelta64(step)
+
+        if dfdict:
+            strdate = min(dfdict.keys())
+            ndays = (max(dfdict.keys()) - strdate).days + 1
+        else:
+            strdate = dt.date(1970, 1, 1)
+            ndays = 0
+
+        base = np.datetime64(dt.datetime.combine(strdate, dt.time(0, 0)),
+                             "ns")
+        ntime = ndays * (np.timedelta64(_ONE_DAY) // step64)
+
+        cube = np.full((ntime, len(self.OHLC)), np.nan)
+
+        dflist = [df for df in dfdict.values() if not df.empty]
+        if dflist:
+            # 全日分をまとめて配置する[place all days in one pass]
+            tmary = np.concatenate([df.index.values for df in dflist])
+            valary = np.concatenate([df[self.OHLC].values for df in dflist])
+
+            ofsary = tmary - base
+            posary = ofsary // step64
+
+            flg = ((ofsary % step64) == np.timedelta64(0)) \
+                & (0 <= posary) & (posary < ntime)
+            cube[posary[flg]] = valary[flg]
+
+        self.__cube = cube
+        self.__base = base
+        self.__step = step64
+        self.__dfdict = dfdict
+
+    @property
+    def values(self):
+        """キューブ配列を取得する[get cube array]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            self.__cube (ndarray) : (時刻 × OHLC)配列[(time x OHLC) array]
+        """
+        return self.__cube
+
+    @property
+    def dataframes(self):
+        """日ごとのデータフレーム辞書を取得する[get dict of daily data frame]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            self.__dfdict (dict) : データフレーム辞書[dict of data frame]
+        """
+        return self.__dfdict
+
+    def position(self, dtary):
+        """日時の位置を取得する[get position of datetime]
+        引数[Args]:
+            dtary (ndarray) : 日時配列(datetime64)[array of datetime64]
+        戻り値[Returns]:
+            posary (ndarray) : 位置配列、NaTは-1[array of position, -1 if NaT]
+        """
+        dtary = np.asarray(dtary, dtype="datetime64[ns]")
+        nat = np.isnat(dtary)
+        ofsary = np.where(nat, self.__base, dtary) - self.__base
+        posary = ofsary // self.__step
+        posary[nat] = -1
+        return posary
+
+    def gather(self, posary):
+        """位置のOHLCを一括取得する[gather OHLC at positions]
+        引数[Args]:
+            posary (ndarray) : 位置配列[array of position]
+        戻り値[Returns]:
+            ary (ndarray) : (位置配列の形状 × OHLC)配列、範囲外はNaN
+                            [(shape of positions x OHLC) array,
+                             NaN if out of range]
+        """
+        ntime = len(self.__cube)
+        if ntime == 0:
+            return np.full(posary.shape + (len(self.OHLC),), np.nan)
+
+        flg = (0 <= posary) & (posary < ntime)
+        ary = self.__cube[np.clip(posary, 0, ntime - 1)]
+        ary[~flg] = np.nan
+        return ary
+
+
+class EventWindow(object):
+    """ EventWindow
+            - イベント窓クラス[Event window class]
+
+        イベント時刻から始まる数本分のローソク足を1つの窓とする。
+        時刻は指定のタイムゾーンで解釈し、夏時間も考慮する。
+        [a window of some candles starting at the event time;
+         the time is in the given time zone, with daylight saving time]
+
+        例[Example]:
+            EventWindow("ny-fix", dt.time(16, 0), tz=TZ_NEWYORK)
+            EventWindow("wmr", dt.time(16, 0), bars=2, ofs=-1, tz=TZ_LONDON)
+    """
+
+    def __init__(self, name, tm, bars=1, ofs=0, tz=TZ_TOKYO):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : 窓名[window name]
+            tm (time) : イベント時刻[event time]
+            bars (int) : 窓の足の本数[number of candles in window]
+            ofs (int) : イベント時刻からの足のオフセット
+                        [offset of candles from event time]
+            tz (str) : タイムゾーン[time zone]
+        """
+        self.__name = name
+        self.__tm = tm
+        self.__bars = bars
+        self.__ofs = ofs
+        self.__tz = tz
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def time(self):
+        return self.__tm
+
+    @property
+    def bars(self):
+        return self.__bars
+
+    @property
+    def offset(self):
+        return self.__ofs
+
+    def datetimes(self, dates):
+        """東京時間のイベント日時を取得する[get event datetime in Tokyo]
+        引数[Args]:
+            dates (list) : 日付リスト[list of date]
+        戻り値[Returns]:
+            dtary (ndarray) : 日時配列(datetime64)、存在しない時刻はNaT
+                              [array of datetime64, NaT if not exist]
+        """
+        tmdlt = pd.Timedelta(hours=self.__tm.hour, minutes=self.__tm.minute)
+        dtidx = pd.DatetimeIndex(dates) + tmdlt
+        if self.__tz != TZ_TOKYO:
+            dtidx = dtidx.tz_localize(self.__tz, ambiguous="NaT",
+                                      nonexistent="NaT")
+            dtidx = dtidx.tz_convert(TZ_TOKYO).tz_localize(None)
+        return dtidx.values
+
+
+class GroupKeyAbs(metaclass=ABCMeta):
+    """ GroupKeyAbs
+            - 集計キー抽象クラス[Grouping key abstract class]
+    """
+
+    def __init__(self, name):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : キー名[key name]
+        """
+        self.__name = name
+
+    @property
+    def name(self):
+        return self.__name
+
+    @abstractmethod
+    def calc(self, dates):
+        """日付ごとのキーを計算する[calculate key of each date]
+        引数[Args]:
+            dates (list) : 日付リスト[list of date]
+        戻り値[Returns]:
+            ary (ndarray) : 日ごとのキー[key of each date]
+        """
+        pass
+
+
+class Weekday(GroupKeyAbs):
+    """ Weekday
+            - 曜日キー[Weekday key]
+    """
+
+    def calc(self, dates):
+        return np.array([date_.weekday() for date_ in dates], dtype=np.int64)
+
+
+class SettlementDayAbs(GroupKeyAbs):
+    """ SettlementDayAbs
+            - 決済日キー抽象クラス[Settlement day key abstract class]
+
+        対象日が休日の場合は直前の平日を対象とする。
+        [if the target day is a holiday, the previous workday is used]
+    """
+
+    @abstractmethod
+    def is_target(self, date_):
+        """対象日か判定する[judge target day]
+        引数[Args]:
+            date_ (date) : 日付[date]
+        戻り値[Returns]:
+            flg (bool) : 対象日ならTrue[True if target day]
+        """
+        pass
+
+    def calc(self, dates):
+        keys = []
+        for date_ in dates:
+            key = utl.FALSE
+            day = date_
+            while True:
+                if self.is_target(day):
+                    key = utl.TRUE
+                    break
+                day += _ONE_DAY
+                if _is_workday(day):
+                    break
+            keys.append(key)
+        return np.array(keys, dtype=np.int64)
+
+
+class MonthEnd(SettlementDayAbs):
+    """ MonthEnd
+            - 月末キー[Month-end key]
+    """
+
+    def is_target(self, date_):
+        return not (date_ + _ONE_DAY).month == date_.month
+
+
+class GotoDay(MonthEnd):
+    """ GotoDay
+            - ゴトー日キー(5・10日と月末)[Goto day key (5th, 10th... and month-end)]
+    """
+
+    _MLT_FIVE_LIST = [5, 10, 15, 20, 25, 30]
+
+    def is_target(self, date_):
+        return (date_.day in self._MLT_FIVE_LIST) or super().is_target(date_)
+
+
+class StudyContext(dict):
+    """ StudyContext
+            - イベントスタディの計算コンテキスト[Event study context]
+
+        窓名をキーとする(日 × OHLC)配列の辞書に、日付と日ごとの
+        ローソク足を添えたもの。
+        [dict of (day x OHLC) array keyed by window, together with
+         the dates and each day's candlesticks]
+    """
+
+    def __init__(self, ohlcdict, dates, dfdict):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            ohlcdict (dict) : 窓名をキーとする(日 × OHLC)配列の辞書
+                              [dict of (day x OHLC) array keyed by window]
+            dates (list) : 日付のリスト[list of date]
+            dfdict (dict) : 日付をキーとするデータフレーム辞書
+                            [dict of data frame keyed by date]
+        """
+        super().__init__(ohlcdict)
+        self.__dates = dates
+        self.__dfdict = dfdict
+
+    @property
+    def dates(self):
+        return self.__dates
+
+    @property
+    def dfdict(self):
+        return self.__dfdict
+
+
+class FeatureAbs(metaclass=ABCMeta):
+    """ FeatureAbs
+            - 日中特徴量抽象クラス[Intraday feature abstract class]
+    """
+
+    def __init__(self, name):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : 特徴量名[feature name]
+        """
+        self.__name = name
+
+    @property
+    def name(self):
+        return self.__name
+
+    @abstractmethod
+    def calc(self, ohlcdict):
+        """特徴量を全日分計算する[calculate feature for all days]
+        引数[Args]:
+            ohlcdict (dict) : 窓名をキーとする(日 × OHLC)配列の辞書
+                              [dict of (day x OHLC) array keyed by window]
+        戻り値[Returns]:
+            ary (ndarray) : 日ごとの特徴量[feature of each day]
+        """
+        pass
+
+
+class DiffOpenClose(FeatureAbs):
+    """ DiffOpenClose
+            - 窓の始値から終値までの差分[difference from open to close]
+    """
+
+    def __init__(self, name, window):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : 特徴量名[feature name]
+            window (str) : 窓名[window name]
+        """
+        super().__init__(name)
+        self.__window = window
+
+    def calc(self, ohlcdict):
+        ary = ohlcdict[self.__window]
+        return ary[:, IntradayCube.CLOSE] - ary[:, IntradayCube.OPEN]
+
+
+class DiffOpenHigh(FeatureAbs):
+    """ DiffOpenHigh
+            - 窓の始値から高値までの差分[difference from open to high]
+    """
+
+    def __init__(self, name, window):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : 特徴量名[feature name]
+            window (str) : 窓名[window name]
+        """
+        super().__init__(name)
+        self.__window = window
+
+    def calc(self, ohlcdict):
+        ary = ohlcdict[self.__window]
+        return ary[:, IntradayCube.HIGH] - ary[:, IntradayCube.OPEN]
+
+
+class DiffOpenLow(FeatureAbs):
+    """ DiffOpenLow
+            - 窓の始値から安値までの差分[difference from open to low]
+    """
+
+    def __init__(self, name, window):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : 特徴量名[feature name]
+            window (str) : 窓名[window name]
+        """
+        super().__init__(name)
+        self.__window = window
+
+    def calc(self, ohlcdict):
+        ary = ohlcdict[self.__window]
+        return ary[:, IntradayCube.LOW] - ary[:, IntradayCube.OPEN]
+
+
+class CustomFeature(FeatureAbs):
+    """ CustomFeature
+            - 任意関数による特徴量[feature by custom function]
+
+        関数は (date, DataFrame) を受け取り数値を返す。
+        [the function takes (date, DataFrame) and returns a number]
+    """
+
+    def __init__(self, name, func, max_workers=None):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            name (str) : 特徴量名[feature name]
+            func (function) : 特徴量関数[feature function]
+            max_workers (int) : ワーカー数[number of workers]
+        """
+        super().__init__(name)
+        self.__func = func
+        self.__max_workers = max_workers
+
+    def calc_day(self, date_, df):
+        """1日分の特徴量を計算する[calculate feature of one day]
+        引数[Args]:
+            date_ (date) : 日付[date]
+            df (DataFrame) : その日のローソク足[candlesticks of the day]
+        戻り値[Returns]:
+            val (float) : 特徴量、抽出不可はNaN[feature, NaN if not extractable]
+        """
+        if df is None:
+            return np.nan
+        try:
+            return self.__func(date_, df)
+        except KeyError:
+            return np.nan
+
+    def calc(self, ohlcdict):
+        """特徴量を全日分計算する[calculate feature for all days]
+
+            日ごとのローソク足に関数を適用し、ワーカープールで並列に計算する。
+            日ごとのローソク足がない場合は全日NaNとなる。
+            [applies the function to each day's candlesticks in a worker
+             pool; all days are NaN without daily candlesticks]
+        引数[Args]:
+            ohlcdict (StudyContext) : 窓名をキーとする(日 × OHLC)配列の辞書
+                                      [dict of (day x OHLC) array keyed by
+                                       window]
+        戻り値[Returns]:
+            ary (ndarray) : 日ごとの特徴量[feature of each day]
+        """
+        if not isinstance(ohlcdict, StudyContext):
+            num = len(next(iter(ohlcdict.values()))) if ohlcdict else 0
+            return np.full(num, np.nan)
+
+        dfdict = ohlcdict.dfdict
+
+        def calc_day(date_):
+            return self.calc_day(date_, dfdict.get(date_))
+
+        dates = ohlcdict.dates
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            rsllist = list(executor.map(calc_day, dates))
+        return np.array(rsllist, dtype=np.float64)
+
+
+class EventStudy(object):
+    """ EventStudy
+            - イベントスタディクラス[Event study class]
+
+        全イベント窓を1回の一括処理で日中キューブから取り出し、
+        特徴量と集計キーを日ごとに計算する。
+        ローソク足はIntradayCacheで共有するため、スタディを追加しても
+        APIリクエストは増えない。
+        [gathers all event windows from the intraday cube in one pass
+         and calculates features and grouping keys of each day;
+         candlesticks are shared through IntradayCache, so adding a study
+         does not add API requests]
+    """
+
+    def __init__(self, windows, features, groups, gran=OandaGrn.M5,
+                 step=dt.timedelta(minutes=5)):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            windows (list) : EventWindowリスト[list of EventWindow]
+            features (list) : FeatureAbsリスト[list of FeatureAbs]
+            groups (list) : GroupKeyAbsリスト[list of GroupKeyAbs]
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            step (timedelta) : 時間足の間隔[interval of granularity]
+        """
+        self.__windows = list(windows)
+        self.__features = list(features)
+        self.__groups = list(groups)
+        self.__gran = gran
+        self.__step = step
+
+    @property
+    def windows(self):
+        return self.__windows
+
+    @property
+    def features(self):
+        return self.__features
+
+    @property
+    def groups(self):
+        return self.__groups
+
+    @property
+    def granularity(self):
+        return self.__gran
+
+    def group(self, dates):
+        """集計キーを計算する[calculate grouping keys]
+        引数[Args]:
+            dates (list) : 日付リスト[list of date]
+        戻り値[Returns]:
+            df (DataFrame) : 日付をインデックスとする集計キー
+                             [grouping keys indexed by date]
+        """
+        dates = list(dates)
+        dict_ = {key.name: key.calc(dates) for key in self.__groups}
+        return pd.DataFrame(dict_, index=dates,
+                            columns=[key.name for key in self.__groups])
+
+    def run(self, inst_id, dates):
+        """イベントスタディを実行する[run event study]
+        引数[Args]:
+            inst_id (int) : 通貨ペアID[instrument ID]
+            dates (list) : 日付リスト[list of date]
+        戻り値[Returns]:
+            df (DataFrame) : 日付をインデックスとする集計キーと特徴量、
+                             抽出不可はNaN
+                             [grouping keys and features indexed by date,
+                              NaN if not extractable]
+        """
+        dates = list(dates)
+        step64 = np.timedelta64(self.__step)
+
+        # ---------- 窓の開始日時[start datetime of windows] ----------
+        strlist = []
+        for win in self.__windows:
+            dtary = win.datetimes(dates).astype("datetime64[ns]")
+            strlist.append(dtary + step64 * win.offset)
+        strary = np.array(strlist).reshape(len(self.__windows), len(dates))
+        endary = strary + step64 * np.array(
+            [win.bars - 1 for win in self.__windows]).reshape(-1, 1)
+
+        # ---------- 必要な日のローソク足[candlesticks of needed days] ----------
+        daylist = set(dates)
+        for ary in (strary, endary):
+            ary = ary[~np.isnat(ary)]
+            daylist.update(pd.DatetimeIndex(ary).date)
+
+        dfdict = {}
+        for date_ in sorted(daylist):
+            try:
+                dfdict[date_] = IntradayCache.get(inst_id, self.__gran, date_)
+            except ValueError:
+                print("-----[Caution] Invalid Date found:[{}]"
+                      .format(str(date_)))
+
+        cube = IntradayCube(dfdict, self.__step)
+
+        # ---------- 全窓を一括で取り出す[gather all windows at once] ----------
+        ofsary = np.concatenate(
+            [np.arange(win.bars) for win in self.__windows]).astype(np.int64)
+        winidx = np.repeat(np.arange(len(self.__windows)),
+                           [win.bars for win in self.__windows])
+        headary = np.cumsum([0] + [win.bars for win in self.__windows])[:-1]
+        tailary = headary + [win.bars - 1 for win in self.__windows]
+
+        evtary = cube.position(strary.T)[:, winidx]
+        posary = evtary + ofsary
+        posary[evtary < 0] = -1
+        ary = cube.gather(posary)
+
+        opnary = ary[:, headary, IntradayCube.OPEN]
+        clsary = ary[:, tailary, IntradayCube.CLOSE]
+        if len(dates) == 0 or len(headary) == 0:
+            higary = np.full(opnary.shape, np.nan)
+            lowary = np.full(opnary.shape, np.nan)
+        else:
+            higary = np.fmax.reduceat(ary[:, :, IntradayCube.HIGH],
+                                      headary, axis=1)
+            lowary = np.fmin.reduceat(ary[:, :, IntradayCube.LOW],
+                                      headary, axis=1)
+
+        ohlcdict = {}
+        for i, win in enumerate(self.__windows):
+            ohlcdict[win.name] = np.stack([opnary[:, i], higary[:, i],
+                                           lowary[:, i], clsary[:, i]],
+                                          axis=1)
+        # カスタム特徴量は日ごとのローソク足も使う
+        # [custom features also use daily candlesticks]
+        context = StudyContext(ohlcdict, dates, dfdict)
+
+        # ---------- 特徴量[features] ----------
+        feats = np.full((len(dates), len(self.__features)), np.nan)
+
+        for i, feature in enumerate(self.__features):
+            feats[:, i] = feature.calc(context)
+
+        minunit = OandaIns.list[inst_id].min_unit
+        feats = np.round(feats, minunit)
+
+        df = self.group(dates)
+        for i, feature in enumerate(self.__features):
+            df[feature.name] = feats[:, i]
+
+        return df
@@ -0,0 +1,474 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import datetime as dt
+import numpy as np
+import pandas as pd
+from bokeh.models import ColumnDataSource, HoverTool
+from bokeh.models.widgets import Button, Select, DataTable, TableColumn
+from bokeh.models.widgets import NumberFormatter, Div
+from bokeh.models.glyphs import Line
+from bokeh.plotting import figure
+from bokeh.layouts import row, column
+from oandapyV20 import API
+from oandapyV20.exceptions import V20Error
+import analyzer.utils as utl
+from analyzer.oanda_account import ACCESS_TOKEN
+from analyzer.oanda_common import OandaEnv, OandaGrn, OandaIns
+from analyzer.utils import DateTimeManager
+from analyzer.bokeh_common import AxisTyp, to_ms_array
+from analyzer.candlestick import CandleStore, LBL_OPEN
+from analyzer.oders import OpenOrders, OpenPositions, load_snapshots
+from analyzer.analysis.base import AnalysisAbs, DateWidget
+from analyzer.utils import is_market_open
+
+
+class BookFeatures(object):
+    """ BookFeatures
+            - ブック特徴量算出クラス[Book features calculation class]
+
+        スナップショットを現在価格基準の(時刻, 価格オフセット)行列に
+        積み上げ、全特徴量を行列演算で算出する。
+        [stacks snapshots into a (time, price offset from current price)
+         matrix and computes every feature with matrix operations]
+    """
+
+    LBL_IMB = "Imbalance"
+    LBL_CLS_SIZE = "Cluster Size"
+    LBL_CLS_DIST = "Cluster Distance"
+    LBL_WALL_UP = "Stop Wall Above"
+    LBL_WALL_UP_DIST = "Stop Wall Above Distance"
+    LBL_WALL_DN = "Stop Wall Below"
+    LBL_WALL_DN_DIST = "Stop Wall Below Distance"
+
+    @staticmethod
+    def stack(snaps, nbkt):
+        """"スナップショットを現在価格基準の行列に積み上げる
+            [stack snapshots into matrices relative to current price]
+        引数[Args]:
+            snaps (list) : BookSnapshotのリスト(Noneを含む)
+                           [BookSnapshot list (may contain None)]
+            nbkt (int) : 現在価格から上下何本残すか
+                         [number of buckets kept on each side]
+        戻り値[Returns]:
+            lmat (ndarray) : ロング比率(時刻, オフセット)[long percent]
+            smat (ndarray) : ショート比率(時刻, オフセット)[short percent]
+            width (ndarray) : 各時刻の価格幅[bucket width per time]
+        """
+        nrow = len(snaps)
+        ncol = 2 * nbkt + 1
+        lmat = np.full((nrow, ncol), np.nan)
+        smat = np.full((nrow, ncol), np.nan)
+        width = np.full(nrow, np.nan)
+
+        valid = [(i, snap) for i, snap in enumerate(snaps)
+                 if snap is not None]
+        if not valid:
+            return lmat, smat, width
+
+        idx = np.array([i for i, _ in valid], dtype=np.intp)
+        lmat[idx] = 0
+        smat[idx] = 0
+        width[idx] = [snap.width for _, snap in valid]
+
+        rows = np.concatenate([np.full(len(snap.prices), i, dtype=np.intp)
+                               for i, snap in valid])
+        offs = np.concatenate([(snap.prices - snap.price) / snap.width
+                               for _, snap in valid])
+        cols = np.rint(offs).astype(np.intp) + nbkt
+        mask = (0 <= cols) & (cols < ncol)
+
+        longs = np.concatenate([snap.longs for _, snap in valid])
+        shorts = np.concatenate([snap.shorts for _, snap in valid])
+        lmat[rows[mask], cols[mask]] = longs[mask]
+        smat[rows[mask], cols[mask]] = shorts[mask]
+        return lmat, smat, width
+
+    @classmethod
+    def compute(cls, lmat, smat, width, near, stops):
+        """"特徴量を算出する[compute features]
+
+            オーダーブックでは現在価格より上のロングと下のショートを
+            逆指値(ストップ)の壁とみなす。
+            [for the order book, longs above and shorts below current price
+             are regarded as stop walls]
+        引数[Args]:
+            lmat (ndarray) : ロング比率(時刻, オフセット)[long percent]
+            smat (ndarray) : ショート比率(時刻, オフセット)[short percent]
+            width (ndarray) : 各時刻の価格幅[bucket width per time]
+            near (int) : 不均衡を集計する上下の本数
+                         [buckets on each side summed for imbalance]
+            stops (bool) : ストップの壁を算出するか(オーダーブックのみ)
+                           [compute stop walls (order book only)]
+        戻り値[Returns]:
+            dict_ (OrderedDict) : 特徴量名と時系列配列[feature name and array]
+        """
+        nbkt = lmat.shape[1] // 2
+        offs = np.arange(-nbkt, nbkt + 1)
+        valid = ~np.isnan(width)
+
+        net = lmat - smat
+        nearsl = slice(nbkt - near, nbkt + near + 1)
+        imb = net[:, nearsl].sum(axis=1)
+
+        tot = np.where(valid[:, np.newaxis], lmat + smat, 0)
+        clsidx = tot.argmax(axis=1)
+        clssize = tot.max(axis=1)
+
+        dict_ = OrderedDict()
+        dict_[cls.LBL_IMB] = imb
+        dict_[cls.LBL_CLS_SIZE] = np.where(valid, clssize, np.nan)
+        dict_[cls.LBL_CLS_DIST] = offs[clsidx] * width
+        if not stops:
+            return dict_
+
+        up = np.where(valid[:, np.newaxis], lmat[:, nbkt + 1:], 0)
+        dn = np.where(valid[:, np.newaxis], smat[:, :nbkt], 0)
+        upidx = up.argmax(axis=1)
+        dnidx = dn.argmax(axis=1)
+
+        dict_[cls.LBL_WALL_UP] = np.where(valid, up.max(axis=1), np.nan)
+        dict_[cls.LBL_WALL_UP_DIST] = (upidx + 1) * width
+        dict_[cls.LBL_WALL_DN] = np.where(valid, dn.max(axis=1), np.nan)
+        dict_[cls.LBL_WALL_DN_DIST] = (nbkt - dnidx) * width
+        return dict_
+
+    @staticmethod
+    def correlate(fmat, rmat):
+        """"特徴量と将来リターンの相関係数を算出する
+            [compute correlation between features and forward returns]
+        引数[Args]:
+            fmat (ndarray) : 特徴量(時刻, 特徴量)[features]
+            rmat (ndarray) : 将来リターン(時刻, 期間)[forward returns]
+        戻り値[Returns]:
+            corr (ndarray) : 相関係数(特徴量, 期間)[correlation]
+            num (ndarray) : 有効サンプル数(期間)[valid samples]
+        """
+        corr = np.full((fmat.shape[1], rmat.shape[1]), np.nan)
+        num = np.zeros(rmat.shape[1], dtype=np.int64)
+        fvalid = ~np.isnan(fmat).any(axis=1)
+        for j in range(rmat.shape[1]):
+            mask = fvalid & ~np.isnan(rmat[:, j])
+            num[j] = mask.sum()
+            if num[j] < 3:
+                continue
+            fsub = fmat[mask]
+            rsub = rmat[mask, j]
+            fdev = fsub - fsub.mean(axis=0)
+            rdev = rsub - rsub.mean()
+            den = np.sqrt((fdev ** 2).sum(axis=0) * (rdev ** 2).sum())
+            with np.errstate(invalid="ignore", divide="ignore"):
+                corr[:, j] = fdev.T.dot(rdev) / den
+        return corr, num
+
+
+class OrderBookAnalysis(AnalysisAbs):
+    """ OrderBookAnalysis
+            - オーダーブック解析クラス[Order book analysis class]
+    """
+
+    # スナップショット間隔[snapshot interval]
+    INTERVAL = pd.offsets.Minute(20)
+    # 将来リターンの期間(時間)[forward return horizons (hours)]
+    HORIZONS = (1, 4, 24)
+    # リターン算出に使う時間足[granularity for returns]
+    RET_GRAN = OandaGrn.M5
+    # 進捗表示ごとの取得件数(1日分)[snapshots per progress step (1 day)]
+    CHUNK = 72
+
+    TBLLBL_FEAT = "Feature"
+
+    XDT = "xdt"
+
+    _api = API(access_token=ACCESS_TOKEN, environment=OandaEnv.PRACTICE)
+
+    def __init__(self):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            なし[None]
+        """
+        super().__init__()
+
+        self.__BG_COLOR = "#2E2E2E"  # Background color
+        self.__NBKT = 100  # 現在価格から上下何本残すか
+        self.__NEAR = 10  # 不均衡を集計する上下の本数
+
+        self.__store = CandleStore(self._api)
+        # 要求はクラスメソッドで行うためフィギュアは作らない
+        # [requests are classmethods so no figure is built]
+        self.__BOOK_DICT = {
+            "Order Book": OpenOrders,
+            "Position Book": OpenPositions,
+        }
+
+        diffdate = dt.date.today() - dt.timedelta(days=30)
+        self.__dtwdg_str = DateWidget("開始", diffdate)
+        self.__dtwdg_end = DateWidget("終了",)
+
+        # Widget Select:ブック種別[Book kind]
+        keylist = list(self.__BOOK_DICT.keys())
+        self.__slc_book = Select(title="ブック:",
+                                 value=keylist[0],
+                                 options=keylist,
+                                 default_size=180)
+
+        # Widget Button:解析実行[Run analysis]
+        self.__btn_run = Button(label="解析実行",
+                                button_type="success",
+                                sizing_mode="fixed",
+                                default_size=200)
+        self.__btn_run.on_click(self.__cb_btn_run)
+
+        # 解析用スレッドと進捗表示[thread and progress for analysis]
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__div_progress = Div(text="",
+                                  style={"color": "orange"},
+                                  visible=False)
+
+        # Widget DataTable:相関係数[Correlation]
+        self.__TBLLBL_HRZ = ["{}h".format(hrz) for hrz in self.HORIZONS]
+        dict_ = {self.TBLLBL_FEAT: []}
+        for lbl in self.__TBLLBL_HRZ:
+            dict_[lbl] = []
+        self.__src = ColumnDataSource(dict_)
+
+        # 有効サンプル数は期間ごとに列見出しへ表示する
+        # [valid sample count is shown per horizon in the column header]
+        self.__cols_hrz = [TableColumn(field=lbl, title="Corr " + lbl,
+                                       formatter=NumberFormatter(
+                                           format="0[.]0000"))
+                           for lbl in self.__TBLLBL_HRZ]
+        cols = [TableColumn(field=self.TBLLBL_FEAT, title="Feature")]
+        cols += self.__cols_hrz
+        self.__tbl = DataTable(source=self.__src,
+                               columns=cols,
+                               fit_columns=True,
+                               height=250)
+
+        # 特徴量の時系列[feature time series]
+        self.__LINES = ((BookFeatures.LBL_IMB, "yellow"),
+                        (BookFeatures.LBL_WALL_UP, "deepskyblue"),
+                        (BookFeatures.LBL_WALL_DN, "orange"))
+        dict_ = {self.XDT: []}
+        for lbl, _ in self.__LINES:
+            dict_[lbl] = []
+        self.__srcline = ColumnDataSource(dict_)
+
+        self.__fig = figure(plot_height=300,
+                            x_axis_type=AxisTyp.X_DATETIME,
+                            title="Order Book Features",
+                            background_fill_color=self.__BG_COLOR,
+                            sizing_mode="stretch_width")
+        self.__fig.grid.grid_line_alpha = 0.3
+        self.__fig.yaxis.axis_label = "Percent[%]"
+        for lbl, color in self.__LINES:
+            glyph = Line(x=self.XDT,
+                         y=lbl,
+                         line_color=color,
+                         line_width=1,
+                         line_alpha=1.0)
+            self.__fig.add_glyph(self.__srcline, glyph)
+
+        hover = HoverTool()
+        hover.formatters = {self.XDT: "datetime"}
+        hover.tooltips = [("Time", "@" + self.XDT + "{%F %R}")]
+        hover.tooltips += [(lbl, "@{" + lbl + "}{0.000}")
+                           for lbl, _ in self.__LINES]
+        hover.mode = "vline"
+        self.__fig.add_tools(hover)
+
+    @property
+    def layout(self):
+        """レイアウトを取得する[get layout]
+        引数[Args]:
+            None
+        戻り値[Returns]:
+            layout (layout) : レイアウト[layout]
+        """
+        dtwdg_str = self.__dtwdg_str.widget
+        dtwdg_end = self.__dtwdg_end.widget
+        dtwdg = row(children=[dtwdg_str, dtwdg_end])
+        wslin = self._slc_inst
+
+        wdgbx1 = column(children=[wslin, self.__slc_book, dtwdg],
+                        sizing_mode="fixed")
+
+        wdgrun = row(children=[self.__btn_run, self.__div_progress])
+        wdgbx2 = column(children=[wdgrun, self.__tbl, self.__fig],
+                        sizing_mode="stretch_width")
+
+        layout_ = row(children=[wdgbx1, wdgbx2],
+                      sizing_mode="stretch_width")
+
+        return(layout_)
+
+    def __make_datetimes(self, str_, end_):
+        """"市場が開いている取得日時を生成する
+            [make fetch datetimes while the market is open]
+        引数[Args]:
+            str_ (datetime) : 開始日時(東京)[from date (Tokyo)]
+            end_ (datetime) : 終了日時(東京、含まない)
+                              [to date (Tokyo, exclusive)]
+        戻り値[Returns]:
+            dti (DatetimeIndex) : 取得日時(東京)[fetch datetimes (Tokyo)]
+        """
+        dti = pd.date_range(start=str_, end=end_, freq=self.INTERVAL,
+                            inclusive="left")
+
+        # 週末の休場(夏時間を考慮)を除く
+        # [exclude weekend market close (daylight saving time aware)]
+        return dti[is_market_open(dti)]
+
+    def __forward_returns(self, inst, dti):
+        """"将来リターンを算出する[calculate forward returns]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dti (DatetimeIndex) : 取得日時(東京)[fetch datetimes (Tokyo)]
+        戻り値[Returns]:
+            rmat (ndarray) : 将来リターン(時刻, 期間)[forward returns]
+        """
+        rmat = np.full((len(dti), len(self.HORIZONS)), np.nan)
+        if len(dti) == 0:
+            return rmat
+
+        hrzmax = pd.Timedelta(hours=max(self.HORIZONS))
+        df = self.__store.get(self.RET_GRAN, inst,
+                              dti[0], dti[-1] + hrzmax)
+        if df.empty:
+            return rmat
+
+        idx = np.asarray(df.index, dtype="datetime64[ns]")
+        opn = df[LBL_OPEN].to_numpy(dtype=np.float64)
+        tol = np.timedelta64(1, "h")
+
+        def price_at(times):
+            pos = np.searchsorted(idx, times, side="left")
+            ok = pos < len(idx)
+            pos = np.minimum(pos, len(idx) - 1)
+            ok &= (idx[pos] - times) <= tol
+            return np.where(ok, opn[pos], np.nan)
+
+        times = np.asarray(dti, dtype="datetime64[ns]")
+        base = price_at(times)
+        for j, hrz in enumerate(self.HORIZONS):
+            fwd = price_at(times + np.timedelta64(hrz, "h"))
+            rmat[:, j] = (fwd - base) / base
+        return rmat
+
+    def __cb_btn_run(self):
+        """Widget Button(実行)コールバックメソッド
+           [Callback method of Widget Button(Execute)]
+
+           取得と解析はワーカースレッドで行い、結果は次のtickで反映する。
+           [loading and analysis run in a worker thread and results are
+            applied on the next tick]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        from bokeh.io import curdoc
+        yesterday = dt.date.today() - dt.timedelta(days=1)
+        str_ = utl.limit_upper(self.__dtwdg_str.date, yesterday)
+        end_ = utl.limit_upper(self.__dtwdg_end.date, yesterday)
+        str_ = dt.datetime.combine(str_, dt.time())
+        # 終了日を含めるため翌日0時を上限とする(最大で本日0時)
+        # [the next day 00:00 is the exclusive bound so that the end date
+        #  is included (today 00:00 at most)]
+        end_ = dt.datetime.combine(end_ + dt.timedelta(days=1), dt.time())
+
+        inst = OandaIns.list[self.instrument_id].oanda_name
+        book = self.__BOOK_DICT[self.__slc_book.value]
+
+        dti = self.__make_datetimes(str_, end_)
+        if len(dti) == 0:
+            print("リストは空です")
+            return
+
+        self.__btn_run.disabled = True
+        self.__show_progress(0, len(dti))
+        self.__executor.submit(self.__run, curdoc(), inst, book, dti)
+
+    def __run(self, doc, inst, book, dti):
+        """スナップショットを取得して解析する(ワーカースレッド)
+           [load snapshots and analyze them (worker thread)]
+        引数[Args]:
+            doc (Document) : ドキュメント[document]
+            inst (str) : 通貨ペア[instrument]
+            book (type) : 取得に使うブックのクラス
+                          [book class used for requests]
+            dti (DatetimeIndex) : 取得日時(東京)[fetch datetimes (Tokyo)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        result = None
+        try:
+            dtlist = [DateTimeManager(ts.to_pydatetime()) for ts in dti]
+            snaps = []
+            for i in range(0, len(dtlist), self.CHUNK):
+                snaps += load_snapshots(book, inst,
+                                        dtlist[i:i + self.CHUNK])
+                doc.add_next_tick_callback(
+                    partial(self.__show_progress, len(snaps), len(dtlist)))
+
+            lmat, smat, width = BookFeatures.stack(snaps, self.__NBKT)
+            stops = book is OpenOrders
+            feats = BookFeatures.compute(lmat, smat, width, self.__NEAR,
+                                         stops)
+            rmat = self.__forward_returns(inst, dti)
+
+            fmat = np.column_stack(list(feats.values()))
+            corr, num = BookFeatures.correlate(fmat, rmat)
+            result = (dti, feats, corr, num)
+        except V20Error as v20err:
+            print("-----V20Error: {}".format(v20err))
+        except ConnectionError as cerr:
+            print("----- ConnectionError: {}".format(cerr))
+        except Exception as err:
+            print("----- ExceptionError: {}".format(err))
+
+        doc.add_next_tick_callback(partial(self.__apply, result))
+
+    def __show_progress(self, cnt, total):
+        """進捗を表示する[show progress]
+        引数[Args]:
+            cnt (int) : 取得済み件数[number of loaded snapshots]
+            total (int) : 全件数[total number of snapshots]
+        戻り値[Returns]:
+            なし[None]
+        """
+        # 解析終了後に届いた進捗は無視する[ignore progress after finish]
+        if not self.__btn_run.disabled:
+            return
+        self.__div_progress.text = "<b>読込中... {}/{}</b>".format(cnt, total)
+        self.__div_progress.visible = True
+
+    def __apply(self, result):
+        """解析結果を反映する[apply analysis result]
+        引数[Args]:
+            result (tuple) : (取得日時, 特徴量, 相関係数, データ数)、
+                             失敗時はNone
+                             [(datetimes, features, correlation, count),
+                              None if failed]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__btn_run.disabled = False
+        self.__div_progress.visible = False
+        if result is None:
+            return
+        dti, feats, corr, num = result
+
+        dict_ = {self.TBLLBL_FEAT: list(feats.keys())}
+        for j, lbl in enumerate(self.__TBLLBL_HRZ):
+            dict_[lbl] = corr[:, j]
+            self.__cols_hrz[j].title = "Corr {} (N={})".format(lbl, num[j])
+        self.__src.data = dict_
+
+        # ポジションブックにはストップの壁がない
+        # [the position book has no stop walls]
+        nan = np.full(len(dti), np.nan)
+        dict_ = {self.XDT: to_ms_array(dti)}
+        for lbl, _ in self.__LINES:
+            dict_[lbl] = feats.get(lbl, nan)
+        self.__srcline.data = dict_
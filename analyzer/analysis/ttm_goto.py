@@ -5,34 +5,41 @@ from math import pi
 from retrying import retry
 import numpy as np
 import pandas as pd
-import jpholiday
 import datetime as dt
 from bokeh import events
 from bokeh.models import Circle, Legend, LegendItem
 from bokeh.models import NumeralTickFormatter
 from bokeh.models import ColumnDataSource, CrosshairTool, HoverTool
 from bokeh.models import Panel, Tabs, Range1d, FactorRange, Span
+from bokeh.models import CustomJS
 from bokeh.models.widgets import Button, TextInput
 from bokeh.models.widgets import TableColumn, DataTable
 from bokeh.models.widgets import DateFormatter
 from bokeh.models.glyphs import VBar, Line
 from bokeh.palettes import Pastel1_9  # @UnresolvedImport
 from bokeh.plotting import figure
-from bokeh.layouts import row, gridplot, column
+from bokeh.layouts import row, column
 from oandapyV20.exceptions import V20Error
 import analyzer.utils as utl
 import analyzer.analysis.candlestick as cs
 from analyzer.utils import DateTimeManager
 from analyzer.oanda_common import OandaGrn, OandaIns
+from analyzer.bokeh_common import to_float_array
 from analyzer.analysis.candlestick import CandleStickChartBase
 from analyzer.analysis.candlestick import CandleStickData
 from analyzer.analysis.candlestick import CandleGlyph
 from analyzer.technical import SimpleMovingAverage
 from analyzer.analysis.base import AnalysisAbs, DateWidget
+from analyzer.analysis.intraday import EventStudy, EventWindow, IntradayCache
+from analyzer.analysis.intraday import DiffOpenClose, DiffOpenLow
+from analyzer.analysis.intraday import Weekday, GotoDay
 
+_TM0830 = dt.time(hour=8, minute=30)
 _TM0900 = dt.time(hour=9, minute=0)
+_TM0950 = dt.time(hour=9, minute=50)
 _TM0955 = dt.time(hour=9, minute=55)
 _TM1030 = dt.time(hour=10, minute=30)
+_TM1200 = dt.time(hour=12, minute=0)
 
 
 def _retry_if_connection_error(exception):
@@ -123,12 +130,10 @@ class CorrPlot(object):
         self.__glycir.radius = maxval / 80
 
         # set legend
-        self.__legends.items = []
-        for year, idx in yearsidx:
-            item = LegendItem(label=str(year),
-                              renderers=[self.__ren_cir],
-                              index=idx)
-            self.__legends.items.append(item)
+        items = [LegendItem(label=str(year),
+                            renderers=[self.__ren_cir],
+                            index=idx) for year, idx in yearsidx]
+        self.__legends.items = items
 
     def clear(self):
         """"データをクリアする[clear data]
@@ -162,8 +167,12 @@ class ChartAbs(metaclass=ABCMeta):
 
     CHART_OFS = 0.5
 
-    def __init__(self, title, plot_height):
+    def __init__(self, title, plot_height, markers):
         """"コンストラクタ[Constructor]
+        引数[Args]:
+            title (str) : タイトル[title]
+            plot_height (int) : 高さ[height]
+            markers (list) : イベント時刻と色のリスト[list of (time, color)]
         """
         BG_COLOR = "#2E2E2E"  # Background color
         self._TIME_FMT = "%H:%M:%S"
@@ -181,20 +190,13 @@ class ChartAbs(metaclass=ABCMeta):
         fig.yaxis.axis_label = "diff price"
         fig.xaxis.major_label_orientation = pi / 2
 
-        # ----- Vertical line 9:00 -----
-        ttmvl0900 = Span(location=0.0, dimension="height",
-                         line_color="cyan", line_dash="solid", line_width=2)
-        fig.add_layout(ttmvl0900)
-
-        # ----- Vertical line 9:55 -----
-        ttmvl0955 = Span(location=0.0, dimension="height",
-                         line_color="pink", line_dash="solid", line_width=2)
-        fig.add_layout(ttmvl0955)
-
-        # ----- Vertical line 10:30 -----
-        ttmvl1030 = Span(location=0.0, dimension="height",
-                         line_color="yellow", line_dash="solid", line_width=2)
-        fig.add_layout(ttmvl1030)
+        # ----- Vertical line on Event -----
+        vlevtlist = []
+        for tm, color in markers:
+            vlevt = Span(location=0.0, dimension="height", visible=False,
+                         line_color=color, line_dash="solid", line_width=2)
+            fig.add_layout(vlevt)
+            vlevtlist.append((tm.strftime(self._TIME_FMT), vlevt))
 
         # ----- Vertical line on Cursor -----
         vloncur = Span(location=0.0, dimension="height",
@@ -210,9 +212,7 @@ class ChartAbs(metaclass=ABCMeta):
         self._fig = fig
         self.__vloncur = vloncur
         self.__vlonsel = vlonsel
-        self.__ttmvl0900 = ttmvl0900
-        self.__ttmvl0955 = ttmvl0955
-        self.__ttmvl1030 = ttmvl1030
+        self.__vlevtlist = vlevtlist
 
     @property
     def fig(self):
@@ -226,21 +226,24 @@ class ChartAbs(metaclass=ABCMeta):
 
     def update(self, timelist):
 
-        # ----- Vertical line 9:00 -----
-        idx = timelist.index(_TM0900.strftime(self._TIME_FMT))
-        self.__ttmvl0900.location = idx + DiffChart.CHART_OFS
-
-        # ----- Vertical line 9:55 -----
-        idx = timelist.index(_TM0955.strftime(self._TIME_FMT))
-        self.__ttmvl0955.location = idx + DiffChart.CHART_OFS
-
-        # ----- Vertical line 10:30 -----
-        idx = timelist.index(_TM1030.strftime(self._TIME_FMT))
-        self.__ttmvl1030.location = idx + DiffChart.CHART_OFS
-
-    def update_vl_cursol(self, idx):
+        # ----- Vertical line on Event -----
+        for tmstr, vlevt in self.__vlevtlist:
+            if tmstr in timelist:
+                idx = timelist.index(tmstr)
+                vlevt.location = idx + DiffChart.CHART_OFS
+                vlevt.visible = True
+            else:
+                vlevt.visible = False
 
-        self.__vloncur.location = idx + DiffChart.CHART_OFS
+    @property
+    def vl_cursol(self):
+        """カーソル垂直線を取得する[get vertical line on cursor]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            self.__vloncur (Span) : Span object
+        """
+        return self.__vloncur
 
     def update_vl_select(self, idx):
 
@@ -269,13 +272,13 @@ class DiffChart(ChartAbs):
     LBL_STD_CL_OVE = "std_close_over"
     LBL_STD_CL_UND = "std_close_under"
 
-    def __init__(self, title):
+    def __init__(self, title, markers):
         """"コンストラクタ[Constructor]
         引数[Args]:
-            fig (figure) : フィギュアオブジェクト[figure object]
-            color_ (str) : カラーコード[Color code(ex "#E73B3A")]
+            title (str) : タイトル[title]
+            markers (list) : イベント時刻と色のリスト[list of (time, color)]
         """
-        super().__init__(title, 400)
+        super().__init__(title, 400, markers)
 
         fig = self._fig
         fig.xaxis.axis_label = "time"
@@ -372,13 +375,15 @@ class DiffChart(ChartAbs):
 
         dict_ = {
             DiffChart.X_TIME: timelist,
-            DiffChart.Y_HI_AVE: df[DiffChart.LBL_AVE_HI].tolist(),
-            DiffChart.Y_LO_AVE: df[DiffChart.LBL_AVE_LO].tolist(),
-            DiffChart.Y_CL_AVE: df[DiffChart.LBL_AVE_CL].tolist(),
-            DiffChart.Y_HI_STD: df[DiffChart.LBL_STD_HI_OVE].tolist(),
-            DiffChart.Y_LO_STD: df[DiffChart.LBL_STD_LO_UND].tolist(),
-            DiffChart.Y_CL_STD_HI: df[DiffChart.LBL_STD_CL_OVE].tolist(),
-            DiffChart.Y_CL_STD_LO: df[DiffChart.LBL_STD_CL_UND].tolist()
+            DiffChart.Y_HI_AVE: to_float_array(df[DiffChart.LBL_AVE_HI]),
+            DiffChart.Y_LO_AVE: to_float_array(df[DiffChart.LBL_AVE_LO]),
+            DiffChart.Y_CL_AVE: to_float_array(df[DiffChart.LBL_AVE_CL]),
+            DiffChart.Y_HI_STD: to_float_array(df[DiffChart.LBL_STD_HI_OVE]),
+            DiffChart.Y_LO_STD: to_float_array(df[DiffChart.LBL_STD_LO_UND]),
+            DiffChart.Y_CL_STD_HI:
+                to_float_array(df[DiffChart.LBL_STD_CL_OVE]),
+            DiffChart.Y_CL_STD_LO:
+                to_float_array(df[DiffChart.LBL_STD_CL_UND])
         }
         self.__src.data = dict_
 
@@ -417,13 +422,13 @@ class SumChart(ChartAbs):
 
     LBL_SUM = "sum"
 
-    def __init__(self, title):
+    def __init__(self, title, markers):
         """"コンストラクタ[Constructor]
         引数[Args]:
-            fig (figure) : フィギュアオブジェクト[figure object]
-            color_ (str) : カラーコード[Color code(ex "#E73B3A")]
+            title (str) : タイトル[title]
+            markers (list) : イベント時刻と色のリスト[list of (time, color)]
         """
-        super().__init__(title, 300)
+        super().__init__(title, 300, markers)
 
         fig = self._fig
         fig.xaxis.axis_label = "time"
@@ -469,7 +474,7 @@ class SumChart(ChartAbs):
 
         dict_ = {
             SumChart.X_TIME: timelist,
-            SumChart.Y_PRI_SUM: df[SumChart.LBL_SUM].tolist(),
+            SumChart.Y_PRI_SUM: to_float_array(df[SumChart.LBL_SUM]),
         }
         self.__src.data = dict_
 
@@ -634,7 +639,7 @@ class CandleStickChart1H(CandleStickChartAbs):
         self.__src = src
 
     def calc_sma(self, csd, window_):
-        self.__sma.calc_sma_mdl(csd.df, window_)
+        self.__sma.calc_sma_mdl(csd.df, window_, csd.indicators)
 
     def set_dataframe(self, date_, csd, l2p):
         super().set_dataframe(csd)
@@ -644,7 +649,7 @@ class CandleStickChart1H(CandleStickChartAbs):
         x_dttm = dt.datetime.combine(dat_, self.__TM0954)
         self.__vl0954.location = x_dttm
 
-        self.__sma.draw_mdl(csd.df)
+        self.__sma.draw_mdl(csd.df, csd.indicators)
 
         if len(l2p) == 0:
             self.__src.data = {self.XDT: [],
@@ -686,7 +691,28 @@ class TTMGoto(AnalysisAbs):
     _WEEK_DICT = {0: "月", 1: "火", 2: "水", 3: "木",
                   4: "金"}
     _GOTO_DICT = {FALSE: "×", TRUE: "○"}
-    _MLT_FIVE_LIST = [5, 10, 15, 20, 25, 30]
+
+    # 集計チャートに表示するイベント時刻[event times shown on summary charts]
+    _MARKERS = [(_TM0900, "cyan"),
+                (_TM0955, "pink"),
+                (_TM1030, "yellow")]
+
+    # 5分足のイベントスタディ[event study of 5 minutes candles]
+    __WIN0900 = "0900-0955"
+    __WIN0955 = "0955-1030"
+    __WIN0950OC = "0950-0955"
+    __WIN0955OC = "0955-1000"
+    __STUDY = EventStudy(
+        windows=[EventWindow(__WIN0900, _TM0900, bars=11),
+                 EventWindow(__WIN0955, _TM0955, bars=7),
+                 EventWindow(__WIN0950OC, _TM0950),
+                 EventWindow(__WIN0955OC, _TM0955)],
+        features=[DiffOpenClose(LBL_DIF0900H, __WIN0900),
+                  DiffOpenLow(LBL_DIF0955L, __WIN0955),
+                  DiffOpenClose(LBL_DIF0950OC, __WIN0950OC),
+                  DiffOpenClose(LBL_DIF0955OC, __WIN0955OC)],
+        groups=[Weekday(LBL_WEEK),
+                GotoDay(LBL_GOTO)])
 
     def __init__(self):
         """"コンストラクタ[Constructor]
@@ -717,8 +743,6 @@ class TTMGoto(AnalysisAbs):
                 ]
         self.__dfsmm = pd.DataFrame(columns=cols)
 
-        self.__dfall = pd.DataFrame()
-
         # Widget DataTable:
         self.TBLLBL_DATE = "date"
         self.TBLLBL_WEEK = "week"
@@ -770,50 +794,29 @@ class TTMGoto(AnalysisAbs):
         self.__csc1h = CandleStickChart1H()
         self.__csdlist_1h = []
 
-        # 集計結果
-        diffchrlist = []
-        diffsumlist = []
-        corrpltlist = []
-        sampcntlist = []
-
-        week_keys = TTMGoto._WEEK_DICT.keys()
-        goto_keys = TTMGoto._GOTO_DICT.keys()
-        for i, j in itertools.product(week_keys, goto_keys):
-            week = TTMGoto._WEEK_DICT[i]
-            goto = TTMGoto._GOTO_DICT[j]
-
-            # ---------- Diff-chart ----------
-            str_ = "Diff-chart Week[" + week + "]:Goto[" + goto + "]"
-            diffchr = DiffChart(str_)
-            diffchrlist.append(diffchr)
-
-            # ---------- Cumulative Sum-chart ----------
-            str_ = "Cumulative Sum-chart Week[" + week + "]:Goto[" + goto + "]"
-            sumchr = SumChart(str_)
-            diffsumlist.append(sumchr)
-
-            # ---------- Correlation Plot ----------
-            str_ = "Correlation plot Week[" + week + "]:Goto[" + goto + "]"
-            corrplt = CorrPlot(str_)
-            corrpltlist.append(corrplt)
-
-            # ---------- Text ----------
-            txtin_cnt = TextInput(value="", title="サンプル数:",
-                                  width=100, sizing_mode="fixed")
-            sampcntlist.append(txtin_cnt)
-
-            diffchr.fig.on_event(events.MouseMove, self.__cb_chart_mousemove)
-            sumchr.fig.on_event(events.MouseMove, self.__cb_chart_mousemove)
-
-            diffchr.fig.on_event(events.Tap, self.__cb_chart_tap)
-            sumchr.fig.on_event(events.Tap, self.__cb_chart_tap)
-
-        self.__diffchrlist = diffchrlist
-        self.__diffsumlist = diffsumlist
-        self.__corrpltlist = corrpltlist
-        self.__sampcntlist = sampcntlist
+        # 集計結果（パネルはタブ表示時に遅延生成する）
+        # [summary panels are created lazily when their tab is viewed]
+        self.__panels = {}
+        self.__smmres = {}
+        self.__corrdata = {}
+        self.__corrabsmax = np.empty(0)
+        self.__selidx = None
         self.__timelist = []
 
+        # カーソル垂直線はブラウザ側で同期する
+        # [vertical lines on cursor are synchronized in the browser]
+        code = """
+            const loc = Math.floor(cb_obj.x + ofs) + ofs;
+            for (const span of spans) {
+                if (span.location !== loc) {
+                    span.location = loc;
+                }
+            }
+        """
+        self.__cb_js_cursol = CustomJS(args=dict(spans=[],
+                                                 ofs=ChartAbs.CHART_OFS),
+                                       code=code)
+
     @property
     def layout(self):
         """レイアウトを取得する[get layout]
@@ -849,32 +852,115 @@ class TTMGoto(AnalysisAbs):
     def __create_result_tabs(self):
 
         # Tab1の設定
-
-        plotlist = []
-
+        pnllist = []
         week_keys = TTMGoto._WEEK_DICT.keys()
         goto_keys = TTMGoto._GOTO_DICT.keys()
         for i, j in itertools.product(week_keys, goto_keys):
-            pos = i * len(TTMGoto._GOTO_DICT) + j
-            sampcnt = self.__sampcntlist[pos]
-            diffplot = self.__diffchrlist[pos]
-            sumplot = self.__diffsumlist[pos]
-            txtin = column(children=[sampcnt],
-                           sizing_mode="fixed")
-            plotfig = column(children=[diffplot.fig, sumplot.fig],
-                             sizing_mode="fixed")
-            corrfig = self.__corrpltlist[pos].fig
-            plotlist.append([txtin, plotfig, corrfig])
+            title = "Week[" + TTMGoto._WEEK_DICT[i] + "]:Goto[" + \
+                TTMGoto._GOTO_DICT[j] + "]"
+            pnllist.append(Panel(child=column(children=[]), title=title))
 
-        gridview = gridplot(children=plotlist, sizing_mode="fixed")
+        tabs_smm = Tabs(tabs=pnllist)
+        tabs_smm.on_change("active", self.__cb_tabs_smm)
+        self.__tabs_smm = tabs_smm
+        self.__get_panel(tabs_smm.active)
 
-        tab1 = Panel(child=gridview, title="Summary")
+        tab1 = Panel(child=tabs_smm, title="Summary")
 
         # タブ生成
         tabs = Tabs(tabs=[tab1])
 
         return tabs
 
+    def __cb_tabs_smm(self, attr, old, new):
+        """Widget Tabs(集計結果)コールバックメソッド
+           [Callback method of Widget Tabs(Summary)]
+        引数[Args]:
+            attr (str) : An attribute name on this object
+            old (int) : Old tab index
+            new (int) : New tab index
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__get_panel(new)
+
+    def __get_panel(self, pos):
+        """集計結果パネルを取得する（未生成の場合は生成する）
+           [get summary panel (create it on first view)]
+        引数[Args]:
+            pos (int) : パネル位置[panel position]
+        戻り値[Returns]:
+            panel (tuple) : (DiffChart, SumChart, CorrPlot, TextInput)
+        """
+        if pos in self.__panels:
+            return self.__panels[pos]
+
+        week = TTMGoto._WEEK_DICT[pos // len(TTMGoto._GOTO_DICT)]
+        goto = TTMGoto._GOTO_DICT[pos % len(TTMGoto._GOTO_DICT)]
+
+        # ---------- Diff-chart ----------
+        str_ = "Diff-chart Week[" + week + "]:Goto[" + goto + "]"
+        diffchr = DiffChart(str_, TTMGoto._MARKERS)
+
+        # ---------- Cumulative Sum-chart ----------
+        str_ = "Cumulative Sum-chart Week[" + week + "]:Goto[" + goto + "]"
+        sumchr = SumChart(str_, TTMGoto._MARKERS)
+
+        # ---------- Correlation Plot ----------
+        str_ = "Correlation plot Week[" + week + "]:Goto[" + goto + "]"
+        corrplt = CorrPlot(str_)
+
+        # ---------- Text ----------
+        sampcnt = TextInput(value="", title="サンプル数:",
+                            width=100, sizing_mode="fixed")
+
+        spans = self.__cb_js_cursol.args["spans"]
+        spans = spans + [diffchr.vl_cursol, sumchr.vl_cursol]
+        self.__cb_js_cursol.args = dict(spans=spans, ofs=ChartAbs.CHART_OFS)
+        diffchr.fig.js_on_event(events.MouseMove, self.__cb_js_cursol)
+        sumchr.fig.js_on_event(events.MouseMove, self.__cb_js_cursol)
+
+        diffchr.fig.on_event(events.Tap, self.__cb_chart_tap)
+        sumchr.fig.on_event(events.Tap, self.__cb_chart_tap)
+
+        panel = (diffchr, sumchr, corrplt, sampcnt)
+        self.__panels[pos] = panel
+
+        if pos in self.__smmres:
+            self.__update_panel(pos)
+
+        txtin = column(children=[sampcnt], sizing_mode="fixed")
+        plotfig = column(children=[diffchr.fig, sumchr.fig],
+                         sizing_mode="fixed")
+        plotrow = row(children=[txtin, plotfig, corrplt.fig])
+        self.__tabs_smm.tabs[pos].child.children = [plotrow]
+
+        return panel
+
+    def __update_panel(self, pos):
+        """集計結果パネルを更新する[update summary panel]
+        引数[Args]:
+            pos (int) : パネル位置[panel position]
+        戻り値[Returns]:
+            なし[None]
+        """
+        diffchr, sumchr, corrplt, sampcnt = self.__panels[pos]
+        inst_id, dfdiff, ydiff, dfsum, ysum, cntstr = self.__smmres[pos]
+
+        diffchr.update(inst_id, dfdiff, ydiff[0], ydiff[1])
+        sumchr.update(inst_id, dfsum, ysum[0], ysum[1])
+        sampcnt.value = cntstr
+
+        if self.__selidx is not None:
+            diffchr.update_vl_select(self.__selidx)
+            sumchr.update_vl_select(self.__selidx)
+
+        args = self.__get_corrplot_args(pos, self.__selidx)
+        if args is None:
+            corrplt.clear()
+        else:
+            corrplt.update(*args)
+
     def __cb_btn_run(self):
         """Widget Button(実行)コールバックメソッド
            [Callback method of Widget Button(Execute)]
@@ -883,7 +969,11 @@ class TTMGoto(AnalysisAbs):
         戻り値[Returns]:
             なし[None]
         """
-        for corrplt in self.__corrpltlist:
+        self.__smmres = {}
+        self.__corrdata = {}
+        self.__corrabsmax = np.empty(0)
+        self.__selidx = None
+        for _, _, corrplt, _ in self.__panels.values():
             corrplt.clear()
 
         dfsmm = self.__dfsmm
@@ -899,7 +989,7 @@ class TTMGoto(AnalysisAbs):
         end_ = utl.limit_upper(end_, yesterday)
 
         # search Goto-Days
-        dfgoto = self.__search_goto_day(str_, end_)
+        dfgoto = self.__STUDY.group(utl.extract_workdays(str_, end_))
 
         if dfgoto.empty:
             print("リストは空です")
@@ -908,6 +998,7 @@ class TTMGoto(AnalysisAbs):
             df = pd.DataFrame()
             inst_id = self.instrument_id
 
+            datelist = []
             cnt = 0
             for date_, srrow in dfgoto.iterrows():
 
@@ -922,12 +1013,13 @@ class TTMGoto(AnalysisAbs):
                                                      str_dt, end_dt)
 
                     # *************** 5分足チャート ***************
-                    str_dt = dt.datetime.combine(date_, dt.time(8, 30))
-                    end_dt = dt.datetime.combine(date_, dt.time(12, 0))
-                    gran = OandaGrn.M5
-
-                    csd5m = self.__fetch_candlestick(inst_id, gran,
-                                                     str_dt, end_dt)
+                    gran = self.__STUDY.granularity
+                    df5m = IntradayCache.get(inst_id, gran, date_)
+                    str_dt = dt.datetime.combine(date_, _TM0830)
+                    end_dt = dt.datetime.combine(date_, _TM1200)
+                    df5m = df5m[(str_dt <= df5m.index)
+                                & (df5m.index < end_dt)]
+                    csd5m = CandleStickData.from_dataframe(gran, df5m)
 
                 except ValueError:
                     print("-----[Caution] Invalid Date found:[{}]"
@@ -937,36 +1029,39 @@ class TTMGoto(AnalysisAbs):
 
                 # 移動平均線
                 self.__csc1h.calc_sma(csd1h, 20)
-                sma_sr = csd1h.df[SimpleMovingAverage.LBL_SMA_M]
+                sma_sr = csd1h.indicators.series(
+                    SimpleMovingAverage.LBL_SMA_M)
 
                 # 線形近似
                 slope, l2p = self.__calc_linear_slope(date_, sma_sr)
 
-                try:
-                    # ---------- Extraction 9:00～9:55 chart ----------
-                    d900 = self.__extract_from_900_to_955(date_, csd5m,
-                                                          inst_id)
+                datelist.append((date_, srrow, slope, l2p))
+                self.__csdlist_1h.append(csd1h)
+                self.__csdlist_5m.append(csd5m)
 
-                    # ---------- Extraction 9:55～10:30 chart ----------
-                    d955 = self.__extract_from_955_to_1030(date_, csd5m,
-                                                           inst_id)
+                cnt += 1
+                print("{} / {}" .format(cnt, len(dfgoto)))
 
-                    tm = dt.time(hour=9, minute=50)
-                    cs950 = self.__extract_diff_candlestick(
-                        tm, date_, csd5m, inst_id)
+            # ---------- Extraction (all days at once) ----------
+            dfevt = self.__STUDY.run(inst_id, [d[0] for d in datelist])
+            feats = dfevt[[f.name for f in self.__STUDY.features]].values
+            vldflg = ~np.isnan(feats).any(axis=1)
 
-                    tm = dt.time(hour=9, minute=55)
-                    cs955 = self.__extract_diff_candlestick(
-                        tm, date_, csd5m, inst_id)
+            csdlist_1h = []
+            csdlist_5m = []
+            reclist = []
+            for k, (date_, srrow, slope, l2p) in enumerate(datelist):
 
-                except KeyError:
+                if not vldflg[k]:
                     print("-----[Caution] Can't extract data Due to Invalid \
                             Date:[{}]".format(str(date_)))
                     continue
 
                 # ---------- output ----------
-                self.__csdlist_1h.append(csd1h)
-                self.__csdlist_5m.append(csd5m)
+                csdlist_1h.append(self.__csdlist_1h[k])
+                csdlist_5m.append(self.__csdlist_5m[k])
+
+                d900, d955, cs950, cs955 = feats[k]
 
                 # *************** 出力 ***************
                 record = pd.Series([srrow[TTMGoto.LBL_WEEK],
@@ -979,13 +1074,16 @@ class TTMGoto(AnalysisAbs):
                                     l2p],
                                    index=self.__dfsmm.columns,
                                    name=date_)
-                dfsmm = dfsmm.append(record)
+                reclist.append(record)
 
                 # make OHCL data-frame
-                df = self.__append_ohcl_df(df, csd5m, date_, srrow)
+                df = self.__append_ohcl_df(df, self.__csdlist_5m[k],
+                                           date_, srrow)
 
-                cnt += 1
-                print("{} / {}" .format(cnt, len(dfgoto)))
+            self.__csdlist_1h = csdlist_1h
+            self.__csdlist_5m = csdlist_5m
+            if reclist:
+                dfsmm = pd.DataFrame(reclist, columns=self.__dfsmm.columns)
 
             idx = [TTMGoto.LBL_OHLC, TTMGoto.LBL_DATE,
                    TTMGoto.LBL_WEEK, TTMGoto.LBL_GOTO]
@@ -1041,17 +1139,16 @@ class TTMGoto(AnalysisAbs):
                     idx = clavesum.T.index
                     dfsum = pd.DataFrame(index=idx, columns=col)
 
+                # 表示中のパネルのみ更新する[update only created panels]
                 pos = i * len(TTMGoto._GOTO_DICT) + j
-                diffchr = self.__diffchrlist[pos]
-                diffchr.update(inst_id, dfdiff, y_diff_min, y_diff_max)
-
-                diffsum = self.__diffsumlist[pos]
-                diffsum.update(inst_id, dfsum, y_sum_min, y_sum_max)
+                self.__smmres[pos] = (inst_id,
+                                      dfdiff, (y_diff_min, y_diff_max),
+                                      dfsum, (y_sum_min, y_sum_max),
+                                      str(cnt) + " / " + str(dfparam))
+                if pos in self.__panels:
+                    self.__update_panel(pos)
 
-                sampcnt = self.__sampcntlist[pos]
-                sampcnt.value = str(cnt) + " / " + str(dfparam)
-
-                self.__dfall = df
+            self.__build_corrplot_index(df)
 
         # 表示更新
         srweek = dfsmm[TTMGoto.LBL_WEEK].replace(self._WEEK_DICT)
@@ -1116,53 +1213,6 @@ class TTMGoto(AnalysisAbs):
 
         return slope, l2p
 
-    def __search_goto_day(self, str_, end_):
-
-        cols = [TTMGoto.LBL_WEEK,
-                TTMGoto.LBL_GOTO]
-        dfgoto = pd.DataFrame(columns=cols)
-
-        nextdate = end_ + dt.timedelta(days=1)
-        nextmonth = nextdate.month
-
-        lastday_flg = False
-        gotoday_flg = False
-
-        for n in range((end_ - str_ + dt.timedelta(days=1)).days):
-            date_ = end_ - dt.timedelta(n)
-            weekdayno = date_.weekday()
-
-            # 月末判定
-            if not date_.month == nextmonth:
-                lastday_flg = True
-
-            # ゴトー日判定
-            if date_.day in self._MLT_FIVE_LIST:
-                gotoday_flg = True
-
-            # 平日判定
-            if (weekdayno < 5) and not jpholiday.is_holiday(date_):
-
-                if lastday_flg or gotoday_flg:
-                    target = TTMGoto.TRUE
-                    lastday_flg = False
-                    gotoday_flg = False
-                else:
-                    target = TTMGoto.FALSE
-
-                # 出力
-                record = pd.Series([weekdayno,
-                                    target],
-                                   index=dfgoto.columns,
-                                   name=date_)
-                dfgoto = dfgoto.append(record)
-
-            nextmonth = date_.month
-
-        dfgoto.sort_index(inplace=True)
-
-        return dfgoto
-
     @retry(stop_max_attempt_number=5,
            wait_fixed=500,
            retry_on_exception=_retry_if_connection_error)
@@ -1186,46 +1236,6 @@ class TTMGoto(AnalysisAbs):
 
         return csd
 
-    def __extract_from_900_to_955(self, date_, csd5m, inst_id):
-
-        strtm = dt.time(hour=9, minute=0)
-        strdttm = str(dt.datetime.combine(date_, strtm))
-        endtm = dt.time(hour=9, minute=50)
-        enddttm = str(dt.datetime.combine(date_, endtm))
-
-        openpri = csd5m.df.loc[strdttm, cs.LBL_OPEN]
-        closepri = csd5m.df.loc[enddttm, cs.LBL_CLOSE]
-
-        diff0900h = OandaIns.normalize(inst_id, closepri - openpri)
-
-        return diff0900h
-
-    def __extract_from_955_to_1030(self, date_, csd5m, inst_id):
-
-        strtm = dt.time(hour=9, minute=55)
-        strdttm = str(dt.datetime.combine(date_, strtm))
-        endtm = dt.time(hour=10, minute=25)
-        enddttm = str(dt.datetime.combine(date_, endtm))
-
-        openpri = csd5m.df.loc[strdttm, cs.LBL_OPEN]
-        df5m = csd5m.df[strdttm:enddttm]
-
-        minpri = df5m[cs.LBL_LOW].min()
-        diff0955l = OandaIns.normalize(inst_id, minpri - openpri)
-
-        return diff0955l
-
-    def __extract_diff_candlestick(self, tm, date_, csd5m, inst_id):
-
-        dttm = str(dt.datetime.combine(date_, tm))
-
-        openpri = csd5m.df.loc[dttm, cs.LBL_OPEN]
-        closepri = csd5m.df.loc[dttm, cs.LBL_CLOSE]
-
-        cslen = OandaIns.normalize(inst_id, closepri - openpri)
-
-        return cslen
-
     def __append_ohcl_df(self, df, csd, date_, srrow):
 
         # 集計
@@ -1291,22 +1301,66 @@ class TTMGoto(AnalysisAbs):
 
         return dfsum
 
-    def __cb_chart_mousemove(self, event):
-        """Event mouse move(チャート)コールバックメソッド
-           [Callback method of mouse move event(Chart)]
+    def __build_corrplot_index(self, df):
+        """相関図データを時間帯ごとに参照できる形で前計算する
+           [precompute correlation plot data for lookup by time slot]
         引数[Args]:
-            event (str) : An event name on this object
+            df (DataFrame) : 全OHLC差分データ[all OHLC difference data]
         戻り値[Returns]:
             なし[None]
         """
-        if event.x is not None:
-            idx = math.floor(event.x + DiffChart.CHART_OFS)
+        dfcl = df.loc[cs.LBL_CLOSE, :].sort_index(
+            level=[TTMGoto.LBL_WEEK, TTMGoto.LBL_GOTO, TTMGoto.LBL_DATE])
+        dfcl = dfcl[self.__timelist]
+
+        dates = dfcl.index.get_level_values(TTMGoto.LBL_DATE)
+        yearary = np.array([d.year for d in dates])
+
+        # 年ごとの色[colour for each year]
+        years = np.unique(yearary)
+        colary = np.array(Pastel1_9)[np.searchsorted(years, yearary)
+                                     % len(Pastel1_9)]
+
+        mat = dfcl.values.astype(np.float64)
+        self.__corrabsmax = np.nanmax(np.abs(mat), axis=0)
+
+        weekary = dfcl.index.get_level_values(TTMGoto.LBL_WEEK).values
+        gotoary = dfcl.index.get_level_values(TTMGoto.LBL_GOTO).values
+        posary = weekary.astype(int) * len(TTMGoto._GOTO_DICT) + \
+            gotoary.astype(int)
+
+        self.__corrdata = {}
+        for pos in np.unique(posary):
+            flg = posary == pos
+            yeargrp = yearary[flg]
+            _, first = np.unique(yeargrp, return_index=True)
+            yearsidx = [(int(yeargrp[k]), int(k)) for k in first]
+            self.__corrdata[int(pos)] = (mat[flg],
+                                         colary[flg].tolist(),
+                                         list(dates[flg]),
+                                         yearsidx)
+
+    def __get_corrplot_args(self, pos, idx):
+        """相関図の更新引数を取得する[get update arguments of correlation plot]
+        引数[Args]:
+            pos (int) : パネル位置[panel position]
+            idx (int) : 選択時間帯[selected time slot]
+        戻り値[Returns]:
+            args (tuple) : CorrPlot.update引数（データなしの場合はNone）
+                           [CorrPlot.update arguments (None if no data)]
+        """
+        MARGINE = 1.2
 
-            for diffchr in self.__diffchrlist:
-                diffchr.update_vl_cursol(idx)
+        if (idx is None) or (pos not in self.__corrdata):
+            return None
 
-            for diffsum in self.__diffsumlist:
-                diffsum.update_vl_cursol(idx)
+        idx_pre = max(idx - 1, 0)
+        mat, clist, dlist, yearsidx = self.__corrdata[pos]
+        absmax = self.__corrabsmax
+        maxval = max(absmax[idx_pre], absmax[idx]) * MARGINE
+
+        return (mat[:, idx_pre], mat[:, idx], clist, dlist,
+                maxval, yearsidx)
 
     def __cb_chart_tap(self, event):
         """Event tap(チャート)コールバックメソッド
@@ -1318,66 +1372,16 @@ class TTMGoto(AnalysisAbs):
         """
         if event.x is not None:
 
-            LBL_YEAR = "year"
-            LBL_COLOR = "color"
-            MARGINE = 1.2
-
             idx = math.floor(event.x + DiffChart.CHART_OFS)
+            if not (0 <= idx < len(self.__timelist)):
+                return
 
-            for diffchr in self.__diffchrlist:
+            self.__selidx = idx
+            for pos, panel in self.__panels.items():
+                diffchr, sumchr, corrplt, _ = panel
                 diffchr.update_vl_select(idx)
+                sumchr.update_vl_select(idx)
 
-            for diffsum in self.__diffsumlist:
-                diffsum.update_vl_select(idx)
-
-            if idx == 0:
-                idx_pre = 0
-            else:
-                idx_pre = idx - 1
-
-            col_tm = self.__timelist[idx]
-            col_tmpre = self.__timelist[idx_pre]
-
-            dfcl = self.__dfall.loc[cs.LBL_CLOSE, :]
-            df = dfcl[[col_tmpre, col_tm]]
-            df = df.reset_index(TTMGoto.LBL_DATE)
-            idxnew = [s.year for s in df[TTMGoto.LBL_DATE]]
-            df[LBL_YEAR] = idxnew
-
-            # Year重複削除
-            years = list(set(idxnew))
-
-            colvals = []
-            for x in range(len(years)):
-                colvals.append(Pastel1_9[x])
-            d = dict(zip(years, colvals))
-            collist = [d[s] for s in idxnew]
-            df[LBL_COLOR] = collist
-            dftmp = df[[col_tmpre, col_tm]]
-
-            max_ = dftmp.max().max()
-            min_ = dftmp.min().min()
-            maxval = max([math.fabs(max_), math.fabs(min_)]) * MARGINE
-
-            df = df.sort_index()
-            week_keys = TTMGoto._WEEK_DICT.keys()
-            goto_keys = TTMGoto._GOTO_DICT.keys()
-            for i, j in itertools.product(week_keys, goto_keys):
-
-                try:
-                    df1 = df.loc[(i, j), :]
-                except KeyError as e:
-                    print("{} are not exist!" .format(e))
-                    continue
-
-                xlist = df1[col_tmpre].tolist()
-                ylist = df1[col_tm].tolist()
-                clist = df1[LBL_COLOR].tolist()
-                dlist = df1[TTMGoto.LBL_DATE].tolist()
-                yearlist = df1[LBL_YEAR].tolist()
-
-                pos = i * len(TTMGoto._GOTO_DICT) + j
-                corrplt = self.__corrpltlist[pos]
-
-                yearsidx = [(y, yearlist.index(y)) for y in set(yearlist)]
-                corrplt.update(xlist, ylist, clist, dlist, maxval, yearsidx)
+                args = self.__get_corrplot_args(pos, idx)
+                if args is not None:
+                    corrplt.update(*args)
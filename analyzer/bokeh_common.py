@@ -4,9 +4,33 @@
 # author       たっきん
 # ==============================================================================
 from abc import ABCMeta
+import numpy as np
 from analyzer.oanda_common import OandaGrn
 
 
+def to_ms_array(index):
+    """"日時をエポックミリ秒配列に変換する[convert datetime to epoch ms array]
+
+        datetime64配列はバイナリでブラウザへ送信される。
+        [datetime64 arrays are sent to the browser as binary buffers]
+    引数[Args]:
+        index (DatetimeIndex) : 日時インデックス[datetime index]
+    戻り値[Returns]:
+        ary (ndarray) : エポックミリ秒(float64)[epoch ms (float64)]
+    """
+    return np.asarray(index, dtype="datetime64[ms]").astype(np.float64)
+
+
+def to_float_array(sr):
+    """"数値をfloat64配列に変換する[convert values to float64 array]
+    引数[Args]:
+        sr (Series) : 数値シリーズ[numeric series]
+    戻り値[Returns]:
+        ary (ndarray) : float64配列[float64 array]
+    """
+    return np.asarray(sr, dtype=np.float64)
+
+
 class AxisTyp(object):
     """ AxisTyp - BoKehパラメータ定義クラス。"""
 
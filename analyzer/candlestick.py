@@ -1,15 +1,23 @@
+from bokeh import events
 from bokeh.models import Range1d, RangeTool, ColumnDataSource
-from bokeh.models import HoverTool
+from bokeh.models import HoverTool, LinearColorMapper, CustomJS
 from bokeh.plotting import figure
 from bokeh.models.glyphs import Segment, VBar, Line
+from bokeh.transform import transform
 from oandapyV20 import API
+from oandapyV20.exceptions import V20Error
 from retrying import retry
+from requests.exceptions import RequestException
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from analyzer.bokeh_common import GlyphVbarAbs, ToolType, AxisTyp
+from analyzer.bokeh_common import to_ms_array, to_float_array
 from analyzer.oanda_common import OandaEnv, OandaRsp, OandaGrn
 from analyzer.utils import DateTimeManager
 from analyzer.technical import SimpleMovingAverage, MACD, BollingerBands
+from analyzer.technical import IndicatorCache, IndicatorPlot, get_indicators
 import oandapyV20.endpoints.instruments as it
+import threading
 import pandas as pd
 import numpy as np
 import analyzer.config as cfg
@@ -24,6 +32,19 @@ LBL_LOW = "low"
 LBL_CLOSE = "close"
 
 
+def _is_transient(err):
+    """"再試行すべき一時的なエラーか判定する[judge transient error to retry]
+    引数[Args]:
+        err (Exception) : 例外[exception]
+    戻り値[Returns]:
+        flg (bool) : 通信エラーまたはサーバエラー(5xx)の場合True
+                     [True on connection or server (5xx) error]
+    """
+    if isinstance(err, V20Error):
+        return 500 <= err.code
+    return isinstance(err, (ConnectionError, RequestException))
+
+
 class CandleGlyph(GlyphVbarAbs):
     """ CandleGlyph
             - ローソク図形定義クラス[Candle stick glyph definition class]
@@ -33,37 +54,72 @@ class CandleGlyph(GlyphVbarAbs):
     YLO = "ylo"
     YOP = "yop"
     YCL = "ycl"
+    YDR = "ydr"
+
+    # ローソク足の向き[direction of a candlestick]
+    DIR_DEC = -1
+    DIR_EQU = 0
+    DIR_INC = 1
 
-    def __init__(self, pltmain, pltrng, color_):
+    # レンジフィギュアの1本あたりの画素数[pixels per candle on range figure]
+    LOD_PX = 2
+
+    def __init__(self, pltmain, pltrng, inc_color, dec_color, equ_color):
         """"コンストラクタ[Constructor]
         引数[Args]:
             pltmain (figure) : メインフィギュアオブジェクト[main figure object]
             pltrng (figure) : レンジフィギュアオブジェクト[range figure object]
-            color_ (str) : カラーコード[Color code(ex "#E73B3A")]
+            inc_color (str) : 陽線のカラーコード[Color code of increase]
+            dec_color (str) : 陰線のカラーコード[Color code of decrease]
+            equ_color (str) : 同値のカラーコード[Color code of equal]
         """
         self.__WIDE_SCALE = 0.8
-        self.__COLOR = color_
 
         super().__init__(self.__WIDE_SCALE)
 
+        # 全ローソク足を1つのソースに持ち、向きで色分けする
+        # [one source holds all candles, colored by direction]
         self.__src = ColumnDataSource({self.XDT: [], self.YHI: [],
                                        self.YLO: [], self.YOP: [],
-                                       self.YCL: []})
+                                       self.YCL: [], self.YDR: []})
+
+        mapper = LinearColorMapper(palette=[dec_color, equ_color, inc_color],
+                                   low=self.DIR_DEC, high=self.DIR_INC)
+        color_ = transform(self.YDR, mapper)
 
         self.__glyseg = Segment(x0=self.XDT, y0=self.YLO, x1=self.XDT,
                                 y1=self.YHI, line_color="white",
                                 line_width=2)
         self.__glvbar = VBar(x=self.XDT, top=self.YOP, bottom=self.YCL,
-                             fill_color=self.__COLOR, line_width=0,
-                             line_color=self.__COLOR)
+                             fill_color=color_, line_width=0,
+                             line_color=color_)
 
         self.__pltmain = pltmain
         self.__ren = self.__pltmain.add_glyph(self.__src, self.__glyseg)
         self.__pltmain.add_glyph(self.__src, self.__glvbar)
 
+        # レンジフィギュアは間引いたソースで描画する
+        # [range figure is drawn from a downsampled source]
+        self.__srclod = ColumnDataSource({self.XDT: [], self.YHI: [],
+                                          self.YLO: [], self.YOP: [],
+                                          self.YCL: [], self.YDR: []})
+
+        self.__glysegl = Segment(x0=self.XDT, y0=self.YLO, x1=self.XDT,
+                                 y1=self.YHI, line_color="white",
+                                 line_width=1)
+        self.__glvbarl = VBar(x=self.XDT, top=self.YOP, bottom=self.YCL,
+                              fill_color=color_, line_width=0,
+                              line_color=color_)
+
         self.__pltrng = pltrng
-        self.__pltrng.add_glyph(self.__src, self.__glyseg)
-        self.__pltrng.add_glyph(self.__src, self.__glvbar)
+        self.__pltrng.add_glyph(self.__srclod, self.__glysegl)
+        self.__pltrng.add_glyph(self.__srclod, self.__glvbarl)
+
+        # 描画幅(ブラウザで算出)が変わったら間引き本数を合わせる
+        # [follow the drawing width (computed in the browser)]
+        self.__lodsrc = None
+        self.__lodwidth = 0
+        self.__pltrng.on_change("inner_width", self.__cb_inner_width)
 
     @property
     def render(self):
@@ -84,15 +140,96 @@ class CandleGlyph(GlyphVbarAbs):
         戻り値[Returns]:
             なし[None]
         """
-        self.__src.data = {
-            self.XDT: df.index.tolist(),
-            self.YHI: df[LBL_HIGH].tolist(),
-            self.YLO: df[LBL_LOW].tolist(),
-            self.YOP: df[LBL_OPEN].tolist(),
-            self.YCL: df[LBL_CLOSE].tolist()
-        }
+        xdt = to_ms_array(df.index)
+        yhi = to_float_array(df[LBL_HIGH])
+        ylo = to_float_array(df[LBL_LOW])
+        yop = to_float_array(df[LBL_OPEN])
+        ycl = to_float_array(df[LBL_CLOSE])
+
+        self.__src.data = self.__make_data(xdt, yhi, ylo, yop, ycl)
+
+        width = self.get_width(gran)
+        self.__glvbar.width = width
+
+        self.__lodsrc = (xdt, yhi, ylo, yop, ycl)
+        self.__lodwidth = width
+        self.__update_lod()
+
+    @property
+    def lod_max(self):
+        """"レンジフィギュアの最大本数を取得する
+            [get max number of candles on range figure]
 
-        self.__glvbar.width = self.get_width(gran)
+            描画幅の画素数から決める(未算出の場合はplot_width)。
+            [derived from the drawing width in pixels (plot_width until
+             the browser computes it)]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            num (int) : 最大本数[max number of candles]
+        """
+        pixel = self.__pltrng.inner_width or self.__pltrng.plot_width
+        return max(1, pixel // self.LOD_PX)
+
+    def __cb_inner_width(self, attr, old, new):
+        if self.__lodsrc is not None:
+            self.__update_lod()
+
+    def __update_lod(self):
+        """"レンジフィギュア(LOD)を更新する[update range figure (LOD)]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        xdt, yhi, ylo, yop, ycl = self.__lodsrc
+        step = max(1, -(-len(xdt) // self.lod_max))
+        if 1 < step:
+            # 高値・安値を保ったままstep本ずつ集約する
+            # [aggregate every step candles keeping high and low]
+            head = np.arange(0, len(xdt), step)
+            tail = np.append(head[1:], len(xdt)) - 1
+            xdt = (xdt[head] + xdt[tail]) / 2
+            yhi = np.maximum.reduceat(yhi, head)
+            ylo = np.minimum.reduceat(ylo, head)
+            yop = yop[head]
+            ycl = ycl[tail]
+
+        self.__srclod.data = self.__make_data(xdt, yhi, ylo, yop, ycl)
+        self.__glvbarl.width = self.__lodwidth * step
+
+    def update_view(self, df, width):
+        """"メインフィギュアのデータのみ設定する[set glyph date of main figure only]
+        引数[Args]:
+            df (pandas data frame) : pandasデータフレーム[pandas data frame]
+            width (float) : ローソク足1本の期間(ミリ秒)[period of a candle (ms)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__src.data = self.__make_data(to_ms_array(df.index),
+                                           to_float_array(df[LBL_HIGH]),
+                                           to_float_array(df[LBL_LOW]),
+                                           to_float_array(df[LBL_OPEN]),
+                                           to_float_array(df[LBL_CLOSE]))
+        self.__glvbar.width = width * self.__WIDE_SCALE
+
+    def __make_data(self, xdt, yhi, ylo, yop, ycl):
+        """"ソースデータを生成する[make source data]
+        引数[Args]:
+            xdt (ndarray) : 日時(エポックミリ秒)[datetime (epoch ms)]
+            yhi (ndarray) : 高値[high price]
+            ylo (ndarray) : 安値[low price]
+            yop (ndarray) : 始値[open price]
+            ycl (ndarray) : 終値[close price]
+        戻り値[Returns]:
+            dict_ (dict) : ソースデータ[source data]
+        """
+        return {self.XDT: xdt,
+                self.YHI: yhi,
+                self.YLO: ylo,
+                self.YOP: yop,
+                self.YCL: ycl,
+                self.YDR: np.sign(ycl - yop)}
 
 
 class OrdersVLineGlyph(object):
@@ -123,6 +260,16 @@ class OrdersVLineGlyph(object):
         self.__plt = plt
         self.__plt.add_glyph(self.__src, self.__glvline)
 
+    @property
+    def source(self):
+        """"データソースを取得する[get data source]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            src (ColumnDataSource) : データソース[data source]
+        """
+        return self.__src
+
     def update(self, dict_):
         """"データを更新する[update glyph data]
         引数[Args]:
@@ -144,11 +291,390 @@ class OrdersVLineGlyph(object):
         self.__src.data = dict_
 
 
+class CandleStore(object):
+    """ CandleStore
+            - ローソク足ストアクラス[Candlestick store class]
+
+        取得したローソク足を(通貨ペア, 時間足)ごとに保持し、
+        表示範囲に応じて最も細かい時間足から集約して返す。
+        [keeps fetched candles per (instrument, granularity) and serves
+         the visible range aggregated from the finest granularity]
+
+        保持する本数の合計はMAX_ROWSまでとし、最も古く参照された
+        (通貨ペア, 時間足)から破棄する。
+        [total candles held are limited to MAX_ROWS and the least
+         recently used (instrument, granularity) is discarded first]
+    """
+
+    # 1リクエストの最大本数[max candles per request]
+    MAX_COUNT = 5000
+    # 保持する最大本数[max candles held]
+    MAX_ROWS = 1000000
+    # 集約元の最大本数[max candles to aggregate from]
+    AGG_MAX = 200000
+
+    # 時間足の秒数(細かい順)[seconds of granularity (finest first)]
+    GRAN_SEC = OrderedDict([
+        (OandaGrn.S5, 5),
+        (OandaGrn.S10, 10),
+        (OandaGrn.S15, 15),
+        (OandaGrn.S30, 30),
+        (OandaGrn.M1, 60),
+        (OandaGrn.M2, 2 * 60),
+        (OandaGrn.M3, 3 * 60),
+        (OandaGrn.M4, 4 * 60),
+        (OandaGrn.M5, 5 * 60),
+        (OandaGrn.M10, 10 * 60),
+        (OandaGrn.M15, 15 * 60),
+        (OandaGrn.M30, 30 * 60),
+        (OandaGrn.H1, 60 * 60),
+        (OandaGrn.H2, 2 * 60 * 60),
+        (OandaGrn.H3, 3 * 60 * 60),
+        (OandaGrn.H4, 4 * 60 * 60),
+        (OandaGrn.H6, 6 * 60 * 60),
+        (OandaGrn.H8, 8 * 60 * 60),
+        (OandaGrn.H12, 12 * 60 * 60),
+        (OandaGrn.D, 24 * 60 * 60),
+        (OandaGrn.W, 7 * 24 * 60 * 60),
+    ])
+
+    # 表示範囲の集約に使う時間足(秒足は日時変換が分単位のため除く)
+    # [granularities for visible range (seconds are excluded because
+    #  datetime conversion is minute-based)]
+    VIEW_GRAN = [gran for gran, sec in GRAN_SEC.items() if 60 <= sec]
+
+    __DT_FMT = "%Y-%m-%dT%H:%M:00.000000000Z"
+
+    def __init__(self, api):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            api (API) : OANDA APIオブジェクト[OANDA API object]
+        """
+        self.__api = api
+        self.__dfdict = OrderedDict()
+        self.__covdict = {}
+        # 取得・統合・切り出しを排他する(ワーカーと画面側から呼ばれる)
+        # [serialize request/merge/slice (called from worker and document)]
+        self.__lock = threading.RLock()
+
+    def fetch(self, gran, inst, dtmstr, dtmend):
+        """"ローソク足をAPIから取得する[fetch candles from API]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            dtmstr (DateTimeManager) : 開始日時[from date]
+            dtmend (DateTimeManager) : 終了日時[to date]
+        戻り値[Returns]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+        """
+        str_ = pd.Timestamp(dtmstr.tokyo)
+        end_ = pd.Timestamp(dtmend.tokyo)
+        with self.__lock:
+            self.__request(gran, inst, str_, end_)
+            return self.__slice(gran, inst, str_, end_)
+
+    def get(self, gran, inst, str_, end_):
+        """"ローソク足を取得する(未取得の期間のみAPIから取得する)
+            [get candles (fetch only missing periods from API)]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+        戻り値[Returns]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+        """
+        with self.__lock:
+            for gapstr, gapend in self.__missing(gran, inst, str_, end_):
+                self.__request(gran, inst, gapstr, gapend)
+            return self.__slice(gran, inst, str_, end_)
+
+    def viewport(self, inst, str_, end_, bars):
+        """"表示範囲のローソク足を集約して取得する
+            [get candles of visible range aggregated]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+            bars (int) : 最大本数[max number of candles]
+        戻り値[Returns]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+            width (float) : ローソク足1本の期間(ミリ秒)[period of a candle (ms)]
+        """
+        end_ = min(end_, pd.Timestamp(datetime.now()))
+        span = max((end_ - str_).total_seconds(), 1)
+
+        # 最大本数以内になる最も細かい時間足
+        # [finest granularity within max number of candles]
+        target = next((gran for gran in self.VIEW_GRAN
+                       if span / self.GRAN_SEC[gran] <= bars), OandaGrn.W)
+
+        # 範囲を取得済みのより細かい時間足があれば集約元にする
+        # [aggregate from a finer granularity if it is already fetched]
+        with self.__lock:
+            source = target
+            for gran in self.VIEW_GRAN:
+                if gran == target:
+                    break
+                if (span / self.GRAN_SEC[gran] <= self.AGG_MAX
+                        and not self.__missing(gran, inst, str_, end_)):
+                    source = gran
+                    break
+
+            df = self.get(source, inst, str_, end_)
+
+        sec = self.GRAN_SEC[source]
+        bucket = max(1, int(np.ceil(span / bars / sec))) * sec
+
+        return self.aggregate(df, bucket), bucket * 1000
+
+    def granularity(self, bucket):
+        """"集約時間幅以下で最も粗い時間足を取得する
+            [get coarsest granularity not exceeding the bucket]
+        引数[Args]:
+            bucket (float) : 集約する時間幅(秒)[time bucket (seconds)]
+        戻り値[Returns]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+        """
+        gran = self.VIEW_GRAN[0]
+        for cand in self.VIEW_GRAN:
+            if self.GRAN_SEC[cand] <= bucket:
+                gran = cand
+        return gran
+
+    @staticmethod
+    def aggregate(df, bucket):
+        """"ローソク足を時間幅ごとに集約する[aggregate candles per time bucket]
+        引数[Args]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+            bucket (int) : 集約する時間幅(秒)[time bucket (seconds)]
+        戻り値[Returns]:
+            df (DataFrame) : 集約後のデータフレーム[aggregated data frame]
+        """
+        if df.empty:
+            return df
+
+        key = df.index.values.astype("datetime64[s]").astype(np.int64)
+        key = key // bucket
+        head = np.flatnonzero(np.diff(key, prepend=key[0] - 1))
+        tail = np.append(head[1:], len(key)) - 1
+
+        if len(head) == len(key):
+            return df
+
+        return pd.DataFrame({
+            LBL_VOLUME: np.add.reduceat(df[LBL_VOLUME].values, head),
+            LBL_OPEN: df[LBL_OPEN].values[head],
+            LBL_HIGH: np.maximum.reduceat(df[LBL_HIGH].values, head),
+            LBL_LOW: np.minimum.reduceat(df[LBL_LOW].values, head),
+            LBL_CLOSE: df[LBL_CLOSE].values[tail],
+        }, index=df.index[head])
+
+    def __request(self, gran, inst, str_, end_):
+        """"期間を分割してAPIへリクエストする[request API per chunk]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        sec = self.GRAN_SEC.get(gran, self.GRAN_SEC[OandaGrn.W])
+        chunk = timedelta(seconds=sec * self.MAX_COUNT)
+
+        dflist = []
+        covend = end_
+        chkstr = str_
+        while chkstr < end_:
+            chkend = min(chkstr + chunk, end_)
+            params_ = {
+                # "alignmentTimezone": "Japan",
+                "from": DateTimeManager(chkstr).gmt.strftime(self.__DT_FMT),
+                "to": DateTimeManager(chkend).gmt.strftime(self.__DT_FMT),
+                "granularity": gran
+            }
+
+            # APIへ過去データをリクエスト
+            ic = it.InstrumentsCandles(instrument=inst, params=params_)
+            try:
+                self.__api.request(ic)
+            except Exception as err:
+                raise err
+
+            dflist.append(self.__convert_dataframe(ic, gran))
+            chkstr = chkend
+
+            # 未確定の足は取得済み期間に含めず、次回再取得する
+            # [incomplete candles are left out of the covered period
+            #  so they are fetched again next time]
+            partial = self.__first_incomplete(ic, gran)
+            if partial is not None:
+                covend = min(covend, partial)
+
+        key = (inst, gran)
+        if key in self.__dfdict:
+            dflist.insert(0, self.__dfdict[key])
+        df = pd.concat(dflist)
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        self.__dfdict[key] = df
+        self.__dfdict.move_to_end(key)
+
+        # 取得済み期間を統合する[merge fetched periods]
+        covlist = self.__covdict.get(key, [])
+        if str_ < covend:
+            covlist = covlist + [(str_, covend)]
+        if not covlist:
+            return
+        covlist = sorted(covlist)
+        merged = [covlist[0]]
+        for covstr, covend in covlist[1:]:
+            if covstr <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], covend))
+            else:
+                merged.append((covstr, covend))
+        self.__covdict[key] = merged
+
+        self.__evict()
+
+    def __evict(self):
+        """"保持本数を超えた分を古い順に破棄する
+            [discard least recently used candles over the limit]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        rows = sum(len(df) for df in self.__dfdict.values())
+        while self.MAX_ROWS < rows and 1 < len(self.__dfdict):
+            key, df = self.__dfdict.popitem(last=False)
+            self.__covdict.pop(key, None)
+            rows -= len(df)
+
+    def __first_incomplete(self, ic, gran):
+        """"最初の未確定の足の日時を取得する[get time of first incomplete candle]
+        引数[Args]:
+            ic (InstrumentsCandles) : APIの応答[API response]
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+        戻り値[Returns]:
+            dt_ (Timestamp) : 日時(東京)、全て確定済みはNone
+                              [time (Tokyo), None if all complete]
+        """
+        for raw in ic.response[OandaRsp.CNDL]:
+            if not raw.get(OandaRsp.CMPL, True):
+                return pd.Timestamp(OandaGrn.convert_dtfmt(
+                    gran, raw[OandaRsp.TIME],
+                    dt_ofs=timedelta(hours=9), fmt=self.__DT_FMT))
+        return None
+
+    def __missing(self, gran, inst, str_, end_):
+        """"未取得の期間を取得する[get missing periods]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+        戻り値[Returns]:
+            gaplist (list) : 未取得期間のリスト[list of missing periods]
+        """
+        gaplist = []
+        cur = str_
+        for covstr, covend in self.__covdict.get((inst, gran), []):
+            if end_ <= cur:
+                break
+            if cur < covstr:
+                gaplist.append((cur, min(covstr, end_)))
+            cur = max(cur, covend)
+        if cur < end_:
+            gaplist.append((cur, end_))
+        return gaplist
+
+    def __slice(self, gran, inst, str_, end_):
+        df = self.__dfdict.get((inst, gran))
+        if df is None:
+            return self.__convert_dataframe(None, gran)
+        self.__dfdict.move_to_end((inst, gran))
+        return df[(str_ <= df.index) & (df.index <= end_)]
+
+    def __convert_dataframe(self, ic, gran):
+        data = []
+        rawlist = [] if ic is None else ic.response[OandaRsp.CNDL]
+        for raw in rawlist:
+            dt_ = OandaGrn.convert_dtfmt(gran, raw[OandaRsp.TIME],
+                                         dt_ofs=timedelta(hours=9),
+                                         fmt=self.__DT_FMT)
+            data.append([dt_,
+                         raw[OandaRsp.VLM],
+                         float(raw[OandaRsp.MID][OandaRsp.OPN]),
+                         float(raw[OandaRsp.MID][OandaRsp.HIG]),
+                         float(raw[OandaRsp.MID][OandaRsp.LOW]),
+                         float(raw[OandaRsp.MID][OandaRsp.CLS])
+                         ])
+
+        # convert List to pandas data frame
+        df = pd.DataFrame(data, columns=[LBL_TIME,
+                                         LBL_VOLUME,
+                                         LBL_OPEN,
+                                         LBL_HIGH,
+                                         LBL_LOW,
+                                         LBL_CLOSE])
+        df = df.set_index(LBL_TIME)
+        # date型を整形する
+        df.index = pd.to_datetime(df.index)
+
+        return df
+
+
 class CandleStick(object):
     """ CandleStick
             - ローソク足定義クラス[Candle stick definition class]
     """
 
+    # 1画面の最大本数[max number of candles per screen]
+    VIEW_BARS = 800
+    # 一括算出する期間(スライダー範囲)[precomputed windows (slider range)]
+    PRECOMP_WINDOWS = range(1, 101)
+
+    # 取得日時グリッドのラベル[label of fetch datetime grid]
+    __GRID = "xdt"
+
+    # マウス位置に最も近い取得日時へ候補線を引く(ブラウザ側で処理)
+    # [draw candidate line at the fetch datetime nearest the mouse
+    #  (handled in the browser)]
+    __JS_SNAP = """
+        const grid = grid_src.data[lbl_grid];
+        const n = grid.length;
+        if (n == 0) {
+            return;
+        }
+        const x = cb_obj.x;
+        let lo = 0;
+        let hi = n;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (grid[mid] < x) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        let idx = lo;
+        if (idx == n) {
+            idx = n - 1;
+        } else if (0 < idx && x - grid[idx - 1] <= grid[idx] - x) {
+            idx = idx - 1;
+        }
+        const xdt = grid[idx];
+        const cur = line_src.data[lbl_x];
+        if (cur.length > 0 && cur[0] == xdt) {
+            return;
+        }
+        const data = {};
+        data[lbl_x] = [xdt, xdt];
+        data[lbl_y] = [yrng.start, yrng.end];
+        line_src.data = data;
+    """
+
     def __init__(self):
         """"コンストラクタ[Constructor]
         引数[Args]:
@@ -159,9 +685,9 @@ class CandleStick(object):
         self.__CND_DEC_COLOR = "#03C103"
         self.__CND_EQU_COLOR = "#FFFF00"
         self.__BG_COLOR = "#2E2E2E"  # Background color
-        self.__DT_FMT = "%Y-%m-%dT%H:%M:00.000000000Z"
         self.__INIT_WIDE = 0.5
         self.__YRANGE_MARGIN = 0.1
+        self.__TITLE = "Candlestick Chart"
 
         self.__ORDLINE_CND_COLOR = "yellow"
         self.__ORDLINE_FIX_COLOR = "cyan"
@@ -171,6 +697,12 @@ class CandleStick(object):
         self.__yrng = [0, 0]  # [min, max]
         self.__api = API(access_token=ACCESS_TOKEN,
                          environment=OandaEnv.PRACTICE)
+        self.__store = CandleStore(self.__api)
+        self.__inst = None
+        self.__gran = None
+        self.__viewport = None
+        self.__df = None
+        self.__dffetch = None
 
         tools_ = ToolType.gen_str(ToolType.WHEEL_ZOOM,
                                   ToolType.XBOX_ZOOM,
@@ -183,7 +715,7 @@ class CandleStick(object):
                                  tools=tools_,
                                  background_fill_color=self.__BG_COLOR,
                                  sizing_mode="stretch_width",
-                                 title="Candlestick Chart")
+                                 title=self.__TITLE)
         self.__plt_main.xaxis.axis_label = "Date Time"
         self.__plt_main.grid.grid_line_alpha = 0.3
         self.__plt_main.x_range = Range1d()
@@ -217,15 +749,25 @@ class CandleStick(object):
         self.__glyordfix = OrdersVLineGlyph(self.__plt_main,
                                             self.__ORDLINE_FIX_COLOR)
 
+        # 候補線はサーバを介さずブラウザで描写する
+        # [candidate line is drawn in the browser without the server]
+        self.__dtgrid = np.empty(0)
+        self.__srcgrid = ColumnDataSource({self.__GRID: []})
+        self.__ordhover = True
+        snap = CustomJS(args=dict(grid_src=self.__srcgrid,
+                                  line_src=self.__glyordcnd.source,
+                                  yrng=self.__plt_main.y_range,
+                                  lbl_grid=self.__GRID,
+                                  lbl_x=OrdersVLineGlyph.XDT,
+                                  lbl_y=OrdersVLineGlyph.YPR),
+                        code=self.__JS_SNAP)
+        self.__plt_main.js_on_event(events.MouseMove, snap)
+
         # Candle stick figure
-        self.__glyinc = CandleGlyph(self.__plt_main,
-                                    self.__plt_rang,
-                                    self.__CND_INC_COLOR)
-        self.__glydec = CandleGlyph(self.__plt_main,
-                                    self.__plt_rang,
-                                    self.__CND_DEC_COLOR)
-        self.__glyequ = CandleGlyph(self.__plt_main,
+        self.__glycnd = CandleGlyph(self.__plt_main,
                                     self.__plt_rang,
+                                    self.__CND_INC_COLOR,
+                                    self.__CND_DEC_COLOR,
                                     self.__CND_EQU_COLOR)
 
         hover = HoverTool()
@@ -235,16 +777,23 @@ class CandleStick(object):
                           (LBL_OPEN, "@" + CandleGlyph.YOP),
                           (LBL_CLOSE, "@" + CandleGlyph.YCL),
                           (LBL_LOW, "@" + CandleGlyph.YLO)]
-        hover.renderers = [self.__glyinc.render,
-                           self.__glydec.render,
-                           self.__glyequ.render]
+        hover.renderers = [self.__glycnd.render]
         self.__plt_main.add_tools(hover)
 
-        self.__sma = SimpleMovingAverage(self.__plt_main)
-        self.__macd = MACD(self.__plt_main)
-        self.__bb = BollingerBands(self.__plt_main)
+        # 指標の中間結果は全指標で共有する
+        # [intermediate results are shared by all indicators]
+        indcache = IndicatorCache()
+        self.__indcache = indcache
+        self.__sma = SimpleMovingAverage(self.__plt_main, indcache)
+        self.__macd = MACD(self.__plt_main, indcache)
+        self.__bb = BollingerBands(self.__plt_main, indcache)
+
+        # 登録指標[registered indicators]
+        self.__inds = OrderedDict()
+        for cls in get_indicators():
+            self.__inds[cls.KEY] = IndicatorPlot(cls(), self.__plt_main,
+                                                 indcache)
 
-    @retry(stop_max_attempt_number=5, wait_fixed=500)
     def fetch(self, gran, inst, gmtstr, gmtend):
         """"ローソク足情報を取得する[fetch candles]
         引数[Args]:
@@ -256,52 +805,60 @@ class CandleStick(object):
             yrng (tuple) : Y軸の最小値、最大値 (min, max)
                            [Y range min and max]
         """
-        params_ = {
-            # "alignmentTimezone": "Japan",
-            "from": gmtstr.gmt.strftime(self.__DT_FMT),
-            "to": gmtend.gmt.strftime(self.__DT_FMT),
-            "granularity": gran
-        }
+        df = self.load(gran, inst, gmtstr, gmtend)
+        return self.apply(gran, inst, gmtstr, gmtend, df)
 
-        # APIへ過去データをリクエスト
-        ic = it.InstrumentsCandles(instrument=inst, params=params_)
-        try:
-            self.__api.request(ic)
-        except Exception as err:
-            raise err
+    @retry(stop_max_attempt_number=5, wait_fixed=500,
+           retry_on_exception=_is_transient)
+    def load(self, gran, inst, gmtstr, gmtend):
+        """"ローソク足をダウンロードする(図形は更新しない)
+            [download candles (figures are not updated)]
 
-        data = []
-        for raw in ic.response[OandaRsp.CNDL]:
-            dt_ = OandaGrn.convert_dtfmt(gran, raw[OandaRsp.TIME],
-                                         dt_ofs=timedelta(hours=9),
-                                         fmt=self.__DT_FMT)
-            data.append([dt_,
-                         raw[OandaRsp.VLM],
-                         float(raw[OandaRsp.MID][OandaRsp.OPN]),
-                         float(raw[OandaRsp.MID][OandaRsp.HIG]),
-                         float(raw[OandaRsp.MID][OandaRsp.LOW]),
-                         float(raw[OandaRsp.MID][OandaRsp.CLS])
-                         ])
-
-        # convert List to pandas data frame
-        df = pd.DataFrame(data)
-        df.columns = [LBL_TIME,
-                      LBL_VOLUME,
-                      LBL_OPEN,
-                      LBL_HIGH,
-                      LBL_LOW,
-                      LBL_CLOSE]
-        df = df.set_index(LBL_TIME)
-        # date型を整形する
-        df.index = pd.to_datetime(df.index)
+            ワーカースレッドから呼び出せる。
+            [can be called from a worker thread]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            gmtstr (DateTimeManager) : 開始日時[from date]
+            gmtend (DateTimeManager) : 終了日時[to date]
+        戻り値[Returns]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+        """
+        # 指標結果は別配列に格納するためローソク足データは複製しない
+        # [indicator results live in their own arrays, so candles are
+        #  not copied]
+        df = self.__store.fetch(gran, inst, gmtstr, gmtend)
+        if df.empty:
+            raise ValueError("No candles:[{}][{}]".format(inst, gran))
+        return df
+
+    def apply(self, gran, inst, gmtstr, gmtend, df):
+        """"ダウンロード済みのローソク足で図形と指標を更新する
+            [update figures and indicators with downloaded candles]
+        引数[Args]:
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            gmtstr (DateTimeManager) : 開始日時[from date]
+            gmtend (DateTimeManager) : 終了日時[to date]
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+        戻り値[Returns]:
+            yrng (tuple) : Y軸の最小値、最大値 (min, max)
+                           [Y range min and max]
+        """
+        # 同じ足の末尾に追加されただけなら指標は追加分のみ計算する
+        # [only appended candles are calculated if the same candles grew]
+        num = 0
+        if inst == self.__inst and gran == self.__gran and \
+                self.__viewport is None:
+            num = self.__appended(self.__df, df)
 
-        incflg = df[LBL_CLOSE] > df[LBL_OPEN]
-        decflg = df[LBL_OPEN] > df[LBL_CLOSE]
-        equflg = df[LBL_CLOSE] == df[LBL_OPEN]
+        self.__inst = inst
+        self.__gran = gran
+        self.__viewport = None
+        self.__dffetch = df
+        self.__plt_main.title.text = self.__TITLE
 
-        self.__glyinc.update(df[incflg], gran)
-        self.__glydec.update(df[decflg], gran)
-        self.__glyequ.update(df[equflg], gran)
+        self.__glycnd.update(df, gran)
 
         self.__glyordcnd.clear()
         self.__glyordfix.clear()
@@ -323,8 +880,80 @@ class CandleStick(object):
         self.__add_orders_vline(gran, gmtstr, gmtend)
         self.__plt_main.y_range.update(start=str_, end=end_)
 
+        if 0 < num:
+            self.__append_indicators(df, num)
+        else:
+            self.__update_indicators(df)
+
+        return yrng
+
+    @staticmethod
+    def __appended(dfold, dfnew):
+        """"末尾に追加されたローソク足の本数を取得する
+            [get number of candles appended at the end]
+        引数[Args]:
+            dfold (DataFrame) : 表示中のローソク足[displayed candles]
+            dfnew (DataFrame) : 新しいローソク足[new candles]
+        戻り値[Returns]:
+            num (int) : 追加本数(追加のみでない場合0)
+                        [appended count (0 if not only appended)]
+        """
+        if dfold is None or not len(dfold) < len(dfnew):
+            return 0
+        len_ = len(dfold)
+        # 未確定だった最終足が変わった場合も全件再計算とする
+        # [recalculate everything if the last incomplete candle changed]
+        if not dfnew.index[:len_].equals(dfold.index) or \
+                not np.array_equal(dfnew[LBL_CLOSE].values[:len_],
+                                   dfold[LBL_CLOSE].values):
+            return 0
+        return len(dfnew) - len_
+
+    def __append_indicators(self, df, num):
+        """"追加されたローソク足分のみ指標を更新する
+            [update indicators for appended candles only]
+        引数[Args]:
+            df (DataFrame) : 追加後のローソク足[candles including appended]
+            num (int) : 末尾に追加された本数[number of appended candles]
+        戻り値[Returns]:
+            なし[None]
+        """
+        # 全期間を走査する一括算出は行わない。スライダー操作時は
+        # 指標キャッシュが該当期間のみ算出する。
+        # [the full-history precompute is skipped; on slider changes the
+        #  indicator cache calculates the requested window only]
+        self.__indcache.release()
         self.__df = df
 
+        if cfg.get_conf(cfg.ITEM_SMA_ACT) == 1:
+            self.__sma.append(df, num)
+        if cfg.get_conf(cfg.ITEM_MACD_ACT) == 1:
+            self.__macd.append(df, num)
+        if cfg.get_conf(cfg.ITEM_BB_ACT) == 1:
+            self.__bb.append(df, num)
+        # 登録指標は逐次計算を持たないため全件更新する
+        # [registered indicators have no streaming kernel, so update all]
+        for ind in self.__inds.values():
+            cls = ind.indicator
+            if cfg.get_conf_ind(cls.conf_key("act"), 0) == 1:
+                ind.update(df, cls.conf_params())
+
+    def __update_indicators(self, df):
+        """"表示中のローソク足で指標を更新する
+            [update indicators with displayed candles]
+        引数[Args]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__indcache.release()
+        self.__df = df
+
+        # スライダー範囲の移動平均・標準偏差を一括算出する
+        # [precompute moving average and deviation over slider range]
+        if cfg.get_conf(cfg.ITEM_PRECOMP_ACT) == 1:
+            self.__indcache.precompute(df, self.PRECOMP_WINDOWS)
+
         # 単純移動平均線
         if cfg.get_conf(cfg.ITEM_SMA_ACT) == 1:
             self.update_sma_shr(cfg.get_conf(cfg.ITEM_SMA_SHR))
@@ -338,9 +967,128 @@ class CandleStick(object):
         # ボリンジャーバンド
         if cfg.get_conf(cfg.ITEM_BB_ACT) == 1:
             self.__bb.update(df, cfg.get_conf(cfg.ITEM_BB_PRD))
+        # 登録指標[registered indicators]
+        for ind in self.__inds.values():
+            cls = ind.indicator
+            if cfg.get_conf_ind(cls.conf_key("act"), 0) == 1:
+                ind.update(df, cls.conf_params())
+
+    def viewport_range(self):
+        """"更新が必要な表示範囲を取得する[get visible range to update]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            req (tuple) : (通貨ペア, 開始日時, 終了日時)、不要な場合None
+                          [(instrument, from, to), None if not needed]
+        """
+        if self.__inst is None:
+            return None
+
+        xrng = self.__plt_main.x_range
+        str_ = self.__to_timestamp(xrng.start)
+        end_ = self.__to_timestamp(xrng.end)
+        if (str_, end_) == self.__viewport or not str_ < end_:
+            return None
+        return (self.__inst, str_, end_)
+
+    def load_viewport(self, inst, str_, end_):
+        """"表示範囲のローソク足をダウンロードする(図形は更新しない)
+            [download candles of visible range (figures are not updated)]
+
+            ワーカースレッドから呼び出せる。
+            [can be called from a worker thread]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+        戻り値[Returns]:
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+            width (float) : ローソク足1本の期間(ミリ秒)[period of a candle (ms)]
+        """
+        # 前後1画面分も含めてパン直後の空白を防ぐ
+        # [include one screen on each side to avoid blanks after panning]
+        span = end_ - str_
+        return self.__store.viewport(inst, str_ - span, end_ + span,
+                                     self.VIEW_BARS * 3)
+
+    def apply_viewport(self, inst, str_, end_, df, width):
+        """"表示範囲のローソク足で図形と指標を更新する
+            [update figures and indicators with candles of visible range]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+            width (float) : ローソク足1本の期間(ミリ秒)[period of a candle (ms)]
+        戻り値[Returns]:
+            yrng (tuple) : Y軸の最小値、最大値 (min, max)、未更新の場合None
+                           [Y range min and max, None if not updated]
+        """
+        # 別の通貨ペアを取得済みの場合は破棄する[discard if superseded]
+        if inst != self.__inst or df.empty:
+            return None
+
+        self.__glycnd.update_view(df, width)
+        self.__viewport = (str_, end_)
+
+        # 表示中のローソク足に合わせてY軸範囲を再計算する
+        # [recompute Y range from visible candles]
+        dfvis = df[(str_ <= df.index) & (df.index <= end_)]
+        if dfvis.empty:
+            dfvis = df
+        min_ = dfvis[LBL_LOW].min()
+        max_ = dfvis[LBL_HIGH].max()
+        mar = self.__YRANGE_MARGIN * (max_ - min_)
+        yrng = (min_ - mar, max_ + mar)
+        self.__yrng = list(yrng)
+        self.__plt_main.y_range.update(start=yrng[0], end=yrng[1])
+
+        # 取得日時グリッドを表示中の時間足に合わせる
+        # [align fetch datetime grid with displayed candles]
+        viewgran = self.__store.granularity(width / 1000)
+        gran = OandaGrn.D if viewgran == OandaGrn.W else viewgran
+        # (週足のグリッドは未対応のため日足で代用する)
+        # [(weekly grid is not supported, use daily instead)]
+        self.__add_orders_vline(gran,
+                                DateTimeManager(df.index[0].to_pydatetime()),
+                                DateTimeManager(df.index[-1].to_pydatetime()))
+
+        # 指標は取得した時間足でのみ算出する。集約表示中は取得時の
+        # ローソク足の指標を残し、実際の時間足をタイトルに表示する。
+        # [indicators are calculated on the fetched granularity only;
+        #  while aggregated, indicators of the fetched candles are kept
+        #  and the effective granularity is shown in the title]
+        if width == CandleStore.GRAN_SEC[self.__gran] * 1000:
+            self.__plt_main.title.text = self.__TITLE
+            self.__update_indicators(df)
+        else:
+            self.__plt_main.title.text = "{} [{}]".format(self.__TITLE,
+                                                          viewgran)
+            if self.__df is not self.__dffetch:
+                self.__update_indicators(self.__dffetch)
 
         return yrng
 
+    def update_viewport(self):
+        """"表示範囲に合わせてローソク足を更新する[update candles to visible range]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            yrng (tuple) : Y軸の最小値、最大値 (min, max)、未更新の場合None
+                           [Y range min and max, None if not updated]
+        """
+        req = self.viewport_range()
+        if req is None:
+            return None
+        df, width = self.load_viewport(*req)
+        return self.apply_viewport(*req, df, width)
+
+    @staticmethod
+    def __to_timestamp(val):
+        if isinstance(val, (int, float)):
+            return pd.Timestamp(val, unit="ms")
+        return pd.Timestamp(val)
+
     @property
     def macd_plt(self):
         """"MACDフィギュアオブジェクトを取得する[get MACD figure object]
@@ -444,6 +1192,35 @@ class CandleStick(object):
         """
         self.__bb.clear()
 
+    def indicator_plt(self, key):
+        """"登録指標のサブパネルを取得する[get sub panel of registered indicator]
+        引数[Args]:
+            key (str) : 指標識別子[indicator key]
+        戻り値[Returns]:
+            plt (figure) : フィギュアオブジェクト(メイン表示はNone)
+                           [figure object (None for main panel)]
+        """
+        return self.__inds[key].plt
+
+    def update_indicator(self, key, params):
+        """"登録指標を更新する[update registered indicator]
+        引数[Args]:
+            key (str) : 指標識別子[indicator key]
+            params (dict) : パラメータ[parameters]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__inds[key].update(self.__df, params)
+
+    def clear_indicator(self, key):
+        """"登録指標表示をクリアする[clear registered indicator]
+        引数[Args]:
+            key (str) : 指標識別子[indicator key]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__inds[key].clear()
+
     def __add_orders_vline(self, gran, gmtstr, gmtend):
         """"オープンオーダー＆ポジション垂線を追加する
             [add open orders & positions's vertical line]
@@ -514,6 +1291,13 @@ class CandleStick(object):
 
         self.__dtdf = pd.DataFrame({"timestamp": dti,
                                     "unixtime": uti})
+        # 最近傍探索用の昇順配列[sorted array for nearest search]
+        self.__dtuni = np.asarray(uti, dtype=np.int64)
+        self.__idxmin = -1
+
+        self.__dtgrid = to_ms_array(dti)
+        if self.__ordhover:
+            self.__srcgrid.data = {self.__GRID: self.__dtgrid}
 
     def draw_orders_cand_vline(self, point):
         """"オープンオーダー＆ポジション取得前の垂線を描写する
@@ -521,9 +1305,10 @@ class CandleStick(object):
         引数[Args]:
             point (datetime) : 日時データ[datetime data]
         戻り値[Returns]:
-            なし[None]
+            changed (bool) : 候補日時が変わった場合True
+                             [True if the candidate time changed]
         """
-        idxmin = np.abs(self.__dtdf["unixtime"] - point.timestamp()).idxmin()
+        idxmin = self.__nearest_index(point.timestamp())
 
         if not self.__idxmin == idxmin:
             idxmindt = self.__dtdf["timestamp"][idxmin].to_pydatetime()
@@ -532,6 +1317,24 @@ class CandleStick(object):
             self.__glyordcnd.update(dict_)
             self.__idxmindt = idxmindt
             self.__idxmin = idxmin
+            return True
+        return False
+
+    def __nearest_index(self, ts):
+        """"最も近い取得日時のインデックスを二分探索で求める
+            [find index of nearest fetch datetime by binary search]
+        引数[Args]:
+            ts (float) : UNIX時間[unix time]
+        戻り値[Returns]:
+            idx (int) : インデックス[index]
+        """
+        uni = self.__dtuni
+        idx = int(np.searchsorted(uni, ts))
+        if idx == len(uni):
+            idx -= 1
+        elif 0 < idx and ts - uni[idx - 1] <= uni[idx] - ts:
+            idx -= 1
+        return idx
 
     def draw_orders_fix_vline(self):
         """"オープンオーダー＆ポジション取得済みの垂線を描写する
@@ -546,6 +1349,18 @@ class CandleStick(object):
                  OrdersVLineGlyph.YPR: self.__yrng}
         self.__glyordfix.update(dict_)
 
+    def set_orders_hover(self, flg):
+        """"候補線のマウス追従を切り替える
+            [switch candidate line following the mouse]
+        引数[Args]:
+            flg (boolean) : 有効フラグ[enable flag]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__ordhover = flg
+        grid = self.__dtgrid if flg else []
+        self.__srcgrid.data = {self.__GRID: grid}
+
     def clear_orders_vline(self):
         """"オープンオーダー＆ポジション垂線をクリアする
             [clear vertical line of open orders & positions]
@@ -568,6 +1383,88 @@ class CandleStick(object):
         """
         return DateTimeManager(self.__idxmindt)
 
+    def orders_prefetch_datetimes(self, num):
+        """"候補日時の前後の取得日時を近い順に取得する
+            [get fetch datetimes around the candidate, nearest first]
+        引数[Args]:
+            num (int) : 前後それぞれの件数[number on each side]
+        戻り値[Returns]:
+            list_ (list) : DateTimeManagerのリスト[DateTimeManager list]
+        """
+        return self.__around(self.__idxmin, num)
+
+    def orders_hover_datetimes(self, num):
+        """"候補線(マウス追従)の前後の取得日時を近い順に取得する
+            [get fetch datetimes around the hovered candidate line,
+             nearest first]
+        引数[Args]:
+            num (int) : 前後それぞれの件数[number on each side]
+        戻り値[Returns]:
+            list_ (list) : DateTimeManagerのリスト[DateTimeManager list]
+        """
+        xdt = self.__glyordcnd.source.data[OrdersVLineGlyph.XDT]
+        if len(xdt) == 0 or len(self.__dtgrid) == 0:
+            return []
+        if isinstance(xdt[0], datetime):
+            # サーバ側で描写した候補線[candidate line drawn by server]
+            idx = self.__idxmin
+        else:
+            # ブラウザ側でグリッドに吸着した候補線(ミリ秒)
+            # [candidate line snapped to the grid in the browser (ms)]
+            idx = int(np.searchsorted(self.__dtgrid, float(xdt[0])))
+            idx = min(idx, len(self.__dtgrid) - 1)
+        return self.__around(idx, num)
+
+    def on_orders_candidate(self, handler):
+        """"候補線の変更を通知するコールバックを登録する
+            [register callback notified when the candidate line changes]
+        引数[Args]:
+            handler (function) : コールバック(attr, old, new)
+                                 [callback (attr, old, new)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__glyordcnd.source.on_change("data", handler)
+
+    def __around(self, idxc, num):
+        """"指定インデックスの前後の取得日時を近い順に取得する
+            [get fetch datetimes around an index, nearest first]
+        引数[Args]:
+            idxc (int) : 中心のインデックス[center index]
+            num (int) : 前後それぞれの件数[number on each side]
+        戻り値[Returns]:
+            list_ (list) : DateTimeManagerのリスト[DateTimeManager list]
+        """
+        tss = self.__dtdf["timestamp"]
+        list_ = []
+        for ofs in range(num + 1):
+            for idx in sorted({idxc - ofs, idxc + ofs}):
+                if 0 <= idx < len(tss):
+                    list_.append(DateTimeManager(tss[idx].to_pydatetime()))
+        return list_
+
+    @property
+    def orders_datetimes(self):
+        """"期間内の全取得日時を取得する[get all fetch datetimes in range]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            list_ (list) : DateTimeManagerのリスト[DateTimeManager list]
+        """
+        return [DateTimeManager(ts.to_pydatetime())
+                for ts in self.__dtdf["timestamp"]]
+
+    @property
+    def yrange(self):
+        """"価格範囲を取得する[get price range]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            yrng (list) : Y軸の最小値、最大値 [min, max]
+                          [Y range min and max]
+        """
+        return self.__yrng
+
     @property
     def fig_main(self):
         """"メインフィギュアオブジェクトを取得する[get main figure object]
@@ -6,6 +6,7 @@ import configparser
 ITEM_SMA_ACT = 'sma_act'
 ITEM_MACD_ACT = 'macd_act'
 ITEM_BB_ACT = 'bb_act'
+ITEM_PRECOMP_ACT = 'precompute_act'
 
 # 単純移動平均
 ITEM_SMA_SHR = 'sma_short'
@@ -24,13 +25,15 @@ _SEC_ACT = 'activate'
 _SEC_SMA = 'sma'
 _SEC_MACD = 'macd'
 _SEC_BB = 'bb'
-_SEC_LIST = [_SEC_ACT, _SEC_SMA, _SEC_MACD, _SEC_BB]
+_SEC_IND = 'indicator'
+_SEC_LIST = [_SEC_ACT, _SEC_SMA, _SEC_MACD, _SEC_BB, _SEC_IND]
 
 _config_def = {
     # アクティベート
     ITEM_SMA_ACT: '0',
     ITEM_MACD_ACT: '0',
     ITEM_BB_ACT: '0',
+    ITEM_PRECOMP_ACT: '0',
     # 単純移動平均
     ITEM_SMA_SHR: '5',
     ITEM_SMA_MDL: '20',
@@ -60,6 +63,7 @@ def read():
     _config[ITEM_SMA_ACT] = _cfg.getint(_SEC_ACT, ITEM_SMA_ACT)
     _config[ITEM_MACD_ACT] = _cfg.getint(_SEC_ACT, ITEM_MACD_ACT)
     _config[ITEM_BB_ACT] = _cfg.getint(_SEC_ACT, ITEM_BB_ACT)
+    _config[ITEM_PRECOMP_ACT] = _cfg.getint(_SEC_ACT, ITEM_PRECOMP_ACT)
     # 単純移動平均
     _config[ITEM_SMA_SHR] = _cfg.getint(_SEC_SMA, ITEM_SMA_SHR)
     _config[ITEM_SMA_MDL] = _cfg.getint(_SEC_SMA, ITEM_SMA_MDL)
@@ -79,6 +83,7 @@ def write():
     _cfg.set(_SEC_ACT, ITEM_SMA_ACT, str(_config[ITEM_SMA_ACT]))
     _cfg.set(_SEC_ACT, ITEM_MACD_ACT, str(_config[ITEM_MACD_ACT]))
     _cfg.set(_SEC_ACT, ITEM_BB_ACT, str(_config[ITEM_BB_ACT]))
+    _cfg.set(_SEC_ACT, ITEM_PRECOMP_ACT, str(_config[ITEM_PRECOMP_ACT]))
     _cfg.set(_SEC_SMA, ITEM_SMA_SHR, str(_config[ITEM_SMA_SHR]))
     _cfg.set(_SEC_SMA, ITEM_SMA_MDL, str(_config[ITEM_SMA_MDL]))
     _cfg.set(_SEC_SMA, ITEM_SMA_LNG, str(_config[ITEM_SMA_LNG]))
@@ -115,6 +120,20 @@ def get_conf(item):
     return _config[item]
 
 
+def get_conf_ind(item, default):
+    # 登録指標の設定値(未設定時は初期値)
+    if _cfg.has_option(_SEC_IND, item):
+        return _cfg.getint(_SEC_IND, item)
+    return default
+
+
+def set_conf_ind(item, value):
+    # 登録指標の設定値
+    if not _cfg.has_section(_SEC_IND):
+        _cfg.add_section(_SEC_IND)
+    _cfg.set(_SEC_IND, item, str(value))
+
+
 def get_conf_act():
     list_ = []
     if _config[ITEM_SMA_ACT] == 1:
@@ -283,3 +283,4 @@ class OandaRsp(object):
     HIG = "h"
     LOW = "l"
     CLS = "c"
+    CMPL = "complete"
@@ -1,19 +1,359 @@
 from abc import ABCMeta
-import pandas as pd
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import queue
+import threading
+import numpy as np
 from retrying import retry
-from bokeh.models import ColumnDataSource, HoverTool
+from bokeh.models import ColumnDataSource, HoverTool, LinearColorMapper
 from bokeh.models.glyphs import HBar, Line
+from bokeh.palettes import RdBu11
 from bokeh.plotting import figure
 import oandapyV20.endpoints.instruments as it
 from oandapyV20 import API
 import analyzer.oanda_account as oa
 from analyzer.oanda_common import OandaEnv
-from analyzer.bokeh_common import ToolType
+from analyzer.bokeh_common import ToolType, AxisTyp, to_ms_array
+from analyzer.utils import is_market_open
+
+
+class BookSnapshot(object):
+    """ BookSnapshot
+            - オーダー＆ポジションブックのスナップショットクラス
+              [Order & position book snapshot class]
+    """
+
+    def __init__(self, time, price, width, prices, longs, shorts):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            time (datetime) : スナップショット日時(GMT)[snapshot time (GMT)]
+            price (float) : 現在価格[current price]
+            width (float) : 価格間のレンジ[bucket width]
+            prices (ndarray) : バケット価格(昇順)[bucket prices (ascending)]
+            longs (ndarray) : ロング割合[long count percent]
+            shorts (ndarray) : ショート割合[short count percent]
+        """
+        self.__time = time
+        self.__price = price
+        self.__width = width
+        self.__prices = prices
+        self.__longs = longs
+        self.__shorts = shorts
+
+    @property
+    def time(self):
+        return self.__time
+
+    @property
+    def price(self):
+        return self.__price
+
+    @property
+    def width(self):
+        return self.__width
+
+    @property
+    def prices(self):
+        return self.__prices
+
+    @property
+    def longs(self):
+        return self.__longs
+
+    @property
+    def shorts(self):
+        return self.__shorts
+
+
+class BookStore(object):
+    """ BookStore
+            - ブックスナップショット保存クラス[Book snapshot store class]
+
+        過去のスナップショットは不変のため、(通貨ペア, 種別, 日時)を
+        キーとしてメモリとディスク(npz)に保存する。日時は種別ごとに
+        昇順で保持し、前後のスナップショットを二分探索で走査できる。
+        [historical snapshots are immutable, so they are kept in memory
+         and on disk (npz) keyed by (instrument, kind, time); times are
+         kept sorted per kind so neighbours can be scanned by bisection]
+
+        メモリ上はMAXSIZE件までとし、最も古く参照されたものから破棄する
+        (破棄したものはディスクから再読込する)。
+        [up to MAXSIZE snapshots stay in memory, least recently used
+         first out (evicted ones are reloaded from disk)]
+    """
+    DIR = "bookcache"
+    MAXSIZE = 1000
+    __FMT = "%Y%m%dT%H%M"
+
+    __snaps = OrderedDict()
+    __times = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def get(cls, inst, kind, time):
+        """"スナップショットを取得する[get snapshot]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            kind (str) : 種別("orderBook", "positionBook")[kind]
+            time (datetime) : スナップショット日時(GMT)[snapshot time (GMT)]
+        戻り値[Returns]:
+            snap (BookSnapshot) : スナップショット(未保存はNone)
+                                  [snapshot (None if not stored)]
+        """
+        key = (inst, kind)
+        with cls.__lock:
+            cls.__load_index(key)
+            snap = cls.__snaps.get(key + (time,))
+            if snap is not None:
+                cls.__snaps.move_to_end(key + (time,))
+            elif cls.__contains(cls.__times[key], time):
+                snap = cls.__load(key, time)
+                cls.__keep(key, time, snap)
+        return snap
+
+    @classmethod
+    def put(cls, inst, kind, time, snap):
+        """"スナップショットを保存する[put snapshot]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            kind (str) : 種別("orderBook", "positionBook")[kind]
+            time (datetime) : スナップショット日時(GMT)[snapshot time (GMT)]
+            snap (BookSnapshot) : スナップショット[snapshot]
+        戻り値[Returns]:
+            なし[None]
+        """
+        key = (inst, kind)
+        with cls.__lock:
+            cls.__load_index(key)
+            if key + (time,) not in cls.__snaps:
+                cls.__keep(key, time, snap)
+                if not cls.__contains(cls.__times[key], time):
+                    insort(cls.__times[key], time)
+                    cls.__save(key, time, snap)
+
+    @classmethod
+    def neighbours(cls, inst, kind, time, num):
+        """"前後の保存済み日時を取得する[get stored times around a time]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            kind (str) : 種別("orderBook", "positionBook")[kind]
+            time (datetime) : 基準日時(GMT)[reference time (GMT)]
+            num (int) : 前後それぞれの件数[number of times on each side]
+        戻り値[Returns]:
+            times (list) : 保存済み日時(昇順)[stored times (ascending)]
+        """
+        key = (inst, kind)
+        with cls.__lock:
+            cls.__load_index(key)
+            times = cls.__times[key]
+            idx = bisect_left(times, time)
+            return times[max(idx - num, 0):idx + num]
+
+    @staticmethod
+    def __contains(times, time):
+        idx = bisect_left(times, time)
+        return idx < len(times) and times[idx] == time
+
+    @classmethod
+    def __keep(cls, key, time, snap):
+        cls.__snaps[key + (time,)] = snap
+        while cls.MAXSIZE < len(cls.__snaps):
+            cls.__snaps.popitem(last=False)
+
+    @classmethod
+    def __load_index(cls, key):
+        if key in cls.__times:
+            return
+        times = []
+        path = cls.__dir(key)
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                stem, ext = os.path.splitext(name)
+                if ext == ".npz":
+                    times.append(datetime.strptime(stem, cls.__FMT))
+        cls.__times[key] = sorted(times)
+
+    @classmethod
+    def __load(cls, key, time):
+        name = time.strftime(cls.__FMT) + ".npz"
+        with np.load(os.path.join(cls.__dir(key), name)) as npz:
+            return BookSnapshot(time, float(npz["price"]), float(npz["width"]),
+                                npz["prices"], npz["longs"], npz["shorts"])
+
+    @classmethod
+    def __save(cls, key, time, snap):
+        path = cls.__dir(key)
+        try:
+            os.makedirs(path, exist_ok=True)
+            np.savez_compressed(
+                os.path.join(path, time.strftime(cls.__FMT) + ".npz"),
+                price=snap.price, width=snap.width,
+                prices=snap.prices.astype(np.float64),
+                longs=snap.longs.astype(np.float32),
+                shorts=snap.shorts.astype(np.float32))
+        except OSError as err:
+            print("----- BookStore save error: {}".format(err))
+
+    @classmethod
+    def __dir(cls, key):
+        return os.path.join(cls.DIR, key[0], key[1])
+
+
+class BookPrefetcher(object):
+    """ BookPrefetcher
+            - ブック先読みクラス[Book prefetcher class]
+
+        選択日時周辺のスナップショットをバックグラウンドで取得し、
+        BookStoreに保存する。新しい要求が来たら未処理の要求は破棄する。
+        [fetches snapshots around the selected time in the background
+         into BookStore; pending requests are dropped on a new request]
+    """
+
+    def __init__(self, books):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            books (list) : OpenBooksAbs派生オブジェクト[OpenBooksAbs objects]
+        """
+        self.__books = books
+        self.__queue = queue.PriorityQueue()
+        self.__seq = 0
+        self.__thread = None
+
+    def prefetch(self, inst, dtlist):
+        """"スナップショットの先読みを要求する[request snapshot prefetch]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dtlist (list) : DateTimeManagerのリスト(優先度順)
+                            [DateTimeManager list (by priority)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        while True:
+            try:
+                self.__queue.get_nowait()
+            except queue.Empty:
+                break
+
+        for pri, dt_ in enumerate(dtlist):
+            for book in self.__books:
+                self.__seq += 1
+                self.__queue.put((pri, self.__seq, book, inst, dt_))
+
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+
+    def __run(self):
+        while True:
+            _, _, book, inst, dt_ = self.__queue.get()
+            try:
+                book.request(inst, dt_)
+            except Exception as err:
+                print("----- Prefetch error: {}".format(err))
+
+
+def fetch_books(books, inst, dt_):
+    """"複数のブックを並列に取得して描写する
+        [fetch books concurrently and draw them]
+
+        全ての要求が完了してから描写するため、描写は一度にまとまる。
+        取得できなかったブックはクリアする。
+        [books are drawn after all requests complete;
+         books that could not be fetched are cleared]
+    引数[Args]:
+        books (list) : OpenBooksAbs派生オブジェクト[OpenBooksAbs objects]
+        inst (str) : 通貨ペア[instrument]
+        dt_ (DateTimeManager) : 日付[date time]
+    戻り値[Returns]:
+        なし[None]
+    """
+    apply_books(books, load_books(books, inst, dt_))
+
+
+def load_books(books, inst, dt_):
+    """"複数のブックを並列に取得する(描写しない)
+        [load books concurrently (not drawn)]
+
+        ワーカースレッドから呼び出せる。取得できなかったブックはNoneとなる。
+        [can be called from a worker thread; books that could not be
+         fetched are None]
+    引数[Args]:
+        books (list) : OpenBooksAbs派生オブジェクト[OpenBooksAbs objects]
+        inst (str) : 通貨ペア[instrument]
+        dt_ (DateTimeManager) : 日付[date time]
+    戻り値[Returns]:
+        snaps (list) : BookSnapshotのリスト[BookSnapshot list]
+    """
+    futures = [OpenBooksAbs.executor.submit(book.request, inst, dt_)
+               for book in books]
+    snaps = []
+    for future in futures:
+        try:
+            snaps.append(future.result())
+        except Exception as err:
+            print("----- Book fetch error: {}".format(err))
+            snaps.append(None)
+    return snaps
+
+
+def apply_books(books, snaps):
+    """"取得済みのブックを描写する[draw loaded books]
+    引数[Args]:
+        books (list) : OpenBooksAbs派生オブジェクト[OpenBooksAbs objects]
+        snaps (list) : BookSnapshotのリスト(Noneはクリア)
+                       [BookSnapshot list (None clears)]
+    戻り値[Returns]:
+        なし[None]
+    """
+    for book, snap in zip(books, snaps):
+        if snap is None:
+            book.clear()
+        else:
+            book.apply(snap)
+
+
+def load_snapshots(book, inst, dtlist):
+    """"複数日時のスナップショットを並列に取得する
+        [load snapshots of many datetimes concurrently]
+
+        未保存のスナップショットのみダウンロードする。
+        取得できなかった日時はNoneとなる。
+        [only missing snapshots are downloaded;
+         datetimes that could not be fetched are None]
+    引数[Args]:
+        book (OpenBooksAbs) : 取得に使うブック(クラスも可)
+                              [book used for requests (class allowed)]
+        inst (str) : 通貨ペア[instrument]
+        dtlist (list) : DateTimeManagerのリスト[DateTimeManager list]
+    戻り値[Returns]:
+        snaps (list) : BookSnapshotのリスト[BookSnapshot list]
+    """
+    futures = [OpenBooksAbs.loader.submit(book.request, inst, dt_)
+               for dt_ in dtlist]
+    snaps = []
+    for future in futures:
+        try:
+            snaps.append(future.result())
+        except Exception as err:
+            print("----- Book load error: {}".format(err))
+            snaps.append(None)
+    return snaps
 
 
 class OpenBooksAbs(metaclass=ABCMeta):
     """ OpenBooksAbs - OpenBooks抽象クラス"""
 
+    # 全ブックで共有するAPI(接続プール)と要求スレッド
+    # [API (connection pool) and request threads shared by all books]
+    __api = API(access_token=oa.ACCESS_TOKEN,
+                environment=OandaEnv.PRACTICE)
+    executor = ThreadPoolExecutor(max_workers=2)
+    # 期間一括取得用[for loading a range at once]
+    loader = ThreadPoolExecutor(max_workers=8)
+
     # Hbar Label
     YPR = "y"
     XCP = "x"
@@ -22,6 +362,19 @@ class OpenBooksAbs(metaclass=ABCMeta):
     Y = "y"
     X = "x"
 
+    # 要求と応答の書式[request and response format]
+    __DT_FMT = "%Y-%m-%dT%H:%M:00Z"
+    __RSP_FMT = "%Y-%m-%dT%H:%M:%S"
+
+    __BUCKETS = "buckets"
+    __PRICE = "price"
+    __LONG = "longCountPercent"
+    __SHORT = "shortCountPercent"
+
+    __TIME = "time"
+    __CUR_PRICE = "price"
+    __BUCKET_WIDTH = "bucketWidth"
+
     def __init__(self, title_, yrng):
         """"コンストラクタ[Constructor]
         引数[Args]:
@@ -38,21 +391,6 @@ class OpenBooksAbs(metaclass=ABCMeta):
         self.__CUTTH = 300  # 現レートから上下何本残すか
         self.__X_AXIS_MAX = 2.5  # X軸レンジ
 
-        self.__DT_FMT = "%Y-%m-%dT%H:%M:00Z"
-
-        self.__POS_BOOK = "positionBook"
-        self.__BUCKETS = "buckets"
-        self.__PRICE = "price"
-        self.__LONG = "longCountPercent"
-        self.__SHORT = "shortCountPercent"
-
-        self.__TIME = "time"
-        self.__CUR_PRICE = "price"
-        self.__BUCKET_WIDTH = "bucketWidth"
-
-        self.__api = API(access_token=oa.ACCESS_TOKEN,
-                         environment=OandaEnv.PRACTICE)
-
         tools_ = ToolType.gen_str(ToolType.XPAN,
                                   ToolType.WHEEL_ZOOM,
                                   ToolType.BOX_ZOOM,
@@ -112,7 +450,8 @@ class OpenBooksAbs(metaclass=ABCMeta):
         hover.renderers = [renf, renc]
         self.__plt.add_tools(hover)
 
-    def get_params(self, dt_):
+    @classmethod
+    def get_params(cls, dt_):
         """"OANDA-APIリクエストのためのパラメータを取得する[Constructor]
         引数[Args]:
             dt_ (DateTimeManager) : 日時[Date time]
@@ -120,59 +459,95 @@ class OpenBooksAbs(metaclass=ABCMeta):
             params_ (dict) : パラメータ[Parameter]
         """
         params_ = {
-            "time": dt_.gmt.strftime(self.__DT_FMT),
+            "time": dt_.gmt.strftime(cls.__DT_FMT),
         }
         return params_
 
-    def fetch(self, label, iob):
-        """"オープンオーダー＆ポジション情報を取得する
-            [fetch open orders & positions]
+    @classmethod
+    def request(cls, label, inst, dt_, iob):
+        """"オープンオーダー＆ポジション情報を要求する
+            [request open orders & positions]
+
+            保存済みのスナップショットはAPIを呼ばずに返す。
+            要求日時より前のスナップショットが返された場合(最新付近)は
+            保存しない。
+            [stored snapshots are returned without calling the API;
+             a snapshot earlier than the requested time (near the latest)
+             is not stored]
         引数[Args]:
             label (str) : ラベル[label]
+            inst (str) : 通貨ペア[instrument]
+            dt_ (DateTimeManager) : 日時[Date time]
             iob (InstrumentsOrderBook) : iob
         戻り値[Returns]:
-            なし[None]
+            snap (BookSnapshot) : スナップショット[snapshot]
         """
-        self.__api.request(iob)
-
-        self.__data = []
-        for raw in iob.response[label][self.__BUCKETS]:
-            self.__data.append([float(raw[self.__PRICE]),
-                                float(raw[self.__LONG]),
-                                float(raw[self.__SHORT])])
-
-        # convert List to Pandas Data Frame
-        df = pd.DataFrame(self.__data)
-        df.columns = [self.__PRICE,
-                      self.__LONG,
-                      self.__SHORT]
-        df = df.set_index(self.__PRICE).sort_index(ascending=False)
+        snap = BookStore.get(inst, label, dt_.gmt)
+        if snap is not None:
+            return snap
+
+        cls.__api.request(iob)
+
+        buckets = iob.response[label][cls.__BUCKETS]
+        prices = np.array([raw[cls.__PRICE] for raw in buckets],
+                          dtype=np.float64)
+        longs = np.array([raw[cls.__LONG] for raw in buckets],
+                         dtype=np.float64)
+        shorts = np.array([raw[cls.__SHORT] for raw in buckets],
+                          dtype=np.float64)
+        if np.any(prices[1:] < prices[:-1]):
+            idx = np.argsort(prices, kind="stable")
+            prices, longs, shorts = prices[idx], longs[idx], shorts[idx]
 
         # 現在価格をフェッチ[fetch current price]
-        price = float(iob.response[label][self.__CUR_PRICE])
+        price = float(iob.response[label][cls.__CUR_PRICE])
 
         # 価格間のレンジをフェッチ[fetch partition of the instrument's prices]
-        width = float(iob.response[label][self.__BUCKET_WIDTH])
+        width = float(iob.response[label][cls.__BUCKET_WIDTH])
+
+        # スナップショットの実際の日時[actual time of the snapshot]
+        time = datetime.strptime(iob.response[label][cls.__TIME][:19],
+                                 cls.__RSP_FMT)
 
-        # 範囲を絞る[narrow down price scope]
+        snap = BookSnapshot(time, price, width, prices, longs, shorts)
+        if time == dt_.gmt:
+            BookStore.put(inst, label, time, snap)
+        return snap
+
+    def apply(self, snap):
+        """"スナップショットを描写する[draw snapshot]
+        引数[Args]:
+            snap (BookSnapshot) : スナップショット[snapshot]
+        戻り値[Returns]:
+            なし[None]
+        """
+        prices = snap.prices
+        price = snap.price
+        width = snap.width
+
+        # 範囲を絞る(価格は昇順)[narrow down price scope (prices ascending)]
         idxth = width * self.__CUTTH
-        df = df[(df.index > price - idxth)
-                & (df.index < price + idxth)]
-
-        # 順張り側DataFrame
-        srhi = df[self.__LONG][(df.index > price)]
-        srlo = df[self.__SHORT][(df.index < price)]
-        df_fol = pd.concat([srhi, -srlo])
-        self.__srchbarf.data = {self.YPR: df_fol.index.tolist(),
-                                self.XCP: df_fol.tolist()}
+        lo = np.searchsorted(prices, price - idxth, side="right")
+        hi = np.searchsorted(prices, price + idxth, side="left")
+        mlo = np.searchsorted(prices, price, side="left")
+        mhi = np.searchsorted(prices, price, side="right")
+        longs = snap.longs
+        shorts = snap.shorts
+
+        # 現在価格の上下を価格の降順に並べる
+        # [above and below current price in descending price order]
+        ypr = np.concatenate((prices[mhi:hi][::-1], prices[lo:mlo][::-1]))
+
+        # 順張り側[follow side]
+        xfol = np.concatenate((longs[mhi:hi][::-1], -shorts[lo:mlo][::-1]))
+        self.__srchbarf.data = {self.YPR: ypr,
+                                self.XCP: xfol}
         self.__glyhbarf.height = width * self.__HEIGHT
 
-        # 逆張り側DataFrame
-        srhi = df[self.__SHORT][(df.index > price)]
-        srlo = df[self.__LONG][(df.index < price)]
-        df_con = pd.concat([-srhi, srlo])
-        self.__srchbarc.data = {self.YPR: df_con.index.tolist(),
-                                self.XCP: df_con.tolist()}
+        # 逆張り側[contrarian side]
+        xcon = np.concatenate((-shorts[mhi:hi][::-1], longs[lo:mlo][::-1]))
+        self.__srchbarc.data = {self.YPR: ypr.copy(),
+                                self.XCP: xcon}
         self.__glyhbarc.height = width * self.__HEIGHT
 
         # 現在価格ライン
@@ -216,17 +591,17 @@ class OpenBooksAbs(metaclass=ABCMeta):
 
 class OpenOrders(OpenBooksAbs):
 
+    __LABEL = "orderBook"
+    __TITLE = "Orders"
+
     def __init__(self, yrng):
         """"コンストラクタ[Constructor]
         引数[Args]:
             yrng (tuple) : Y軸の最小値、最大値 (min, max)
                            [Y range min and max]
         """
-        self.__LABEL = "orderBook"
-        self.__TITLE = "Orders"
         super().__init__(self.__TITLE, yrng)
 
-    @retry(stop_max_attempt_number=5, wait_fixed=1000)
     def fetch(self, inst, dt_):
         """"オープンオーダー情報を取得する[fetch open orders]
         引数[Args]:
@@ -235,11 +610,24 @@ class OpenOrders(OpenBooksAbs):
         戻り値[Returns]:
             なし[None]
         """
+        snap = self.request(inst, dt_)
+        self.apply(snap)
+
+    @classmethod
+    @retry(stop_max_attempt_number=5, wait_fixed=1000)
+    def request(cls, inst, dt_):
+        """"オープンオーダー情報を要求する[request open orders]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dt_ (DateTimeManager) : 日付[date time]
+        戻り値[Returns]:
+            snap (BookSnapshot) : スナップショット[snapshot]
+        """
         params_ = super().get_params(dt_)
 
         iob = it.InstrumentsOrderBook(instrument=inst,
                                       params=params_)
-        super().fetch(self.__LABEL, iob)
+        return super().request(cls.__LABEL, inst, dt_, iob)
 
     def update_yrange(self, yrng):
         """"Y軸範囲を更新する[update Y axis range]
@@ -264,17 +652,17 @@ class OpenOrders(OpenBooksAbs):
 
 class OpenPositions(OpenBooksAbs):
 
+    __LABEL = "positionBook"
+    __TITLE = "Positions"
+
     def __init__(self, yrng):
         """"コンストラクタ[Constructor]
         引数[Args]:
             yrng (tuple) : Y軸の最小値、最大値 (min, max)
                            [Y range min and max]
         """
-        self.__LABEL = "positionBook"
-        self.__TITLE = "Positions"
         super().__init__(self.__TITLE, yrng)
 
-    @retry(stop_max_attempt_number=5, wait_fixed=1000)
     def fetch(self, inst, dt_):
         """"オープンポジション情報を取得する[fetch openpositions]
         引数[Args]:
@@ -283,11 +671,24 @@ class OpenPositions(OpenBooksAbs):
         戻り値[Returns]:
             なし[None]
         """
+        snap = self.request(inst, dt_)
+        self.apply(snap)
+
+    @classmethod
+    @retry(stop_max_attempt_number=5, wait_fixed=1000)
+    def request(cls, inst, dt_):
+        """"オープンポジション情報を要求する[request open positions]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dt_ (DateTimeManager) : 日付[date time]
+        戻り値[Returns]:
+            snap (BookSnapshot) : スナップショット[snapshot]
+        """
         params_ = super().get_params(dt_)
 
         iob = it.InstrumentsPositionBook(instrument=inst,
                                          params=params_)
-        super().fetch(self.__LABEL, iob)
+        return super().request(cls.__LABEL, inst, dt_, iob)
 
     def update_yrange(self, yrng):
         """"Y軸範囲を更新する[update Y axis range]
@@ -308,3 +709,202 @@ class OpenPositions(OpenBooksAbs):
             なし[None]
         """
         return super().widget
+
+
+class BookHeatmap(object):
+    """ BookHeatmap
+            - ブック履歴ヒートマップクラス[Book history heatmap class]
+
+        期間内の全スナップショットを時間×価格の行列にまとめ、
+        (ロング - ショート)比率をイメージとして描写する。
+        [assembles all snapshots in a range into a time x price matrix
+         and draws (long - short) percent as an image]
+    """
+
+    IMG = "image"
+    X = "x"
+    Y = "y"
+    DW = "dw"
+    DH = "dh"
+
+    def __init__(self, book, title_, pltmain):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            book (OpenBooksAbs) : 取得に使うブック[book used for requests]
+            title_ (str) : フィギュアタイトル[figure title]
+            pltmain (figure) : メインフィギュア[main figure]
+        """
+        self.__BG_COLOR = "#2E2E2E"
+        self.__book = book
+
+        self.__plt = figure(plot_height=250,
+                            x_axis_type=AxisTyp.X_DATETIME,
+                            x_range=pltmain.x_range,
+                            y_range=pltmain.y_range,
+                            tools="",
+                            title=title_,
+                            background_fill_color=self.__BG_COLOR,
+                            sizing_mode="stretch_width")
+        self.__plt.grid.grid_line_alpha = 0.3
+        self.__plt.yaxis.axis_label = "Price"
+        self.__plt.toolbar_location = None
+
+        self.__mapper = LinearColorMapper(palette=RdBu11,
+                                          low=-1, high=1,
+                                          nan_color=(0, 0, 0, 0))
+        self.__src = ColumnDataSource({self.IMG: [],
+                                       self.X: [],
+                                       self.Y: [],
+                                       self.DW: [],
+                                       self.DH: []})
+        ren = self.__plt.image(image=self.IMG, x=self.X, y=self.Y,
+                               dw=self.DW, dh=self.DH,
+                               source=self.__src,
+                               color_mapper=self.__mapper)
+
+        hover = HoverTool()
+        hover.tooltips = [("Price", "$y{0.000}"),
+                          ("Long - Short[%]", "@" + self.IMG + "{0.00}")]
+        hover.renderers = [ren]
+        self.__plt.add_tools(hover)
+
+    def load(self, inst, dtlist):
+        """"期間内のスナップショットを取得する[load snapshots in range]
+
+            未保存のスナップショットは並列にダウンロードする。
+            休場中と取得できなかった時刻はNoneとなる。
+            [missing snapshots are downloaded concurrently;
+             times in market close or that could not be fetched are None]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dtlist (list) : DateTimeManagerのリスト(時刻順)
+                            [DateTimeManager list (in time order)]
+        戻り値[Returns]:
+            snaps (list) : BookSnapshotのリスト[BookSnapshot list]
+        """
+        # 休場中のスナップショットは存在しないため要求しない
+        # [snapshots do not exist while market is closed, so skip them]
+        flgs = is_market_open([dt_.tokyo for dt_ in dtlist])
+        opened = [dt_ for dt_, flg in zip(dtlist, flgs) if flg]
+        snaps = iter(load_snapshots(self.__book, inst, opened))
+        return [next(snaps) if flg else None for flg in flgs]
+
+    @staticmethod
+    def build_matrix(snaps, pmin, pmax):
+        """"スナップショットを共通の価格グリッドの行列にする
+            [build a matrix on a common price grid from snapshots]
+        引数[Args]:
+            snaps (list) : BookSnapshotのリスト(Noneを含む)
+                           [BookSnapshot list (may contain None)]
+            pmin (float) : 価格下限[price lower limit]
+            pmax (float) : 価格上限[price upper limit]
+        戻り値[Returns]:
+            mat (ndarray) : (価格, 時刻)の行列[(price, time) matrix]
+            pbase (float) : 先頭行の価格[price of the first row]
+            width (float) : 価格グリッド幅[price grid width]
+        """
+        valid = [(i, snap) for i, snap in enumerate(snaps)
+                 if snap is not None]
+        if not valid:
+            return None, pmin, 0
+
+        width = min(snap.width for _, snap in valid)
+        pbase = np.floor(pmin / width) * width
+        nrow = int(np.ceil((pmax - pbase) / width)) + 1
+
+        cols = np.concatenate([np.full(len(snap.prices), i, dtype=np.intp)
+                               for i, snap in valid])
+        prices = np.concatenate([snap.prices for _, snap in valid])
+        vals = np.concatenate([snap.longs - snap.shorts for _, snap in valid])
+
+        rows = np.rint((prices - pbase) / width).astype(np.intp)
+        mask = (0 <= rows) & (rows < nrow)
+
+        mat = np.full((nrow, len(snaps)), np.nan)
+        mat[rows[mask], cols[mask]] = vals[mask]
+        return mat, pbase, width
+
+    def update(self, inst, dtlist, yrng):
+        """"期間内のスナップショットからヒートマップを描写する
+            [draw heatmap from snapshots in range]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dtlist (list) : DateTimeManagerのリスト(等間隔、時刻順)
+                            [DateTimeManager list (evenly spaced, in order)]
+            yrng (list) : 価格範囲 [min, max][price range]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.draw(self.prepare(inst, dtlist, yrng))
+
+    def prepare(self, inst, dtlist, yrng):
+        """"期間内のスナップショットからイメージを作成する(図形は更新しない)
+            [build image from snapshots in range (figure is not updated)]
+
+            ワーカースレッドから呼び出せる。
+            [can be called from a worker thread]
+        引数[Args]:
+            inst (str) : 通貨ペア[instrument]
+            dtlist (list) : DateTimeManagerのリスト(等間隔、時刻順)
+                            [DateTimeManager list (evenly spaced, in order)]
+            yrng (list) : 価格範囲 [min, max][price range]
+        戻り値[Returns]:
+            img (dict) : イメージのデータ(データなしはNone)
+                         [image data (None if no data)]
+        """
+        if not dtlist:
+            return None
+
+        snaps = self.load(inst, dtlist)
+        mat, pbase, width = self.build_matrix(snaps, yrng[0], yrng[1])
+        if mat is None:
+            return None
+
+        xms = to_ms_array([dt_.tokyo for dt_ in dtlist])
+        step = xms[1] - xms[0] if len(xms) > 1 else 0
+        return {self.IMG: [mat],
+                self.X: [xms[0] - step / 2],
+                self.Y: [pbase - width / 2],
+                self.DW: [step * len(xms)],
+                self.DH: [width * mat.shape[0]]}
+
+    def draw(self, img):
+        """"作成済みのイメージを描写する[draw built image]
+        引数[Args]:
+            img (dict) : イメージのデータ(Noneはクリア)
+                         [image data (None clears)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        if img is None:
+            self.clear()
+            return
+
+        lim = np.nanmax(np.abs(img[self.IMG][0]))
+        if np.isnan(lim) or lim == 0:
+            lim = 1
+        self.__mapper.update(low=-lim, high=lim)
+        self.__src.data = img
+
+    def clear(self):
+        """"データをクリアする[clear data]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__src.data = {self.IMG: [],
+                           self.X: [],
+                           self.Y: [],
+                           self.DW: [],
+                           self.DH: []}
+
+    @property
+    def widget(self):
+        """"ウィジェット取得[get widget]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            plt (figure) : フィギュアオブジェクト[figure object]
+        """
+        return self.__plt
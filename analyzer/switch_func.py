@@ -3,6 +3,7 @@ from bokeh.layouts import layout, row
 import analyzer.viewer as _viewer
 from analyzer.analysis.gapfill import GapFill
 from analyzer.analysis.ttm_goto import TTMGoto
+from analyzer.analysis.orderbook import OrderBookAnalysis
 
 
 def _cb_btn_view(self):
@@ -24,12 +25,14 @@ def get_rootmodel():
 _vi = _viewer.Viewer()
 _gf = GapFill()
 _ttm = TTMGoto()
+_oba = OrderBookAnalysis()
 
 # set each callback function
 _SELECT_DICT = {
     "Candlestick chart": _vi.layout,
     "Analysis - Gap Fill": _gf.layout,
-    "Analysis - TTM & Goto-Day": _ttm.layout
+    "Analysis - TTM & Goto-Day": _ttm.layout,
+    "Analysis - Order Book": _oba.layout
 }
 
 
@@ -1,130 +1,682 @@
-from math import pi
+from abc import ABCMeta, abstractmethod
+from math import pi, sqrt
+from collections import deque, OrderedDict
+import numpy as np
 import pandas as pd
 from bokeh.models.glyphs import Line
-from bokeh.models import ColumnDataSource, Range1d
+from bokeh.models import ColumnDataSource, Range1d, CustomJSTransform
 from bokeh.plotting import figure
+from bokeh.transform import transform
 import analyzer.config as cfg
-from analyzer.bokeh_common import AxisTyp
+from analyzer.bokeh_common import AxisTyp, to_ms_array
+
+
+class IndicatorStore(object):
+    """ IndicatorStore
+            - テクニカル指標結果格納クラス[Technical indicator result store class]
+
+        ローソク足データの時間軸に合わせた配列を出力ごとに一度だけ確保し、
+        以降は同じ配列へ上書きする。ローソク足データの列は変更しない。
+        [allocates one array per output aligned to the candle time axis
+         and overwrites it afterwards; candle data columns are untouched]
+    """
+
+    def __init__(self, index):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            index (DatetimeIndex) : ローソク足の時間軸[candle time axis]
+        """
+        self.__index = index
+        self.__arys = {}
+
+    @property
+    def index(self):
+        """"時間軸を取得する[get time axis]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            index (DatetimeIndex) : ローソク足の時間軸[candle time axis]
+        """
+        return self.__index
+
+    def put(self, lbl, values):
+        """"結果を格納する[store result]
+        引数[Args]:
+            lbl (str) : 出力名[output name]
+            values (array-like) : 結果[result values]
+        戻り値[Returns]:
+            ary (ndarray) : 格納先配列[stored array]
+        """
+        ary = self.__arys.get(lbl)
+        if ary is None:
+            ary = np.empty(len(self.__index), dtype=np.float64)
+            self.__arys[lbl] = ary
+        np.copyto(ary, np.asarray(values, dtype=np.float64))
+        return ary
+
+    def get(self, lbl):
+        """"結果を取得する[get result]
+        引数[Args]:
+            lbl (str) : 出力名[output name]
+        戻り値[Returns]:
+            ary (ndarray) : 格納先配列[stored array]
+        """
+        return self.__arys[lbl]
+
+    def series(self, lbl):
+        """"結果を時間軸付きで取得する[get result with time axis]
+        引数[Args]:
+            lbl (str) : 出力名[output name]
+        戻り値[Returns]:
+            sr (Series) : 結果(格納先配列を参照)[result (views stored array)]
+        """
+        return pd.Series(self.__arys[lbl], index=self.__index, copy=False)
+
+    def clear(self):
+        """"結果を破棄する[discard results]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__arys = {}
+
+
+class IndicatorCache(object):
+    """ IndicatorCache
+            - テクニカル指標キャッシュクラス[Technical indicator cache class]
+
+        ローソク足データごとに中間結果(移動平均・EMA・標準偏差)を
+        パラメータをキーとして保持し、一度計算したパラメータは再計算しない。
+        [keeps intermediate results (moving average, EMA, standard
+         deviation) per candlestick data keyed by parameter, so a visited
+         parameter is never recalculated]
+
+        保持数はMAXSIZEまでとし、最も古く参照された結果から破棄する。
+        [holds up to MAXSIZE results and discards the least recently
+         used first]
+    """
+
+    MAXSIZE = 64
+
+    def __init__(self):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            なし[None]
+        """
+        self.__df = None
+        self.__cache = OrderedDict()
+        self.__surfidx = {}
+        self.__surfsma = None
+        self.__surfstd = None
+        self.__store = None
+
+    def __bind(self, df):
+        # ローソク足データが変わったらキャッシュを破棄する
+        # [discard cache when candlestick data changes]
+        if df is not self.__df:
+            self.release()
+            self.__df = df
+
+    def release(self):
+        """"キャッシュと結果格納先を解放する[release cache and result store]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__df = None
+        self.__cache = OrderedDict()
+        self.__surfidx = {}
+        self.__surfsma = None
+        self.__surfstd = None
+        self.__store = None
+
+    def store(self, df):
+        """"ローソク足データに紐付く結果格納先を取得する
+            [get result store bound to candlestick data]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+        戻り値[Returns]:
+            store (IndicatorStore) : 結果格納先[result store]
+        """
+        self.__bind(df)
+        if self.__store is None:
+            self.__store = IndicatorStore(df.index)
+        return self.__store
+
+    def __get(self, df, key, func):
+        self.__bind(df)
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+            return self.__cache[key]
+
+        sr = func()
+        self.__cache[key] = sr
+        while self.MAXSIZE < len(self.__cache):
+            self.__cache.popitem(last=False)
+        return sr
+
+    def sma(self, df, window_):
+        """"単純移動平均を取得する[get simple moving average]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            sr (Series) : 単純移動平均[simple moving average]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        self.__bind(df)
+        if window_ in self.__surfidx:
+            return self.__get(df, ("sma", window_),
+                              lambda: pd.Series(
+                                  self.__surfsma[self.__surfidx[window_]],
+                                  index=df.index))
+        return self.__get(df, ("sma", window_),
+                          lambda: df[LBL_CLOSE].rolling(window=window_).mean())
+
+    def std(self, df, window_):
+        """"移動標準偏差を取得する[get moving standard deviation]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            sr (Series) : 移動標準偏差[moving standard deviation]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        self.__bind(df)
+        if window_ in self.__surfidx:
+            return self.__get(df, ("std", window_),
+                              lambda: pd.Series(
+                                  self.__surfstd[self.__surfidx[window_]],
+                                  index=df.index))
+        return self.__get(df, ("std", window_),
+                          lambda: df[LBL_CLOSE].rolling(window=window_)
+                          .std(ddof=0))
+
+    def precompute(self, df, windows):
+        """"移動平均・移動標準偏差を期間×時間の配列として一括算出する
+            [precompute moving average and standard deviation
+             as a window x time array]
+
+            累積和1回で全期間を算出し、以降のsma/stdは参照のみとなる。
+            [all windows come from one cumulative-sum pass, so later
+             sma/std calls become lookups]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            windows (iterable) : 期間のリスト[list of windows]
+        戻り値[Returns]:
+            なし[None]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        self.__bind(df)
+        x = df[LBL_CLOSE].values.astype(np.float64)
+        win = np.asarray(list(windows), dtype=np.int64)
+        if len(x) == 0 or len(win) == 0:
+            return
+
+        # 平均を引いて二乗和の桁落ちを抑える
+        # [subtract mean to avoid cancellation in sum of squares]
+        ofs = x.mean()
+        xc = x - ofs
+        cs1 = np.concatenate(([0.0], np.cumsum(xc)))
+        cs2 = np.concatenate(([0.0], np.cumsum(xc * xc)))
+
+        mean = np.full((len(win), len(x)), np.nan)
+        std = np.full((len(win), len(x)), np.nan)
+        for i, w in enumerate(win.tolist()):
+            if len(x) < w or w < 1:
+                continue
+            # 期間wの窓和は累積和の差で求まる
+            # [window sums are differences of cumulative sums]
+            m1 = (cs1[w:] - cs1[:-w]) / w
+            var = (cs2[w:] - cs2[:-w]) / w - m1 * m1
+            np.maximum(var, 0.0, out=var)
+            mean[i, w - 1:] = m1 + ofs
+            std[i, w - 1:] = np.sqrt(var)
+
+        self.__surfidx = {w: i for i, w in enumerate(win.tolist())}
+        self.__surfsma = mean
+        self.__surfstd = std
+
+    def ema(self, df, span):
+        """"指数移動平均を取得する[get exponential moving average]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            span (int) : 期間[span]
+        戻り値[Returns]:
+            sr (Series) : 指数移動平均[exponential moving average]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        return self.__get(df, ("ema", span),
+                          lambda: df[LBL_CLOSE].ewm(span=span).mean())
+
+    def macd(self, df, shr, lng):
+        """"MACDを取得する[get MACD]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            shr (int) : 短期パラメータ[short range parameter]
+            lng (int) : 長期パラメータ[long range parameter]
+        戻り値[Returns]:
+            sr (Series) : MACD
+        """
+        return self.__get(df, ("macd", shr, lng),
+                          lambda: self.ema(df, shr) - self.ema(df, lng))
+
+    def signal(self, df, shr, lng, sgn):
+        """"MACDシグナルを取得する[get MACD signal]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            shr (int) : 短期パラメータ[short range parameter]
+            lng (int) : 長期パラメータ[long range parameter]
+            sgn (int) : シグナルパラメータ[signal parameter]
+        戻り値[Returns]:
+            sr (Series) : MACDシグナル[MACD signal]
+        """
+        return self.__get(df, ("signal", shr, lng, sgn),
+                          lambda: self.macd(df, shr, lng).ewm(span=sgn).mean())
+
+    def highest(self, df, window_):
+        """"期間中の最高値を取得する[get highest high in window]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            sr (Series) : 最高値[highest high]
+        """
+        from analyzer.candlestick import LBL_HIGH
+        return self.__get(df, ("highest", window_),
+                          lambda: df[LBL_HIGH].rolling(window=window_).max())
+
+    def lowest(self, df, window_):
+        """"期間中の最安値を取得する[get lowest low in window]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            sr (Series) : 最安値[lowest low]
+        """
+        from analyzer.candlestick import LBL_LOW
+        return self.__get(df, ("lowest", window_),
+                          lambda: df[LBL_LOW].rolling(window=window_).min())
+
+    def midpoint(self, df, window_):
+        """"期間中の最高値と最安値の中値を取得する
+            [get midpoint of highest high and lowest low in window]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            sr (Series) : 中値[midpoint]
+        """
+        return self.__get(df, ("midpoint", window_),
+                          lambda: (self.highest(df, window_)
+                                   + self.lowest(df, window_)) / 2)
+
+    def true_range(self, df):
+        """"真の値幅を取得する[get true range]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+        戻り値[Returns]:
+            sr (Series) : 真の値幅[true range]
+        """
+        from analyzer.candlestick import LBL_HIGH, LBL_LOW, LBL_CLOSE
+
+        def func():
+            prev = df[LBL_CLOSE].shift(1)
+            return pd.concat([df[LBL_HIGH] - df[LBL_LOW],
+                              (df[LBL_HIGH] - prev).abs(),
+                              (df[LBL_LOW] - prev).abs()], axis=1).max(axis=1)
+        return self.__get(df, ("tr",), func)
+
+    def gain(self, df):
+        """"終値の上昇幅を取得する[get close gain]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+        戻り値[Returns]:
+            sr (Series) : 上昇幅[gain]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        return self.__get(df, ("gain",),
+                          lambda: df[LBL_CLOSE].diff().clip(lower=0))
+
+    def loss(self, df):
+        """"終値の下落幅を取得する[get close loss]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+        戻り値[Returns]:
+            sr (Series) : 下落幅[loss]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        return self.__get(df, ("loss",),
+                          lambda: (-df[LBL_CLOSE].diff()).clip(lower=0))
+
+    def wilder(self, df, name, window_):
+        """"ワイルダーの平滑化を取得する[get Wilder's smoothing]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            name (str) : 平滑化対象("tr", "gain", "loss")
+                         [target series name]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            sr (Series) : 平滑化値[smoothed value]
+        """
+        src = {"tr": self.true_range,
+               "gain": self.gain,
+               "loss": self.loss}[name]
+        return self.__get(df, ("wilder", name, window_),
+                          lambda: src(df).ewm(alpha=1.0 / window_,
+                                              adjust=False).mean())
+
+
+class StreamingSMA(object):
+    """ StreamingSMA
+            - 逐次単純移動平均クラス[Streaming simple moving average class]
+
+        足1本の追加を定数時間で計算する。
+        [calculates one appended candle in constant time]
+    """
+
+    def __init__(self, window_):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            window_ (int) : 期間[window]
+        """
+        self.__window = window_
+        self.__buf = deque()
+        self.__sum = 0.0
+
+    def seed(self, values):
+        """"直近の値で状態を初期化する[initialize state with latest values]
+        引数[Args]:
+            values (ndarray) : 終値[close values]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__buf = deque(float(x) for x in values[-self.__window:])
+        self.__sum = sum(self.__buf)
+
+    def update(self, x):
+        """"値を追加して移動平均を取得する[append value and get average]
+        引数[Args]:
+            x (float) : 終値[close value]
+        戻り値[Returns]:
+            val (float) : 移動平均(期間未満はNaN)[average (NaN if short)]
+        """
+        self.__buf.append(x)
+        self.__sum += x
+        if self.__window < len(self.__buf):
+            self.__sum -= self.__buf.popleft()
+        if len(self.__buf) < self.__window:
+            return np.nan
+        return self.__sum / self.__window
+
+
+class StreamingEMA(object):
+    """ StreamingEMA
+            - 逐次指数移動平均クラス[Streaming exponential moving average class]
+
+        pandasのewm(span, adjust=True)と同じ値を再帰式で計算する。
+        [calculates the same value as pandas ewm(span, adjust=True)
+         by recursion]
+    """
+
+    def __init__(self, span):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            span (int) : 期間[span]
+        """
+        self.__decay = 1.0 - 2.0 / (span + 1.0)
+        self.__num = 0.0
+        self.__den = 0.0
+
+    def resume(self, ema, count):
+        """"算出済みの値から状態を復元する[resume state from calculated value]
+        引数[Args]:
+            ema (float) : 最新の指数移動平均[latest EMA]
+            count (int) : 算出に使用したデータ数[number of values]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__den = (1.0 - self.__decay ** count) / (1.0 - self.__decay)
+        self.__num = ema * self.__den
+
+    def update(self, x):
+        """"値を追加して指数移動平均を取得する[append value and get EMA]
+        引数[Args]:
+            x (float) : 入力値[input value]
+        戻り値[Returns]:
+            val (float) : 指数移動平均[EMA]
+        """
+        self.__num = x + self.__decay * self.__num
+        self.__den = 1.0 + self.__decay * self.__den
+        return self.__num / self.__den
+
+
+class StreamingMACD(object):
+    """ StreamingMACD
+            - 逐次MACDクラス[Streaming MACD class]
+    """
+
+    def __init__(self, shr, lng, sgn):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            shr (int) : 短期パラメータ[short range parameter]
+            lng (int) : 長期パラメータ[long range parameter]
+            sgn (int) : シグナルパラメータ[signal parameter]
+        """
+        self.__emas = StreamingEMA(shr)
+        self.__emal = StreamingEMA(lng)
+        self.__emag = StreamingEMA(sgn)
+
+    def resume(self, emas, emal, sign, count):
+        """"算出済みの値から状態を復元する[resume state from calculated value]
+        引数[Args]:
+            emas (float) : 最新の短期EMA[latest short EMA]
+            emal (float) : 最新の長期EMA[latest long EMA]
+            sign (float) : 最新のシグナル[latest signal]
+            count (int) : 算出に使用したデータ数[number of values]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__emas.resume(emas, count)
+        self.__emal.resume(emal, count)
+        self.__emag.resume(sign, count)
+
+    def update(self, x):
+        """"値を追加してMACDを取得する[append value and get MACD]
+        引数[Args]:
+            x (float) : 終値[close value]
+        戻り値[Returns]:
+            macd (float) : MACD
+            sign (float) : シグナル[signal]
+        """
+        macd = self.__emas.update(x) - self.__emal.update(x)
+        return macd, self.__emag.update(macd)
+
+
+class StreamingBollinger(object):
+    """ StreamingBollinger
+            - 逐次ボリンジャーバンドクラス[Streaming bollinger bands class]
+
+        平均と偏差平方和をWelford法で入れ替え更新する。
+        [updates mean and sum of squared deviations by Welford's method]
+    """
+
+    def __init__(self, window_):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            window_ (int) : 期間[window]
+        """
+        self.__window = window_
+        self.__buf = deque()
+        self.__mean = 0.0
+        self.__m2 = 0.0
+
+    def seed(self, values):
+        """"直近の値で状態を初期化する[initialize state with latest values]
+        引数[Args]:
+            values (ndarray) : 終値[close values]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__buf = deque()
+        self.__mean = 0.0
+        self.__m2 = 0.0
+        for x in values[-self.__window:]:
+            self.update(float(x))
+
+    def update(self, x):
+        """"値を追加して平均と標準偏差を取得する
+            [append value and get mean and standard deviation]
+        引数[Args]:
+            x (float) : 終値[close value]
+        戻り値[Returns]:
+            base (float) : 移動平均(期間未満はNaN)[average (NaN if short)]
+            sigma (float) : 標準偏差(期間未満はNaN)[deviation (NaN if short)]
+        """
+        self.__buf.append(x)
+        if len(self.__buf) <= self.__window:
+            delta = x - self.__mean
+            self.__mean += delta / len(self.__buf)
+            self.__m2 += delta * (x - self.__mean)
+        else:
+            old = self.__buf.popleft()
+            mean = self.__mean + (x - old) / self.__window
+            self.__m2 += (x - old) * (x - mean + old - self.__mean)
+            self.__mean = mean
+        if len(self.__buf) < self.__window:
+            return np.nan, np.nan
+        return self.__mean, sqrt(max(self.__m2 / self.__window, 0.0))
 
 
 class SimpleMovingAverage(object):
     """ SimpleMovingAverage
             - 単純移動平均線クラス[moving average class]
+
+        短期・中期・長期を1つのデータソースの列として保持し、
+        パラメータ変更時は該当列のみ送信する。
+        [holds short, middle and long lines as columns of one data source
+         and sends only the changed column on parameter change]
     """
     LBL_SMA_S = "SMA-S"
     LBL_SMA_M = "SMA-M"
     LBL_SMA_L = "SMA-L"
 
-    def __init__(self, plt):
+    def __init__(self, plt, cache=None):
         """"コンストラクタ[Constructor]
         引数[Args]:
             plt (figure) : フィギュアオブジェクト[figure object]
+            cache (IndicatorCache) : 指標キャッシュ[indicator cache]
         """
         self.__XDT = "xdt"
-        self.__YPR = "ypr"
+        self.__LBLS = (self.LBL_SMA_S, self.LBL_SMA_M, self.LBL_SMA_L)
+        self.__cache = IndicatorCache() if cache is None else cache
 
-        self.__srcs = ColumnDataSource({self.__XDT: [],
-                                        self.__YPR: []})
-        self.__srcm = ColumnDataSource({self.__XDT: [],
-                                        self.__YPR: []})
-        self.__srcl = ColumnDataSource({self.__XDT: [],
-                                        self.__YPR: []})
+        self.__src = ColumnDataSource(self.__empty())
+        self.__dfsrc = None
+        self.__krns = None
+        self.__krnm = None
+        self.__krnl = None
 
         glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
+                       y=self.LBL_SMA_S,
                        line_color="pink",
                        line_dash="solid",
                        line_width=1,
                        line_alpha=1.0)
-        plt.add_glyph(self.__srcs, glvline)
+        plt.add_glyph(self.__src, glvline)
 
         glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
+                       y=self.LBL_SMA_M,
                        line_color="yellow",
                        line_dash="solid",
                        line_width=1,
                        line_alpha=1.0)
-        plt.add_glyph(self.__srcm, glvline)
+        plt.add_glyph(self.__src, glvline)
 
         glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
+                       y=self.LBL_SMA_L,
                        line_color="orange",
                        line_dash="solid",
                        line_width=1,
                        line_alpha=1.0)
-        plt.add_glyph(self.__srcl, glvline)
+        plt.add_glyph(self.__src, glvline)
 
-    def calc_sma_shr(self, df, window_):
-        """"短期SMAを算出しデータフレーム列に追加する
-            [calculate short-term SMA and add to DataFrame column]
+    def calc_sma_shr(self, df, window_, store=None):
+        """"短期SMAを算出する[calculate short-term SMA]
         引数[Args]:
             df (pandas data frame) : ローソク足データ[pandas data frame]
             window_ (int) : 短期パラメータ[short range parameter]
+            store (IndicatorStore) : 結果格納先(省略時はキャッシュの格納先)
+                                     [result store (default: cache's store)]
         戻り値[Returns]:
             なし[None]
         """
-        from analyzer.candlestick import LBL_CLOSE
-        df[self.LBL_SMA_S] = df[LBL_CLOSE].rolling(window=window_).mean()
+        self.__get_store(df, store).put(self.LBL_SMA_S,
+                                        self.__cache.sma(df, window_))
+        self.__krns = self.__seed_kernel(df, window_)
 
-    def draw_shr(self, df):
+    def draw_shr(self, df, store=None):
         """"短期データを描写する[draw short-term data]
         引数[Args]:
             df (pandas data frame) : ローソク足データ[pandas data frame]
+            store (IndicatorStore) : 結果格納先(省略時はキャッシュの格納先)
+                                     [result store (default: cache's store)]
         戻り値[Returns]:
             なし[None]
         """
-        self.__srcs.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_SMA_S].tolist(),
-        }
+        self.__draw(df, self.LBL_SMA_S, self.__get_store(df, store))
 
-    def calc_sma_mdl(self, df, window_):
-        """"中期SMAを算出しデータフレーム列に追加する
-            [calculate middle-term SMA and add to DataFrame column]
+    def calc_sma_mdl(self, df, window_, store=None):
+        """"中期SMAを算出する[calculate middle-term SMA]
         引数[Args]:
             df (pandas data frame) : ローソク足データ[pandas data frame]
             window_ (int) : 中期パラメータ[middle-term parameter]
+            store (IndicatorStore) : 結果格納先(省略時はキャッシュの格納先)
+                                     [result store (default: cache's store)]
         戻り値[Returns]:
             なし[None]
         """
-        from analyzer.candlestick import LBL_CLOSE
-        df[self.LBL_SMA_M] = df[LBL_CLOSE].rolling(window=window_).mean()
+        self.__get_store(df, store).put(self.LBL_SMA_M,
+                                        self.__cache.sma(df, window_))
+        self.__krnm = self.__seed_kernel(df, window_)
 
-    def draw_mdl(self, df):
+    def draw_mdl(self, df, store=None):
         """"中期データを描写する[draw middle-term data]
         引数[Args]:
             df (pandas data frame) : ローソク足データ[pandas data frame]
+            store (IndicatorStore) : 結果格納先(省略時はキャッシュの格納先)
+                                     [result store (default: cache's store)]
         戻り値[Returns]:
             なし[None]
         """
-        self.__srcm.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_SMA_M].tolist(),
-        }
+        self.__draw(df, self.LBL_SMA_M, self.__get_store(df, store))
 
-    def calc_sma_lng(self, df, window_):
-        """"長期SMAを算出しデータフレーム列に追加する
-            [calculate long-term SMA and add to DataFrame column]
+    def calc_sma_lng(self, df, window_, store=None):
+        """"長期SMAを算出する[calculate long-term SMA]
         引数[Args]:
             df (pandas data frame) : ローソク足データ[pandas data frame]
             window_ (int) : 長期パラメータ[long-term parameter]
+            store (IndicatorStore) : 結果格納先(省略時はキャッシュの格納先)
+                                     [result store (default: cache's store)]
         戻り値[Returns]:
             なし[None]
         """
-        from analyzer.candlestick import LBL_CLOSE
-        df[self.LBL_SMA_L] = df[LBL_CLOSE].rolling(window=window_).mean()
+        self.__get_store(df, store).put(self.LBL_SMA_L,
+                                        self.__cache.sma(df, window_))
+        self.__krnl = self.__seed_kernel(df, window_)
 
-    def draw_lng(self, df):
+    def draw_lng(self, df, store=None):
         """"長期データを描写する[draw long-term data]
         引数[Args]:
             df (pandas data frame) : ローソク足データ[pandas data frame]
+            store (IndicatorStore) : 結果格納先(省略時はキャッシュの格納先)
+                                     [result store (default: cache's store)]
         戻り値[Returns]:
             なし[None]
         """
-        self.__srcl.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_SMA_L].tolist(),
-        }
+        self.__draw(df, self.LBL_SMA_L, self.__get_store(df, store))
 
     def clear(self):
         """"データをクリアする[clear data]
@@ -133,11 +685,84 @@ class SimpleMovingAverage(object):
         戻り値[Returns]:
             なし[None]
         """
-        dict_ = {self.__XDT: [],
-                 self.__YPR: []}
-        self.__srcs.data = dict_
-        self.__srcm.data = dict_
-        self.__srcl.data = dict_
+        self.__src.data = self.__empty()
+        self.__dfsrc = None
+        self.__krns = None
+        self.__krnm = None
+        self.__krnl = None
+
+    def append(self, df, num):
+        """"追加されたローソク足分のみ更新する[update appended candles only]
+        引数[Args]:
+            df (pandas data frame) : 追加後のローソク足データ
+                                     [candles including appended ones]
+            num (int) : 末尾に追加された本数[number of appended candles]
+        戻り値[Returns]:
+            なし[None]
+        """
+        krns = (self.__krns, self.__krnm, self.__krnl)
+        if all(krn is None for krn in krns) or num <= 0:
+            return
+        from analyzer.candlestick import LBL_CLOSE
+        new = df.iloc[-num:]
+        close = new[LBL_CLOSE].values
+        dict_ = {self.__XDT: to_ms_array(new.index)}
+        for krn, lbl in zip(krns, self.__LBLS):
+            if krn is None:
+                ary = np.full(num, np.nan)
+            else:
+                ary = np.array([krn.update(float(x)) for x in close])
+            dict_[lbl] = ary
+        self.__src.stream(dict_)
+        # 送信済みの時間軸は追加後のデータと一致する
+        # [sent time axis now matches the appended data]
+        self.__dfsrc = df
+
+    def __draw(self, df, lbl, store):
+        """"1本の線を描写する[draw one line]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            lbl (str) : 列名[column label]
+            store (IndicatorStore) : 結果格納先[result store]
+        戻り値[Returns]:
+            なし[None]
+        """
+        # 格納先配列は上書きされるため複製を送信する
+        # [stored arrays are overwritten, so send a copy]
+        ary = store.get(lbl).copy()
+        if df is self.__dfsrc and \
+                len(ary) == len(self.__src.data[self.__XDT]):
+            # 時間軸は送信済みのため該当列のみ送信する
+            # [time axis is already sent, so send the column only]
+            self.__src.data[lbl] = ary
+        else:
+            dict_ = {self.__XDT: to_ms_array(df.index)}
+            for lbl_ in self.__LBLS:
+                dict_[lbl_] = ary if lbl_ == lbl else np.full(len(df), np.nan)
+            self.__src.data = dict_
+            self.__dfsrc = df
+
+    def __get_store(self, df, store):
+        return self.__cache.store(df) if store is None else store
+
+    def __empty(self):
+        dict_ = {self.__XDT: []}
+        for lbl in self.__LBLS:
+            dict_[lbl] = []
+        return dict_
+
+    def __seed_kernel(self, df, window_):
+        """"逐次計算カーネルを初期化する[initialize streaming kernel]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            window_ (int) : 期間[window]
+        戻り値[Returns]:
+            krn (StreamingSMA) : 逐次計算カーネル[streaming kernel]
+        """
+        from analyzer.candlestick import LBL_CLOSE
+        krn = StreamingSMA(window_)
+        krn.seed(df[LBL_CLOSE].values)
+        return krn
 
 
 class MACD(object):
@@ -147,13 +772,15 @@ class MACD(object):
     LBL_MACD = "MACD"
     LBL_SIGN = "SIGN"
 
-    def __init__(self, plt):
+    def __init__(self, plt, cache=None):
         """"コンストラクタ[Constructor]
         引数[Args]:
             plt (figure) : フィギュアオブジェクト[figure object]
+            cache (IndicatorCache) : 指標キャッシュ[indicator cache]
         """
         self.__XDT = "xdt"
         self.__YPR = "ypr"
+        self.__cache = IndicatorCache() if cache is None else cache
 
         # Main chart figure
         self.__plt = figure(name='MACD',
@@ -190,6 +817,7 @@ class MACD(object):
         self.__plt.add_glyph(self.__srcs, glvline)
 
         self.__yrng = [0, 0]
+        self.__krn = None
 
     @property
     def plt(self):
@@ -212,14 +840,14 @@ class MACD(object):
         from analyzer.config import ITEM_MACD_LNG, ITEM_MACD_SGN
         lng = cfg.get_conf(ITEM_MACD_LNG)
         sgn = cfg.get_conf(ITEM_MACD_SGN)
-        self.__calcMACD(df, window_, lng, sgn)
+        macd, sign = self.__calcMACD(df, window_, lng, sgn)
         self.__srcm.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_MACD].tolist(),
+            self.__XDT: to_ms_array(df.index),
+            self.__YPR: macd.copy(),
         }
         self.__srcs.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_SIGN].tolist(),
+            self.__XDT: to_ms_array(df.index),
+            self.__YPR: sign.copy(),
         }
         self.__plt.y_range.update(start=self.__yrng[0], end=self.__yrng[1])
 
@@ -234,14 +862,14 @@ class MACD(object):
         from analyzer.config import ITEM_MACD_SHR, ITEM_MACD_SGN
         shr = cfg.get_conf(ITEM_MACD_SHR)
         sgn = cfg.get_conf(ITEM_MACD_SGN)
-        self.__calcMACD(df, shr, window_, sgn)
+        macd, sign = self.__calcMACD(df, shr, window_, sgn)
         self.__srcm.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_MACD].tolist(),
+            self.__XDT: to_ms_array(df.index),
+            self.__YPR: macd.copy(),
         }
         self.__srcs.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_SIGN].tolist(),
+            self.__XDT: to_ms_array(df.index),
+            self.__YPR: sign.copy(),
         }
         self.__plt.y_range.update(start=self.__yrng[0], end=self.__yrng[1])
 
@@ -256,16 +884,14 @@ class MACD(object):
         from analyzer.config import ITEM_MACD_SHR, ITEM_MACD_LNG
         shr = cfg.get_conf(ITEM_MACD_SHR)
         lng = cfg.get_conf(ITEM_MACD_LNG)
-        self.__calcMACD(df, shr, lng, window_)
-        self.__srcm.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_MACD].tolist(),
-        }
+        _, sign = self.__calcMACD(df, shr, lng, window_)
+
+        # MACD線は変わらないためシグナル線のみ送信する
+        # [MACD line is unchanged, so send signal line only]
         self.__srcs.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_SIGN].tolist(),
+            self.__XDT: to_ms_array(df.index),
+            self.__YPR: sign.copy(),
         }
-        self.__plt.y_range.update(start=self.__yrng[0], end=self.__yrng[1])
 
     def __calcMACD(self, df, shr, lng, sgn):
         """"MACDを計算する[calculate MACD]
@@ -274,18 +900,47 @@ class MACD(object):
             shr (int) : 短期パラメータ[short range parameter]
             lng (int) : 長期パラメータ[long range parameter]
             sgn (int) : シグナルパラメータ[signal parameter]
+        戻り値[Returns]:
+            macd (ndarray) : MACD
+            sign (ndarray) : シグナル[signal]
+        """
+        store = self.__cache.store(df)
+        macd = store.put(self.LBL_MACD, self.__cache.macd(df, shr, lng))
+        sign = store.put(self.LBL_SIGN, self.__cache.signal(df, shr, lng, sgn))
+
+        self.__krn = StreamingMACD(shr, lng, sgn)
+        if not df.empty:
+            self.__yrng = [np.nanmin(macd), np.nanmax(macd)]
+            self.__krn.resume(self.__cache.ema(df, shr).iat[-1],
+                              self.__cache.ema(df, lng).iat[-1],
+                              sign[-1],
+                              len(df))
+
+        return macd, sign
+
+    def append(self, df, num):
+        """"追加されたローソク足分のみ更新する[update appended candles only]
+        引数[Args]:
+            df (pandas data frame) : 追加後のローソク足データ
+                                     [candles including appended ones]
+            num (int) : 末尾に追加された本数[number of appended candles]
         戻り値[Returns]:
             なし[None]
         """
+        if self.__krn is None or num <= 0:
+            return
         from analyzer.candlestick import LBL_CLOSE
-        ema_s = df[LBL_CLOSE].ewm(span=shr).mean()
-        ema_l = df[LBL_CLOSE].ewm(span=lng).mean()
-        df[self.LBL_MACD] = (ema_s - ema_l)
-        df[self.LBL_SIGN] = df[self.LBL_MACD].ewm(span=sgn).mean()
+        new = df.iloc[-num:]
+        ary = np.array([self.__krn.update(float(x))
+                        for x in new[LBL_CLOSE].values])
 
-        min_ = df[self.LBL_MACD].min()
-        max_ = df[self.LBL_MACD].max()
-        self.__yrng = [min_, max_]
+        xdt = to_ms_array(new.index)
+        self.__srcm.stream({self.__XDT: xdt, self.__YPR: ary[:, 0]})
+        self.__srcs.stream({self.__XDT: xdt, self.__YPR: ary[:, 1]})
+
+        self.__yrng = [min(self.__yrng[0], ary[:, 0].min()),
+                       max(self.__yrng[1], ary[:, 0].max())]
+        self.__plt.y_range.update(start=self.__yrng[0], end=self.__yrng[1])
 
     def clear(self):
         """"データをクリアする[clear data]
@@ -298,77 +953,70 @@ class MACD(object):
                  self.__YPR: []}
         self.__srcm.data = dict_
         self.__srcs.data = dict_
+        self.__krn = None
 
 
 class BollingerBands(object):
     """ BollingerBands
             - ボリンジャーバンドクラス[bollinger bands class]
+
+        移動平均と標準偏差のみ送信し、±1σ～±3σはブラウザ側で
+        CustomJSTransformにより算出する。
+        [sends only moving average and standard deviation; ±1σ to ±3σ
+         are derived in the browser by CustomJSTransform]
     """
     LBL_BB_BASE = "BB-Base"
-    LBL_BB_SGN1U = "BB-Sgn*1-up"
-    LBL_BB_SGN1D = "BB-Sgn*1-dw"
-    LBL_BB_SGN2U = "BB-Sgn*2-up"
-    LBL_BB_SGN2D = "BB-Sgn*2-dw"
-    LBL_BB_SGN3U = "BB-Sgn*3-up"
-    LBL_BB_SGN3D = "BB-Sgn*3-dw"
-
-    def __init__(self, plt):
+    LBL_BB_SGM = "BB-Sigma"
+
+    # σ倍率と線色[sigma multiplier and line color]
+    __BANDS = ((1, "deepskyblue"),
+               (2, "aqua"),
+               (3, "aquamarine"))
+
+    __JS_BAND = """
+        const sigma = src.data[lbl];
+        const ys = new Float64Array(xs.length);
+        for (let i = 0; i < xs.length; i++) {
+            ys[i] = xs[i] + k * sigma[i];
+        }
+        return ys;
+    """
+
+    def __init__(self, plt, cache=None):
         """"コンストラクタ[Constructor]
         引数[Args]:
             plt (figure) : フィギュアオブジェクト[figure object]
+            cache (IndicatorCache) : 指標キャッシュ[indicator cache]
         """
         self.__XDT = "xdt"
-        self.__YPR = "ypr"
+        self.__cache = IndicatorCache() if cache is None else cache
 
-        self.__srcbs = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
-        self.__srcu1 = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
-        self.__srcu2 = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
-        self.__srcu3 = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
-        self.__srcd1 = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
-        self.__srcd2 = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
-        self.__srcd3 = ColumnDataSource({self.__XDT: [],
-                                         self.__YPR: []})
+        self.__src = ColumnDataSource({self.__XDT: [],
+                                       self.LBL_BB_BASE: [],
+                                       self.LBL_BB_SGM: []})
+        self.__krn = None
 
         glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
+                       y=self.LBL_BB_BASE,
                        line_color="blue",
                        line_dash="dotted",
                        line_width=1,
                        line_alpha=1.0)
-        plt.add_glyph(self.__srcbs, glvline)
+        plt.add_glyph(self.__src, glvline)
 
-        glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
-                       line_color="deepskyblue",
-                       line_dash="dotted",
-                       line_width=1,
-                       line_alpha=1.0)
-        plt.add_glyph(self.__srcu1, glvline)
-        plt.add_glyph(self.__srcd1, glvline)
-
-        glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
-                       line_color="aqua",
-                       line_dash="dotted",
-                       line_width=1,
-                       line_alpha=1.0)
-        plt.add_glyph(self.__srcu2, glvline)
-        plt.add_glyph(self.__srcd2, glvline)
-
-        glvline = Line(x=self.__XDT,
-                       y=self.__YPR,
-                       line_color="aquamarine",
-                       line_dash="dotted",
-                       line_width=1,
-                       line_alpha=1.0)
-        plt.add_glyph(self.__srcu3, glvline)
-        plt.add_glyph(self.__srcd3, glvline)
+        for k, color in self.__BANDS:
+            for sign in (1, -1):
+                trans = CustomJSTransform(args=dict(src=self.__src,
+                                                    lbl=self.LBL_BB_SGM,
+                                                    k=k * sign),
+                                          v_func=self.__JS_BAND)
+                glvline = Line(x=self.__XDT,
+                               y=transform(self.LBL_BB_BASE, trans),
+                               line_color=color,
+                               line_dash="dotted",
+                               line_width=1,
+                               line_alpha=1.0)
+                plt.add_glyph(self.__src, glvline)
 
     def update(self, df, window_):
         """"データを更新する[update data]
@@ -378,47 +1026,347 @@ class BollingerBands(object):
         戻り値[Returns]:
             なし[None]
         """
-        from analyzer.candlestick import LBL_CLOSE
-        df[self.LBL_BB_BASE] = df[LBL_CLOSE].rolling(window=window_).mean()
-        self.__srcbs.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_BASE].tolist(),
+        store = self.__cache.store(df)
+        base = store.put(self.LBL_BB_BASE, self.__cache.sma(df, window_))
+        sigma = store.put(self.LBL_BB_SGM, self.__cache.std(df, window_))
+
+        self.__src.data = {
+            self.__XDT: to_ms_array(df.index),
+            self.LBL_BB_BASE: base.copy(),
+            self.LBL_BB_SGM: sigma.copy(),
         }
 
-        base = df[self.LBL_BB_BASE]
-        sigma = df[LBL_CLOSE].rolling(window=window_).std(ddof=0)
+        from analyzer.candlestick import LBL_CLOSE
+        self.__krn = StreamingBollinger(window_)
+        self.__krn.seed(df[LBL_CLOSE].values)
+
+    def clear(self):
+        """"データをクリアする[clear data]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__src.data = {self.__XDT: [],
+                           self.LBL_BB_BASE: [],
+                           self.LBL_BB_SGM: []}
+        self.__krn = None
+
+    def append(self, df, num):
+        """"追加されたローソク足分のみ更新する[update appended candles only]
+        引数[Args]:
+            df (pandas data frame) : 追加後のローソク足データ
+                                     [candles including appended ones]
+            num (int) : 末尾に追加された本数[number of appended candles]
+        戻り値[Returns]:
+            なし[None]
+        """
+        if self.__krn is None or num <= 0:
+            return
+        from analyzer.candlestick import LBL_CLOSE
+        new = df.iloc[-num:]
+        ary = np.array([self.__krn.update(float(x))
+                        for x in new[LBL_CLOSE].values])
 
-        df[self.LBL_BB_SGN1U] = base + sigma
-        df[self.LBL_BB_SGN1D] = base - sigma
-        df[self.LBL_BB_SGN2U] = base + sigma * 2
-        df[self.LBL_BB_SGN2D] = base - sigma * 2
-        df[self.LBL_BB_SGN3U] = base + sigma * 3
-        df[self.LBL_BB_SGN3D] = base - sigma * 3
+        self.__src.stream({self.__XDT: to_ms_array(new.index),
+                           self.LBL_BB_BASE: ary[:, 0],
+                           self.LBL_BB_SGM: ary[:, 1]})
 
-        self.__srcu1.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_SGN1U].tolist(),
-        }
-        self.__srcd1.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_SGN1D].tolist(),
-        }
-        self.__srcu2.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_SGN2U].tolist(),
-        }
-        self.__srcd2.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_SGN2D].tolist(),
-        }
-        self.__srcu3.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_SGN3U].tolist(),
-        }
-        self.__srcd3.data = {
-            self.__XDT: df.index.tolist(),
-            self.__YPR: df[self.LBL_BB_SGN3D].tolist(),
-        }
+
+# 指標の表示先パネル[target panel of indicator]
+PANEL_MAIN = "main"
+PANEL_SUB = "sub"
+
+_INDICATORS = OrderedDict()
+
+
+def register_indicator(cls):
+    """"指標クラスを登録する(デコレータ)[register indicator class (decorator)]
+    引数[Args]:
+        cls (class) : IndicatorAbs派生クラス[IndicatorAbs subclass]
+    戻り値[Returns]:
+        cls (class) : 登録したクラス[registered class]
+    """
+    _INDICATORS[cls.KEY] = cls
+    return cls
+
+
+def get_indicators():
+    """"登録済みの指標クラスを取得する[get registered indicator classes]
+    引数[Args]:
+        なし[None]
+    戻り値[Returns]:
+        list_ (list) : 指標クラスのリスト(登録順)[indicator classes]
+    """
+    return list(_INDICATORS.values())
+
+
+class IndicatorAbs(metaclass=ABCMeta):
+    """ IndicatorAbs
+            - テクニカル指標定義抽象クラス[Technical indicator abstract class]
+
+        派生クラスはパラメータ・出力・表示先パネルを宣言し、
+        calcでIndicatorCacheの中間結果から出力を算出する。
+        [subclasses declare parameters, outputs and target panel, and
+         calc derives outputs from the shared IndicatorCache intermediates]
+    """
+    KEY = ""            # 識別子(設定キー)[identifier (config key)]
+    NAME = ""           # 表示名[display name]
+    PANEL = PANEL_MAIN  # 表示先パネル[target panel]
+    PARAMS = ()         # (キー, タイトル, 初期値, 最小, 最大)
+    #                     [(key, title, default, start, end)]
+    OUTPUTS = ()        # (出力名, 色)[(output name, color)]
+    YRANGE = None       # サブパネルのY軸固定範囲[fixed Y range of sub panel]
+
+    @classmethod
+    def conf_key(cls, param):
+        """"設定キーを取得する[get config key]
+        引数[Args]:
+            param (str) : パラメータキー[parameter key]
+        戻り値[Returns]:
+            key (str) : 設定キー[config key]
+        """
+        return "{}_{}".format(cls.KEY, param)
+
+    @classmethod
+    def conf_params(cls):
+        """"設定値からパラメータを取得する[get parameters from config]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            params (dict) : パラメータ[parameters]
+        """
+        return {key: cfg.get_conf_ind(cls.conf_key(key), def_)
+                for key, _, def_, _, _ in cls.PARAMS}
+
+    @abstractmethod
+    def calc(self, cache, df, params):
+        """"指標を算出する[calculate indicator]
+        引数[Args]:
+            cache (IndicatorCache) : 指標キャッシュ[indicator cache]
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            params (dict) : パラメータ[parameters]
+        戻り値[Returns]:
+            dict_ (dict) : 出力名をキーとする値[values keyed by output name]
+        """
+        pass
+
+
+@register_indicator
+class RSI(IndicatorAbs):
+    """ RSI
+            - 相対力指数クラス[Relative Strength Index class]
+    """
+    KEY = "rsi"
+    NAME = "RSI"
+    PANEL = PANEL_SUB
+    PARAMS = (("period", "期間", 14, 2, 100),)
+    OUTPUTS = (("RSI", "violet"),)
+    YRANGE = (0, 100)
+
+    def calc(self, cache, df, params):
+        gain = cache.wilder(df, "gain", params["period"]).values
+        loss = cache.wilder(df, "loss", params["period"]).values
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = 100.0 * gain / (gain + loss)
+        return {"RSI": rsi}
+
+
+@register_indicator
+class ATR(IndicatorAbs):
+    """ ATR
+            - 平均真の値幅クラス[Average True Range class]
+    """
+    KEY = "atr"
+    NAME = "ATR"
+    PANEL = PANEL_SUB
+    PARAMS = (("period", "期間", 14, 1, 100),)
+    OUTPUTS = (("ATR", "gold"),)
+
+    def calc(self, cache, df, params):
+        return {"ATR": cache.wilder(df, "tr", params["period"]).values}
+
+
+@register_indicator
+class Ichimoku(IndicatorAbs):
+    """ Ichimoku
+            - 一目均衡表クラス[Ichimoku Kinko Hyo class]
+
+        先行スパンは取得済みローソク足の範囲内のみ描写する。
+        [leading spans are drawn within the fetched candles only]
+    """
+    KEY = "ichimoku"
+    NAME = "一目均衡表"
+    PANEL = PANEL_MAIN
+    PARAMS = (("conv", "転換線", 9, 1, 100),
+              ("base", "基準線", 26, 1, 100),
+              ("span", "先行スパン2", 52, 1, 200))
+    OUTPUTS = (("TENKAN", "red"),
+               ("KIJUN", "dodgerblue"),
+               ("SENKOU-A", "lime"),
+               ("SENKOU-B", "tomato"),
+               ("CHIKOU", "khaki"))
+
+    def calc(self, cache, df, params):
+        from analyzer.candlestick import LBL_CLOSE
+        dsp = params["base"]
+        tenkan = cache.midpoint(df, params["conv"])
+        kijun = cache.midpoint(df, params["base"])
+        return {"TENKAN": tenkan.values,
+                "KIJUN": kijun.values,
+                "SENKOU-A": ((tenkan + kijun) / 2).shift(dsp).values,
+                "SENKOU-B": cache.midpoint(df, params["span"])
+                .shift(dsp).values,
+                "CHIKOU": df[LBL_CLOSE].shift(-dsp).values}
+
+
+@register_indicator
+class Stochastics(IndicatorAbs):
+    """ Stochastics
+            - ストキャスティクスクラス[Stochastics class]
+    """
+    KEY = "stoch"
+    NAME = "ストキャスティクス"
+    PANEL = PANEL_SUB
+    PARAMS = (("k", "%K", 14, 1, 100),
+              ("d", "%D", 3, 1, 50),
+              ("sd", "Slow%D", 3, 1, 50))
+    OUTPUTS = (("%K", "orange"),
+               ("%D", "cyan"),
+               ("SLOW%D", "magenta"))
+    YRANGE = (0, 100)
+
+    def calc(self, cache, df, params):
+        from analyzer.candlestick import LBL_CLOSE
+        hi = cache.highest(df, params["k"])
+        lo = cache.lowest(df, params["k"])
+        num = df[LBL_CLOSE] - lo
+        den = hi - lo
+        pct_d = 100.0 * (num.rolling(window=params["d"]).sum()
+                         / den.rolling(window=params["d"]).sum())
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct_k = 100.0 * num.values / den.values
+        return {"%K": pct_k,
+                "%D": pct_d.values,
+                "SLOW%D": pct_d.rolling(window=params["sd"]).mean().values}
+
+
+@register_indicator
+class EMARibbon(IndicatorAbs):
+    """ EMARibbon
+            - EMAリボンクラス[EMA ribbon class]
+    """
+    KEY = "ribbon"
+    NAME = "EMAリボン"
+    PANEL = PANEL_MAIN
+    PARAMS = (("start", "最短期間", 10, 1, 100),
+              ("step", "期間間隔", 5, 1, 50))
+    OUTPUTS = (("EMA1", "#FFE0B2"),
+               ("EMA2", "#FFCC80"),
+               ("EMA3", "#FFB74D"),
+               ("EMA4", "#FFA726"),
+               ("EMA5", "#FB8C00"),
+               ("EMA6", "#EF6C00"))
+
+    def calc(self, cache, df, params):
+        dict_ = {}
+        for i, (lbl, _) in enumerate(self.OUTPUTS):
+            span = params["start"] + params["step"] * i
+            dict_[lbl] = cache.ema(df, span).values
+        return dict_
+
+
+class IndicatorPlot(object):
+    """ IndicatorPlot
+            - 登録指標描写クラス[Registered indicator drawing class]
+
+        全出力を1つのデータソースの列として送信する。
+        [sends all outputs as columns of one data source]
+    """
+    XDT = "xdt"
+
+    def __init__(self, ind, plt, cache):
+        """"コンストラクタ[Constructor]
+        引数[Args]:
+            ind (IndicatorAbs) : 指標[indicator]
+            plt (figure) : メインフィギュア[main figure object]
+            cache (IndicatorCache) : 指標キャッシュ[indicator cache]
+        """
+        self.__ind = ind
+        self.__cache = cache
+
+        if ind.PANEL == PANEL_SUB:
+            bgcolor = plt.background_fill_color
+            self.__plt = figure(name=ind.KEY,
+                                plot_height=150,
+                                x_axis_type=AxisTyp.X_DATETIME,
+                                x_range=plt.x_range,
+                                background_fill_color=bgcolor,
+                                sizing_mode=plt.sizing_mode,
+                                title=ind.NAME)
+            self.__plt.xaxis.major_label_orientation = pi / 4
+            self.__plt.grid.grid_line_alpha = 0.3
+            self.__plt.toolbar_location = None
+            self.__plt.y_range = Range1d()
+            if ind.YRANGE is not None:
+                self.__plt.y_range.update(start=ind.YRANGE[0],
+                                          end=ind.YRANGE[1])
+            target = self.__plt
+        else:
+            self.__plt = None
+            target = plt
+
+        self.__src = ColumnDataSource(self.__empty())
+        for lbl, color in ind.OUTPUTS:
+            glvline = Line(x=self.XDT,
+                           y=lbl,
+                           line_color=color,
+                           line_dash="solid",
+                           line_width=1,
+                           line_alpha=1.0)
+            target.add_glyph(self.__src, glvline)
+
+    @property
+    def indicator(self):
+        """"指標を取得する[get indicator]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            ind (IndicatorAbs) : 指標[indicator]
+        """
+        return self.__ind
+
+    @property
+    def plt(self):
+        """"サブパネルのフィギュアオブジェクトを取得する[get sub panel figure]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            plt (figure) : フィギュアオブジェクト(メイン表示はNone)
+                           [figure object (None for main panel)]
+        """
+        return self.__plt
+
+    def update(self, df, params):
+        """"データを更新する[update data]
+        引数[Args]:
+            df (pandas data frame) : ローソク足データ[pandas data frame]
+            params (dict) : パラメータ[parameters]
+        戻り値[Returns]:
+            なし[None]
+        """
+        store = self.__cache.store(df)
+        dict_ = {self.XDT: to_ms_array(df.index)}
+        for lbl, ary in self.__ind.calc(self.__cache, df, params).items():
+            key = "{}:{}".format(self.__ind.KEY, lbl)
+            dict_[lbl] = store.put(key, ary).copy()
+        self.__src.data = dict_
+
+        if self.__plt is not None and self.__ind.YRANGE is None:
+            ary = np.concatenate([dict_[lbl] for lbl, _ in self.__ind.OUTPUTS])
+            if np.isfinite(ary).any():
+                self.__plt.y_range.update(start=np.nanmin(ary),
+                                          end=np.nanmax(ary))
 
     def clear(self):
         """"データをクリアする[clear data]
@@ -427,25 +1375,45 @@ class BollingerBands(object):
         戻り値[Returns]:
             なし[None]
         """
-        dict_ = {self.__XDT: [],
-                 self.__YPR: []}
-        self.__srcbs.data = dict_
-        self.__srcu1.data = dict_
-        self.__srcd1.data = dict_
-        self.__srcu2.data = dict_
-        self.__srcd2.data = dict_
-        self.__srcu3.data = dict_
-        self.__srcd3.data = dict_
+        self.__src.data = self.__empty()
+
+    def __empty(self):
+        dict_ = {self.XDT: []}
+        for lbl, _ in self.__ind.OUTPUTS:
+            dict_[lbl] = []
+        return dict_
 
 
 if __name__ == "__main__":
+    # 逐次計算(append)と全件再計算の結果を比較する
+    # [compare streaming (append) results with a full recalculation]
     from analyzer.candlestick import LBL_CLOSE
-    dic_arr = {LBL_CLOSE: [110, 111, 112, 113,
-                           114, 115, 116, 117, 118, 119, 120]}
+    cfg.read()
+    idx = pd.date_range("2020-01-06", periods=500, freq="5min")
+    close = 110 + np.cumsum(np.random.randn(len(idx))) * 0.01
+    dfall = pd.DataFrame({LBL_CLOSE: close}, index=idx)
+    num = 100
+
+    def build(df):
+        plt = figure(x_axis_type=AxisTyp.X_DATETIME)
+        inds = (SimpleMovingAverage(plt), MACD(plt), BollingerBands(plt))
+        inds[0].calc_sma_shr(df, cfg.get_conf(cfg.ITEM_SMA_SHR))
+        inds[0].draw_shr(df)
+        inds[0].calc_sma_lng(df, cfg.get_conf(cfg.ITEM_SMA_LNG))
+        inds[0].draw_lng(df)
+        inds[1].update_shr(df, cfg.get_conf(cfg.ITEM_MACD_SHR))
+        inds[2].update(df, cfg.get_conf(cfg.ITEM_BB_PRD))
+        return inds, plt.renderers + inds[1].plt.renderers
 
-    df = pd.DataFrame(dic_arr)
+    inds, rndstrm = build(dfall.iloc[:-num])
+    for ind in inds:
+        ind.append(dfall, num)
+    _, rndfull = build(dfall)
 
-    print(df)
-    sma = SimpleMovingAverage()
-    sma.update(df)
-    print(df)
+    ng = []
+    for strm, full in zip(rndstrm, rndfull):
+        for lbl, ary in full.data_source.data.items():
+            if not np.allclose(np.asarray(strm.data_source.data[lbl], float),
+                               np.asarray(ary, float), equal_nan=True):
+                ng.append(lbl)
+    print("append == full recalculation:", "NG {}".format(ng) if ng else "OK")
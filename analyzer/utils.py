@@ -2,10 +2,16 @@ import copy
 import jpholiday
 from datetime import timedelta
 import numpy as np
+import pandas as pd
 
 TRUE = 1
 FALSE = 0
 
+# タイムゾーン名[time zone names]
+TZ_TOKYO = "Asia/Tokyo"
+TZ_LONDON = "Europe/London"
+TZ_NEWYORK = "America/New_York"
+
 
 class DateTimeManager(object):
     """ DateTimeManager
@@ -102,9 +108,30 @@ def extract_workdays(str_date, end_date):
     return workdays
 
 
+def is_market_open(dtlist):
+    """FX市場の取引時間内か判定する[judge if FX market is open]
+
+       週末はニューヨーク時間 金曜17:00 から 日曜17:00 まで休場とし、
+       夏時間も考慮する(GMTでは夏時間21:00、冬時間22:00)。
+       [the market is closed from Friday 17:00 to Sunday 17:00 New York
+        time, with daylight saving time (21:00 GMT in summer, 22:00 GMT
+        in winter)]
+    引数[Args]:
+        dtlist (list) : 東京時間の日時リスト[list of datetime in Tokyo]
+    戻り値[Returns]:
+        flgary (ndarray) : 取引時間内ならTrue[True if market is open]
+    """
+    dtidx = pd.DatetimeIndex(dtlist).tz_localize(TZ_TOKYO)
+    dtidx = dtidx.tz_convert(TZ_NEWYORK)
+    wday = np.asarray(dtidx.weekday)
+    hour = np.asarray(dtidx.hour)
+    closed = ((wday == 4) & (17 <= hour)) | (wday == 5) | \
+        ((wday == 6) & (hour < 17))
+    return ~closed
+
+
 if __name__ == "__main__":
     import datetime
-    import pandas as pd
 
     str_ = datetime.date(2019, 7, 1)
     end_ = datetime.date(2019, 10, 3)
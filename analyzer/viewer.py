@@ -1,12 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
 from bokeh import events
 from bokeh.models.widgets import Slider, RadioGroup, Button
-from bokeh.models.widgets import Select, CheckboxGroup
+from bokeh.models.widgets import Select, CheckboxGroup, Div
 from bokeh.layouts import gridplot, row, column, layout
 from oandapyV20.exceptions import V20Error
 import analyzer.config as cfg
 from analyzer.candlestick import CandleStick
-from analyzer.oders import OpenOrders, OpenPositions
+from analyzer.technical import get_indicators, PANEL_SUB
+from analyzer.oders import OpenOrders, OpenPositions, BookPrefetcher
+from analyzer.oders import load_books, apply_books, BookHeatmap
 from analyzer.oanda_common import OandaGrn, OandaIns
 from analyzer.utils import DateTimeManager
 
@@ -49,6 +53,25 @@ class Viewer(object):
         self.__STS_DATARANGE_LATEST = 0  # 最新[Latest]
         self.__STS_DATARANGE_SELECT = 1  # 選択[Youser Select]
 
+        # ブック先読みの前後件数[number of books prefetched on each side]
+        self.__PREFETCH_NUM = 1
+        # 候補線で先読みするまでの待ち時間[delay of hover prefetch] (ms)
+        self.__PREFETCH_DELAY = 200
+        self.__pf_cb = None
+
+        # チャート更新の待ち時間[debounce time of chart update] (ms)
+        self.__UPDATE_DELAY = 300
+        self.__upd_gen = 0
+        self.__upd_cb = None
+        self.__vp_gen = 0
+        self.__tap_gen = 0
+
+        # ローソク足のダウンロード用スレッド[thread for downloading candles]
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        # ブック履歴の読込用スレッド[thread for loading book history]
+        self.__bm_executor = ThreadPoolExecutor(max_workers=1)
+        self.__bm_gen = 0
+
         # コンフィグファイル読み込み[read config file]
         cfg.read()
 
@@ -81,7 +104,8 @@ class Viewer(object):
         self.__MODE_LIST = [
             "オープンオーダー ＆ ポジション",
             "テクニカル指標",
-            "為替データ取得期間"
+            "為替データ取得期間",
+            "オーダーブック履歴"
         ]
 
         # Widget Select:通貨ペア[Instrument]
@@ -125,11 +149,23 @@ class Viewer(object):
         self.__slc_mode.on_change("value", self.__cb_slc_mode)
         self.__mode = self.__MODE_LIST[0]
 
+        # Widget Div:読込中表示[Loading indicator]
+        self.__div_loading = Div(text="<b>読込中...</b>",
+                                 style={"color": "orange"},
+                                 visible=False)
+
         # Widget Select:テクニカル指標[Technical index]
         self.__tech_dict = {"単純移動平均": self.__cb_func_sma,
                             "MACD": self.__cb_func_macd,
                             "ボリンジャーバンド": self.__cb_func_bb
                             }
+        # 登録指標は固定指標の後に並べる
+        # [registered indicators follow the built-in ones]
+        self.__TECH_IND_OFS = len(self.__tech_dict)
+        self.__inds = get_indicators()
+        for cls in self.__inds:
+            self.__tech_dict[cls.NAME] = partial(self.__switch_technical_ind,
+                                                 cls)
         TECH_OPT = list(self.__tech_dict.keys())
         self.__slc_tech = Select(title="テクニカル指標",
                                  value=TECH_OPT[0],
@@ -139,6 +175,9 @@ class Viewer(object):
 
         # Widget Checkbox Group:テクニカル指標[Technical index]
         active_ = cfg.get_conf_act()
+        for i, cls in enumerate(self.__inds, self.__TECH_IND_OFS):
+            if cfg.get_conf_ind(cls.conf_key("act"), 0) == 1:
+                active_.append(i)
         self.__cbg_tech = CheckboxGroup(labels=TECH_OPT, active=active_)
         self.__cbg_tech.on_change("active", self.__cb_cbg_tech)
         self.__tech_act = active_
@@ -239,6 +278,18 @@ class Viewer(object):
                                    step=1, title="期間")
         self.__sld_techbb.on_change('value', self.__cb_sld_techbb)
 
+        # ●登録指標[registered indicators]
+        self.__sld_ind = {}
+        for cls in self.__inds:
+            list_ = []
+            for key, title, def_, start, end in cls.PARAMS:
+                sld = Slider(start=start, end=end,
+                             value=cfg.get_conf_ind(cls.conf_key(key), def_),
+                             step=1, title=title)
+                sld.on_change('value', partial(self.__cb_sld_ind, cls, key))
+                list_.append(sld)
+            self.__sld_ind[cls.KEY] = list_
+
         # ---------- 初期設定[Initial Settings] ----------
         self.__inst_id = inst_id_def
         self.__gran = self.__GRAN_DICT[gran_def]
@@ -258,6 +309,12 @@ class Viewer(object):
 
         self.__opord = OpenOrders(yrng)
         self.__oppos = OpenPositions(yrng)
+        self.__prefetcher = BookPrefetcher([self.__opord, self.__oppos])
+        self.__cs.on_orders_candidate(self.__cb_chart_candidate)
+        self.__hmord = BookHeatmap(self.__opord, "Orders History",
+                                   self.__cs.fig_main)
+        self.__hmpos = BookHeatmap(self.__oppos, "Positions History",
+                                   self.__cs.fig_main)
 
     def __del__(self):
         """"デストラクタ[Destructor]
@@ -410,7 +467,7 @@ class Viewer(object):
             なし[None]
         """
         self.__inst_id = OandaIns.get_id_from_dispname(new)
-        self.__update_chart()
+        self.__request_update_chart()
 
     def __cb_slc_gran(self, attr, old, new):
         """Widget Select(時間足)コールバックメソッド
@@ -424,7 +481,7 @@ class Viewer(object):
         """
         self.__gran = self.__GRAN_DICT[new]
         self.__set_ftchtyp()
-        self.__update_chart()
+        self.__request_update_chart()
 
         # データ取得タイプが「日時指定」の場合
         # [If Data fetch type is "Youser Select"]
@@ -443,31 +500,119 @@ class Viewer(object):
         """
         self.__csnum = int(new)
         self.__set_ftchtyp()
+        self.__request_update_chart()
+
+    def __request_update_chart(self):
+        """チャート更新を要求する[request chart update]
+
+           連続した変更は待ち時間の間にまとめ、最後の要求のみ実行する。
+           [changes within the delay are coalesced and only the latest
+            request runs]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        from bokeh.io import curdoc
+        doc = curdoc()
+        self.__upd_gen += 1
+        if self.__upd_cb is not None:
+            try:
+                doc.remove_timeout_callback(self.__upd_cb)
+            except ValueError:
+                pass
+        self.__upd_cb = doc.add_timeout_callback(
+            partial(self.__run_update_chart, self.__upd_gen),
+            self.__UPDATE_DELAY)
+
+    def __run_update_chart(self, gen):
+        """要求されたチャート更新を実行する[run requested chart update]
+        引数[Args]:
+            gen (int) : 要求の世代[generation of the request]
+        戻り値[Returns]:
+            なし[None]
+        """
+        if gen != self.__upd_gen:
+            return
+        self.__upd_cb = None
         self.__update_chart()
 
     def __update_chart(self):
         """チャート更新[update charts]
+
+           ダウンロードはワーカースレッドで行い、結果は次のtickで反映する。
+           [downloads run in a worker thread and results are applied on
+            the next tick]
         引数[Args]:
             なし[None]
         戻り値[Returns]:
             なし[None]
         """
+        from bokeh.io import curdoc
+        doc = curdoc()
         inst = OandaIns.list[self.__inst_id].oanda_name
-        try:
-            yrng = self.__cs.fetch(self.__gran, inst,
-                                   self.__gmtstr, self.__gmtend)
-        except V20Error as v20err:
-            print("-----V20Error: {}".format(v20err))
-        except ConnectionError as cerr:
-            print("----- ConnectionError: {}".format(cerr))
-        except Exception as err:
-            print("----- ExceptionError: {}".format(err))
+        args = (self.__upd_gen, self.__gran, inst,
+                self.__gmtstr, self.__gmtend)
+        self.__div_loading.visible = True
+        self.__executor.submit(self.__load_chart, doc, *args)
+
+    def __load_chart(self, doc, gen, gran, inst, gmtstr, gmtend):
+        """ローソク足をダウンロードする(ワーカースレッド)
+           [download candles (worker thread)]
+        引数[Args]:
+            doc (Document) : ドキュメント[document]
+            gen (int) : 要求の世代[generation of the request]
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            gmtstr (DateTimeManager) : 開始日時[from date]
+            gmtend (DateTimeManager) : 終了日時[to date]
+        戻り値[Returns]:
+            なし[None]
+        """
+        df = None
+        if gen == self.__upd_gen:
+            try:
+                df = self.__cs.load(gran, inst, gmtstr, gmtend)
+            except V20Error as v20err:
+                print("-----V20Error: {}".format(v20err))
+            except ConnectionError as cerr:
+                print("----- ConnectionError: {}".format(cerr))
+            except Exception as err:
+                print("----- ExceptionError: {}".format(err))
+
+        doc.add_next_tick_callback(partial(self.__apply_chart, gen, gran,
+                                           inst, gmtstr, gmtend, df))
+
+    def __apply_chart(self, gen, gran, inst, gmtstr, gmtend, df):
+        """ダウンロードしたローソク足をチャートに反映する
+           [apply downloaded candles to charts]
+        引数[Args]:
+            gen (int) : 要求の世代[generation of the request]
+            gran (str) : ローソク足の時間足[granularity of a candlestick]
+            inst (str) : 通貨ペア[instrument]
+            gmtstr (DateTimeManager) : 開始日時[from date]
+            gmtend (DateTimeManager) : 終了日時[to date]
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+        戻り値[Returns]:
+            なし[None]
+        """
+        # 新しい要求がある場合は破棄する[discard if superseded]
+        if gen != self.__upd_gen:
+            return
+        self.__div_loading.visible = False
+        if df is None:
+            return
+
+        yrng = self.__cs.apply(gran, inst, gmtstr, gmtend, df)
 
         self.__opord.clear()
         self.__opord.update_yrange(yrng)
         self.__oppos.clear()
         self.__oppos.update_yrange(yrng)
 
+        if self.__mode == self.__MODE_LIST[3]:
+            self.__update_bookmap()
+
     def __cb_slc_mode(self, attr, old, new):
         """Widget Select(モード)コールバックメソッド
            [Callback method of Widget Select(Mode)]
@@ -478,6 +623,7 @@ class Viewer(object):
         戻り値[Returns]:
             なし[None]
         """
+        self.__cs.set_orders_hover(new == self.__MODE_LIST[0])
         if new == self.__MODE_LIST[0]:
             self.__switch_main_layout()
             self.__mode = self.__MODE_LIST[0]
@@ -493,6 +639,76 @@ class Viewer(object):
             self.__cs.clear_orders_vline()
             self.__opord.clear()
             self.__oppos.clear()
+        elif new == self.__MODE_LIST[3]:
+            self.__switch_bookmap_layout()
+            self.__mode = self.__MODE_LIST[3]
+            self.__cs.clear_orders_vline()
+            self.__opord.clear()
+            self.__oppos.clear()
+            self.__update_bookmap()
+
+    def __update_bookmap(self):
+        """オーダーブック履歴を更新する[update order book history]
+
+           読込はワーカースレッドで行い、結果は次のtickで反映する。
+           [loading runs in a worker thread and results are applied on
+            the next tick]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        from bokeh.io import curdoc
+        inst = OandaIns.list[self.__inst_id].oanda_name
+        dtlist = self.__cs.orders_datetimes
+        yrng = list(self.__cs.yrange)
+        self.__bm_gen += 1
+        self.__bm_executor.submit(self.__load_bookmap, curdoc(),
+                                  self.__bm_gen, inst, dtlist, yrng)
+
+    def __load_bookmap(self, doc, gen, inst, dtlist, yrng):
+        """オーダーブック履歴を読み込む(ワーカースレッド)
+           [load order book history (worker thread)]
+        引数[Args]:
+            doc (Document) : ドキュメント[document]
+            gen (int) : 要求の世代[generation of the request]
+            inst (str) : 通貨ペア[instrument]
+            dtlist (list) : DateTimeManagerのリスト[DateTimeManager list]
+            yrng (list) : 価格範囲 [min, max][price range]
+        戻り値[Returns]:
+            なし[None]
+        """
+        if not gen == self.__bm_gen:
+            return
+        try:
+            imgs = [hm.prepare(inst, dtlist, yrng)
+                    for hm in (self.__hmord, self.__hmpos)]
+        except V20Error as v20err:
+            print("-----V20Error: {}".format(v20err))
+            return
+        except ConnectionError as cerr:
+            print("----- ConnectionError: {}".format(cerr))
+            return
+        except Exception as err:
+            print("----- ExceptionError: {}".format(err))
+            return
+
+        doc.add_next_tick_callback(partial(self.__apply_bookmap, gen, imgs))
+
+    def __apply_bookmap(self, gen, imgs):
+        """読み込んだオーダーブック履歴を反映する
+           [apply loaded order book history]
+        引数[Args]:
+            gen (int) : 要求の世代[generation of the request]
+            imgs (list) : ヒートマップのイメージ[images of heatmaps]
+        戻り値[Returns]:
+            なし[None]
+        """
+        # 新しい要求がある場合は破棄する[discard if superseded]
+        if not gen == self.__bm_gen:
+            return
+        self.__hmord.draw(imgs[0])
+        self.__hmpos.draw(imgs[1])
 
     def __cb_slc_tech(self, attr, old, new):
         """Widget Select(テクニカル指標)コールバックメソッド
@@ -514,25 +730,165 @@ class Viewer(object):
         戻り値[Returns]:
             なし[None]
         """
+        from bokeh.io import curdoc
         if self.__mode == self.__MODE_LIST[0]:
-            dtmmin = self.__cs.orders_fetch_datetime
+            date = datetime.fromtimestamp(
+                int(event.x) / 1000) - timedelta(hours=9)
             inst = OandaIns.list[self.__inst_id].oanda_name
-            self.__opord.fetch(inst, dtmmin)
-            self.__oppos.fetch(inst, dtmmin)
+            self.__cs.draw_orders_cand_vline(date)
+            dtmmin = self.__cs.orders_fetch_datetime
+            self.__tap_gen += 1
+            self.__executor.submit(self.__load_books, curdoc(),
+                                   self.__tap_gen, inst, dtmmin)
+
+            # 選択日時の前後のブックを先読みする
+            # [prefetch books around the selected time]
+            dtlist = self.__cs.orders_prefetch_datetimes(self.__PREFETCH_NUM)
+            self.__prefetcher.prefetch(inst, dtlist[1:])
+
+    def __load_books(self, doc, gen, inst, dt_):
+        """ブックを取得する(ワーカースレッド)[load books (worker thread)]
+        引数[Args]:
+            doc (Document) : ドキュメント[document]
+            gen (int) : 要求の世代[generation of the request]
+            inst (str) : 通貨ペア[instrument]
+            dt_ (DateTimeManager) : 日付[date time]
+        戻り値[Returns]:
+            なし[None]
+        """
+        if not gen == self.__tap_gen:
+            return
+        snaps = load_books([self.__opord, self.__oppos], inst, dt_)
+        doc.add_next_tick_callback(partial(self.__apply_books, gen, snaps))
+
+    def __apply_books(self, gen, snaps):
+        """取得したブックを反映する[apply loaded books]
+        引数[Args]:
+            gen (int) : 要求の世代[generation of the request]
+            snaps (list) : BookSnapshotのリスト[BookSnapshot list]
+        戻り値[Returns]:
+            なし[None]
+        """
+        from bokeh.io import curdoc
+        # 新しい要求がある場合は破棄する[discard if superseded]
+        if not gen == self.__tap_gen:
+            return
+        doc = curdoc()
+        doc.hold("combine")
+        try:
+            apply_books([self.__opord, self.__oppos], snaps)
             self.__cs.draw_orders_fix_vline()
+        finally:
+            doc.unhold()
+
+    def __cb_chart_candidate(self, attr, old, new):
+        """候補線変更(チャート)コールバックメソッド
+           [Callback method of candidate line change(Chart)]
 
-    def __cb_chart_mousemove(self, event):
-        """Event mouse move(チャート)コールバックメソッド
-           [Callback method of mouse move event(Chart)]
+           マウス追従で候補線が止まったら、その前後のブックを先読みする。
+           [when the candidate line following the mouse settles, books
+            around it are prefetched]
+        引数[Args]:
+            attr (str) : An attribute name on this object
+            old (dict) : Old data
+            new (dict) : New data
+        戻り値[Returns]:
+            なし[None]
+        """
+        from bokeh.io import curdoc
+        if not self.__mode == self.__MODE_LIST[0]:
+            return
+        doc = curdoc()
+        if self.__pf_cb is not None:
+            try:
+                doc.remove_timeout_callback(self.__pf_cb)
+            except ValueError:
+                pass
+        self.__pf_cb = doc.add_timeout_callback(self.__prefetch_candidate,
+                                                self.__PREFETCH_DELAY)
+
+    def __prefetch_candidate(self):
+        """候補線の前後のブックを先読みする
+           [prefetch books around the candidate line]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        self.__pf_cb = None
+        dtlist = self.__cs.orders_hover_datetimes(self.__PREFETCH_NUM)
+        if dtlist:
+            inst = OandaIns.list[self.__inst_id].oanda_name
+            self.__prefetcher.prefetch(inst, dtlist)
+
+    def __cb_chart_viewport(self, event):
+        """Event 表示範囲変更(チャート)コールバックメソッド
+           [Callback method of visible range change event(Chart)]
         引数[Args]:
             event (str) : An event name on this object
         戻り値[Returns]:
             なし[None]
         """
-        if self.__mode == self.__MODE_LIST[0]:
-            date = datetime.fromtimestamp(
-                int(event.x) / 1000) - timedelta(hours=9)
-            self.__cs.draw_orders_cand_vline(date)
+        from bokeh.io import curdoc
+        req = self.__cs.viewport_range()
+        if req is None:
+            return
+        self.__vp_gen += 1
+        self.__executor.submit(self.__load_viewport, curdoc(),
+                               (self.__upd_gen, self.__vp_gen), *req)
+
+    def __load_viewport(self, doc, gen, inst, str_, end_):
+        """表示範囲のローソク足をダウンロードする(ワーカースレッド)
+           [download candles of visible range (worker thread)]
+        引数[Args]:
+            doc (Document) : ドキュメント[document]
+            gen (tuple) : 要求の世代[generation of the request]
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        if not gen == (self.__upd_gen, self.__vp_gen):
+            return
+        try:
+            df, width = self.__cs.load_viewport(inst, str_, end_)
+        except V20Error as v20err:
+            print("-----V20Error: {}".format(v20err))
+            return
+        except ConnectionError as cerr:
+            print("----- ConnectionError: {}".format(cerr))
+            return
+        except Exception as err:
+            print("----- ExceptionError: {}".format(err))
+            return
+
+        doc.add_next_tick_callback(partial(self.__apply_viewport, gen, inst,
+                                           str_, end_, df, width))
+
+    def __apply_viewport(self, gen, inst, str_, end_, df, width):
+        """ダウンロードした表示範囲のローソク足をチャートに反映する
+           [apply downloaded candles of visible range to charts]
+        引数[Args]:
+            gen (tuple) : 要求の世代[generation of the request]
+            inst (str) : 通貨ペア[instrument]
+            str_ (Timestamp) : 開始日時(東京)[from date (Tokyo)]
+            end_ (Timestamp) : 終了日時(東京)[to date (Tokyo)]
+            df (DataFrame) : ローソク足のデータフレーム[Data frame of candles]
+            width (float) : ローソク足1本の期間(ミリ秒)[period of a candle (ms)]
+        戻り値[Returns]:
+            なし[None]
+        """
+        # 新しい要求がある場合は破棄する[discard if superseded]
+        if not gen == (self.__upd_gen, self.__vp_gen):
+            return
+
+        yrng = self.__cs.apply_viewport(inst, str_, end_, df, width)
+        if yrng is None:
+            return
+
+        self.__opord.update_yrange(yrng)
+        self.__oppos.update_yrange(yrng)
 
     def __cb_cbg_tech(self, attr, old, new):
         """Widget Check Box Group(テクニカル指標)コールバックメソッド
@@ -570,6 +926,17 @@ class Viewer(object):
             else:
                 self.__cs.clear_bb()
 
+        # 登録指標[registered indicators]
+        for i, cls in enumerate(self.__inds, self.__TECH_IND_OFS):
+            if not (i in self.__tech_act) == (i in new):
+                if (i in new):
+                    self.__cs.update_indicator(cls.KEY, cls.conf_params())
+                else:
+                    self.__cs.clear_indicator(cls.KEY)
+                if cls.PANEL == PANEL_SUB:
+                    self.__switch_visible_ind(cls.KEY, i in new)
+            cfg.set_conf_ind(cls.conf_key("act"), 1 if (i in new) else 0)
+
         cfg.set_conf_act(new)
         cfg.write()
         self.__tech_act = new
@@ -608,7 +975,7 @@ class Viewer(object):
             self.__sts_ftchtyp = self.__STS_DATARANGE_SELECT
 
         self.__set_ftchtyp()
-        self.__update_chart()
+        self.__request_update_chart()
 
     def __set_ftchtyp(self):
         """データ取得タイプを設定する[set data fetching type]
@@ -767,6 +1134,39 @@ class Viewer(object):
         cfg.set_conf(cfg.ITEM_BB_PRD, new)
         cfg.write()
 
+    def __cb_sld_ind(self, cls, key, attr, old, new):
+        """Widget Slider(登録指標)コールバックメソッド
+           [Callback method of Widget Slider(registered indicator)]
+        引数[Args]:
+            cls (class) : 指標クラス[indicator class]
+            key (str) : パラメータキー[parameter key]
+            attr (str) : An attribute name on this object
+            old (int) : Old value
+            new (int) : New value
+        戻り値[Returns]:
+            なし[None]
+        """
+        cfg.set_conf_ind(cls.conf_key(key), new)
+        if cfg.get_conf_ind(cls.conf_key("act"), 0) == 1:
+            self.__cs.update_indicator(cls.KEY, cls.conf_params())
+        cfg.write()
+
+    def __get_sub_plots(self):
+        """表示中のサブパネルを取得する[get visible sub panels]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            list_ (list) : フィギュアオブジェクトのリスト[figure objects]
+        """
+        list_ = []
+        if cfg.get_conf(cfg.ITEM_MACD_ACT) == 1:
+            list_.append(self.__cs.macd_plt)
+        for cls in self.__inds:
+            if (cls.PANEL == PANEL_SUB
+                    and cfg.get_conf_ind(cls.conf_key("act"), 0) == 1):
+                list_.append(self.__cs.indicator_plt(cls.KEY))
+        return list_
+
     def __get_chart_layout(self):
         """チャートレイアウトを取得する[get chart layout]
         引数[Args]:
@@ -781,20 +1181,13 @@ class Viewer(object):
         chrt = self.__cs.fig_main
         rang = self.__cs.fig_range
 
-        if cfg.get_conf(cfg.ITEM_MACD_ACT) == 1:
-            macd = self.__cs.macd_plt
-            chgp = gridplot(
-                [
-                    [None, rang],
-                    [opbk, chrt],
-                    [None, macd],
-                ], sizing_mode='stretch_width', merge_tools=False)
-        else:
-            chgp = gridplot(
-                [
-                    [None, rang],
-                    [opbk, chrt],
-                ], sizing_mode='stretch_width', merge_tools=False)
+        rows = [
+            [None, rang],
+            [opbk, chrt],
+        ]
+        for plt in self.__get_sub_plots():
+            rows.append([None, plt])
+        chgp = gridplot(rows, sizing_mode='stretch_width', merge_tools=False)
 
         return chgp
 
@@ -812,7 +1205,7 @@ class Viewer(object):
         wslmo = self.__slc_mode
 
         widsel1 = row(children=[wslin, wslgr, wslcs], width=300)
-        widsel2 = row(children=[wslmo], width=1000)
+        widsel2 = row(children=[wslmo, self.__div_loading], width=1000)
 
         chgp = self.__get_chart_layout()
         wid = row(children=[widsel1, widsel2], sizing_mode='stretch_width')
@@ -820,8 +1213,12 @@ class Viewer(object):
             children=[wid, chgp], sizing_mode='stretch_width')
 
         self.__cs.fig_main.on_event(events.Tap, self.__cb_chart_tap)
-        self.__cs.fig_main.on_event(events.MouseMove,
-                                    self.__cb_chart_mousemove)
+
+        # 表示範囲の変更[change of visible range]
+        self.__cs.fig_main.on_event(events.LODEnd, self.__cb_chart_viewport)
+        self.__cs.fig_main.on_event(events.PanEnd, self.__cb_chart_viewport)
+        self.__cs.fig_main.on_event(events.Reset, self.__cb_chart_viewport)
+        self.__cs.fig_range.on_event(events.PanEnd, self.__cb_chart_viewport)
 
         return(self.__layout)
 
@@ -857,19 +1254,32 @@ class Viewer(object):
         chrt = self.__cs.fig_main
         rang = self.__cs.fig_range
 
-        if cfg.get_conf(cfg.ITEM_MACD_ACT) == 1:
-            macd = self.__cs.macd_plt
-            chrtset = column(children=[rang, chrt, macd],
-                             sizing_mode='stretch_width')
-        else:
-            chrtset = column(children=[rang, chrt],
-                             sizing_mode='stretch_width')
+        chrtset = column(children=[rang, chrt] + self.__get_sub_plots(),
+                         sizing_mode='stretch_width')
 
         chartlay = row(children=[techpara, chrtset],
                        sizing_mode='stretch_width')
 
         self.__layout.children[1] = chartlay
 
+    def __switch_bookmap_layout(self):
+        """オーダーブック履歴レイアウトに切り替える
+           [switch order book history layout]
+        引数[Args]:
+            なし[None]
+        戻り値[Returns]:
+            なし[None]
+        """
+        chrt = self.__cs.fig_main
+        rang = self.__cs.fig_range
+
+        chartlay = column(children=[rang, chrt,
+                                    self.__hmord.widget,
+                                    self.__hmpos.widget],
+                          sizing_mode='stretch_width')
+
+        self.__layout.children[1] = chartlay
+
     def __switch_technical_sma(self):
         """テクニカル指標レイアウト（単純移動平均）に切り替える
            [switch technical index(Simple Moving Average) layout]
@@ -926,13 +1336,8 @@ class Viewer(object):
         chrt = self.__cs.fig_main
         rang = self.__cs.fig_range
 
-        if cfg.get_conf(cfg.ITEM_MACD_ACT) == 1:
-            macd = self.__cs.macd_plt
-            chrtset = column(children=[rang, chrt, macd],
-                             sizing_mode='stretch_width')
-        else:
-            chrtset = column(children=[rang, chrt],
-                             sizing_mode='stretch_width')
+        chrtset = column(children=[rang, chrt] + self.__get_sub_plots(),
+                         sizing_mode='stretch_width')
 
         chartlay = row(children=[techpara, chrtset],
                        sizing_mode='stretch_width')
@@ -959,6 +1364,37 @@ class Viewer(object):
             if plotToRemove:
                 macdlay.remove(plotToRemove)
 
+    def __switch_visible_ind(self, key, flg):
+        """登録指標サブパネルの可視状態を切り替える
+           [switch visible of registered indicator sub panel]
+        引数[Args]:
+            key (str) : 指標識別子[indicator key]
+            flg (boolean) : 可視フラグ
+                            true: visible
+                            false: non-visible
+        戻り値[Returns]:
+            なし[None]
+        """
+        from bokeh.io import curdoc
+        sublay = self.__layout.children[1].children[1].children
+        if flg:
+            sublay.append(self.__cs.indicator_plt(key))
+        else:
+            plotToRemove = curdoc().get_model_by_name(key)
+            if plotToRemove:
+                sublay.remove(plotToRemove)
+
+    def __switch_technical_ind(self, cls):
+        """テクニカル指標レイアウト（登録指標）に切り替える
+           [switch technical index(registered indicator) layout]
+        引数[Args]:
+            cls (class) : 指標クラス[indicator class]
+        戻り値[Returns]:
+            なし[None]
+        """
+        para = column(children=self.__sld_ind[cls.KEY])
+        self.__set_technical_layout(para)
+
     def __cb_func_sma(self):
         """コールバック関数：単純移動平均
            [Callback fuction of Simple Moving Average]